@@ -0,0 +1,236 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from functools import wraps
+
+from flask import jsonify, request
+
+
+# --- RESPONSES ---
+def retry_seconds(seconds):
+    # Whole seconds for Retry-After, never 0
+    return max(1, math.ceil(seconds))
+
+def too_busy(retry_after, message="The store is very busy right now, please try again in a moment"):
+    response = jsonify({'success': False, 'message': message, 'retry_after': retry_seconds(retry_after)})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_seconds(retry_after))
+    return response
+
+
+# --- SHARED STATE ---
+# Token buckets, concurrency slots and waiting-room tickets. Kept in a local SQLite file so
+# every gunicorn worker on the box makes the same decision, or ':memory:' for one process.
+SQL_ADMISSION_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS buckets (
+            name TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS slots (
+            name TEXT NOT NULL,
+            token TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (name, token)
+        ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS tickets (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            room TEXT NOT NULL,
+            ticket TEXT NOT NULL,
+            last_seen REAL NOT NULL,
+            admitted_until REAL,
+            UNIQUE (room, ticket)
+        )""",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_room ON tickets(room, admitted_until, seq)",
+]
+SQL_BUCKET = "SELECT tokens, updated_at FROM buckets WHERE name = ?"
+SQL_SAVE_BUCKET = """INSERT INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at"""
+SQL_IDLE_BUCKETS = "DELETE FROM buckets WHERE updated_at < ?"
+SQL_EXPIRE_SLOTS = "DELETE FROM slots WHERE name = ? AND expires_at < ?"
+SQL_COUNT_SLOTS = "SELECT COUNT(*) FROM slots WHERE name = ?"
+SQL_TAKE_SLOT = "INSERT INTO slots (name, token, expires_at) VALUES (?, ?, ?)"
+SQL_RELEASE_SLOT = "DELETE FROM slots WHERE name = ? AND token = ?"
+# Passes that ran out, and shoppers who stopped polling before their turn came
+SQL_EXPIRE_TICKETS = """DELETE FROM tickets WHERE room = ?
+    AND (admitted_until < ? OR (admitted_until IS NULL AND last_seen < ?))"""
+SQL_TICKET = "SELECT seq, admitted_until FROM tickets WHERE ticket = ? AND room = ?"
+SQL_JOIN = "INSERT INTO tickets (room, ticket, last_seen) VALUES (?, ?, ?)"
+SQL_SEEN = "UPDATE tickets SET last_seen = ? WHERE ticket = ? AND room = ?"
+SQL_WAITING = "SELECT COUNT(*) FROM tickets WHERE room = ? AND admitted_until IS NULL"
+SQL_ADMIT_HEAD = """UPDATE tickets SET admitted_until = ? WHERE seq IN (
+    SELECT seq FROM tickets WHERE room = ? AND admitted_until IS NULL ORDER BY seq LIMIT ?)"""
+SQL_POSITION = "SELECT COUNT(*) FROM tickets WHERE room = ? AND admitted_until IS NULL AND seq <= ?"
+
+# A bucket idle this long is full again for any sensible rate, so its row can go
+BUCKET_IDLE_SECONDS = 3600
+SWEEP_INTERVAL = 60
+
+
+class Admission:
+    """Admission control shared by all workers through one small SQLite file.
+
+    `take` is a token bucket, `acquire`/`release` a concurrency limit with
+    leases (a crashed worker's slots time out), and `enter` a FIFO waiting
+    room that lets the head of the queue in at a fixed rate. Each decision is
+    one short BEGIN IMMEDIATE transaction that never touches the store.
+    """
+
+    def __init__(self, db_file, clock=time.time):
+        self.db_file = db_file
+        self.clock = clock
+        self._local = threading.local()
+        # ':memory:' databases are per connection, so that mode shares one behind a lock
+        self._memory_lock = threading.Lock() if db_file == ':memory:' else None
+        self._memory = None  # (pid, conn)
+        self._next_sweep = 0
+        conn = self._conn()
+        for stmt in SQL_ADMISSION_SCHEMA:
+            conn.execute(stmt)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self):
+        if self._memory_lock:
+            if self._memory is None or self._memory[0] != os.getpid():
+                self._memory = (os.getpid(), self._connect())
+            return self._memory[1]
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _tx(self, fn):
+        if self._memory_lock:
+            with self._memory_lock:
+                return self._run(fn)
+        return self._run(fn)
+
+    def _run(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, self.clock())
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def _refill(self, conn, name, rate, burst, now):
+        row = conn.execute(SQL_BUCKET, (name,)).fetchone()
+        if row is None:
+            return burst
+        return min(burst, row[0] + max(now - row[1], 0) * rate)
+
+    # Token buckets
+    def take(self, name, rate, burst=None, cost=1):
+        # (allowed, seconds until `cost` tokens are back)
+        burst = burst or rate
+
+        def _take(conn, now):
+            if now >= self._next_sweep:
+                conn.execute(SQL_IDLE_BUCKETS, (now - BUCKET_IDLE_SECONDS,))
+                self._next_sweep = now + SWEEP_INTERVAL
+            tokens = self._refill(conn, name, rate, burst, now)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(SQL_SAVE_BUCKET, (name, tokens, now))
+            return allowed, 0.0 if allowed else (cost - tokens) / rate
+        return self._tx(_take)
+
+    # Concurrency limits
+    def acquire(self, name, limit, lease=30):
+        # A slot token, or None when `limit` are already in use
+        def _acquire(conn, now):
+            conn.execute(SQL_EXPIRE_SLOTS, (name, now))
+            if conn.execute(SQL_COUNT_SLOTS, (name,)).fetchone()[0] >= limit:
+                return None
+            token = uuid.uuid4().hex
+            conn.execute(SQL_TAKE_SLOT, (name, token, now + lease))
+            return token
+        return self._tx(_acquire)
+
+    def release(self, name, token):
+        self._tx(lambda conn, now: conn.execute(SQL_RELEASE_SLOT, (name, token)))
+
+    # Waiting room
+    def enter(self, room, ticket, rate, burst=None, pass_ttl=600, abandon_after=30):
+        """Join or poll the queue for `room`; returns (admitted, position, retry_after).
+
+        Shoppers are let in strictly in arrival order, `rate` per second with
+        up to `burst` at once after a quiet spell, so an empty queue admits
+        immediately. Admission is a pass valid for `pass_ttl` seconds; a ticket
+        not polled for `abandon_after` seconds loses its place.
+        """
+        burst = burst or rate
+        bucket = f"room:{room}"
+
+        def _enter(conn, now):
+            conn.execute(SQL_EXPIRE_TICKETS, (room, now, now - abandon_after))
+            if conn.execute(SQL_TICKET, (ticket, room)).fetchone() is None:
+                conn.execute(SQL_JOIN, (room, ticket, now))
+            else:
+                conn.execute(SQL_SEEN, (now, ticket, room))
+            tokens = self._refill(conn, bucket, rate, burst, now)
+            waiting = conn.execute(SQL_WAITING, (room,)).fetchone()[0]
+            let_in = min(int(tokens), waiting)
+            if let_in:
+                conn.execute(SQL_ADMIT_HEAD, (now + pass_ttl, room, let_in))
+                tokens -= let_in
+            conn.execute(SQL_SAVE_BUCKET, (bucket, tokens, now))
+            seq, admitted_until = conn.execute(SQL_TICKET, (ticket, room)).fetchone()
+            if admitted_until is not None:
+                return True, 0, 0.0
+            position = conn.execute(SQL_POSITION, (room, seq)).fetchone()[0]
+            return False, position, (position - tokens) / rate
+        return self._tx(_enter)
+
+    # --- FLASK ---
+    def limit(self, name, rate=0, burst=None, concurrency=0, lease=30, per_client=False, methods=None,
+              on_reject=too_busy):
+        """Route decorator: shed requests over `rate`/s or `concurrency` in flight with a 429.
+
+        `per_client` keeps one bucket per remote address instead of one per
+        route; `on_reject(retry_after)` builds the response (JSON by default).
+        A failure in the admission store lets the request through rather than
+        taking the route down with it.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if methods and request.method not in methods:
+                    return view(*args, **kwargs)
+                token = None
+                try:
+                    if rate:
+                        bucket = f"{name}:{request.remote_addr}" if per_client else name
+                        allowed, retry_after = self.take(bucket, rate, burst)
+                        if not allowed:
+                            return on_reject(retry_after)
+                    if concurrency:
+                        token = self.acquire(name, concurrency, lease)
+                        if token is None:
+                            return on_reject(1)
+                except sqlite3.Error as e:
+                    print(f"Admission Error: {e}")
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    if token:
+                        try:
+                            self.release(name, token)
+                        except sqlite3.Error as e:
+                            print(f"Admission Error: {e}")
+            return wrapped
+        return decorator
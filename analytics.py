@@ -0,0 +1,224 @@
+import os
+import sqlite3
+import sys
+import threading
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+
+from sqlite_store import normalize_legacy_order
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Bucket kinds: revenue per day, units per product, orders per delivery area
+DAY, PRODUCT, REGION = 'day', 'product', 'region'
+KINDS = (DAY, PRODUCT, REGION)
+REGION_SEP = '|'
+
+
+# --- ORDER -> BUCKET DELTAS ---
+def _order_facts(order):
+    # (day, region, total, [(product id, qty, subtotal)]) for current and legacy order shapes
+    order, _ = normalize_legacy_order(order)
+    addr = order.get('address') or {}
+    region = f"{addr.get('pincode') or ''}{REGION_SEP}{addr.get('taluk') or ''}"
+    # By id, so a renamed product keeps one bucket; only lines without an id fall back to the name
+    items = [(str(i['id'] if i.get('id') is not None else i.get('name')), float(i.get('qty', 0)),
+              float(i.get('subtotal', 0))) for i in order.get('items', [])]
+    return str(order.get('date') or '')[:10], region, float(order.get('total', 0)), items
+
+def order_deltas(order):
+    # {(kind, key): (orders, units, revenue)} contributed by one order
+    day, region, total, items = _order_facts(order)
+    deltas = {(DAY, day): (1, sum(q for _, q, _ in items), total),
+              (REGION, region): (1, 0.0, total)}
+    for name, qty, subtotal in items:
+        _, u, r = deltas.get((PRODUCT, name), (1, 0.0, 0.0))
+        deltas[(PRODUCT, name)] = (1, u + qty, r + subtotal)
+    return deltas
+
+def aggregate(orders):
+    # Whole-history totals in one pass; array-based group-by when numpy is available
+    days, regions, totals, day_units = [], [], [], []
+    products, qtys, subtotals, item_orders = [], [], [], []
+    for n, order in enumerate(orders):
+        day, region, total, items = _order_facts(order)
+        days.append(day)
+        regions.append(region)
+        totals.append(total)
+        day_units.append(sum(q for _, q, _ in items))
+        for name, qty, subtotal in items:
+            products.append(name)
+            qtys.append(qty)
+            subtotals.append(subtotal)
+            item_orders.append(n)
+    buckets = {}
+    _group(buckets, DAY, days, [1.0] * len(days), day_units, totals)
+    _group(buckets, REGION, regions, [1.0] * len(regions), [0.0] * len(regions), totals)
+    # An order counts once per product even if the product appears on two lines
+    seen = set()
+    order_flags = []
+    for name, n in zip(products, item_orders):
+        order_flags.append(0.0 if (name, n) in seen else 1.0)
+        seen.add((name, n))
+    _group(buckets, PRODUCT, products, order_flags, qtys, subtotals)
+    return buckets
+
+def _group(buckets, kind, keys, orders, units, revenue):
+    if not keys:
+        return
+    if np is not None:
+        uniq, inverse = np.unique(np.asarray(keys, dtype=object).astype(str), return_inverse=True)
+        sums = [np.bincount(inverse, weights=np.asarray(w, dtype=float), minlength=len(uniq))
+                for w in (orders, units, revenue)]
+        for i, key in enumerate(uniq.tolist()):
+            buckets[(kind, key)] = (int(sums[0][i]), float(sums[1][i]), float(sums[2][i]))
+        return
+    acc = {}
+    for key, o, u, r in zip(keys, orders, units, revenue):
+        a = acc.setdefault(key, [0, 0.0, 0.0])
+        a[0] += o
+        a[1] += u
+        a[2] += r
+    for key, (o, u, r) in acc.items():
+        buckets[(kind, key)] = (int(o), u, r)
+
+
+def _summary(rows, top_n, days, products=None):
+    # rows: iterable of (kind, key, orders, units, revenue) -> dashboard context;
+    # product buckets are named from `products` ({str(id): product}), so they show the current name
+    by_kind = {kind: [] for kind in KINDS}
+    for kind, key, orders, units, revenue in rows:
+        if kind in by_kind:
+            by_kind[kind].append({'key': key, 'orders': int(orders), 'units': float(units), 'revenue': float(revenue)})
+    daily = sorted(by_kind[DAY], key=lambda b: b['key'])
+    regions = []
+    for b in sorted(by_kind[REGION], key=lambda b: (-b['orders'], b['key'])):
+        pincode, _, taluk = b['key'].partition(REGION_SEP)
+        regions.append(dict(b, pincode=pincode or '—', taluk=taluk or '—'))
+    return {
+        'total_orders': sum(b['orders'] for b in daily),
+        'total_revenue': sum(b['revenue'] for b in daily),
+        'daily': daily[-days:],
+        'top_products': [dict(b, name=(products or {}).get(b['key'], {}).get('name') or b['key'])
+                         for b in sorted(by_kind[PRODUCT], key=lambda b: (-b['units'], b['key']))[:top_n]],
+        'regions': regions[:top_n],
+    }
+
+
+# --- BACKENDS ---
+SQL_BUCKETS_SCHEMA = """CREATE TABLE IF NOT EXISTS sales_buckets (
+        kind TEXT,
+        key TEXT,
+        orders INTEGER DEFAULT 0,
+        units REAL DEFAULT 0,
+        revenue REAL DEFAULT 0,
+        PRIMARY KEY (kind, key)
+    ) WITHOUT ROWID"""
+SQL_BUCKET_ADD = """INSERT INTO sales_buckets (kind, key, orders, units, revenue) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(kind, key) DO UPDATE SET orders = orders + excluded.orders,
+        units = units + excluded.units, revenue = revenue + excluded.revenue"""
+SQL_BUCKETS_ALL = "SELECT kind, key, orders, units, revenue FROM sales_buckets"
+
+
+class SQLiteAnalytics:
+    """Running sales totals in a local SQLite file, one row per bucket."""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._conn().execute(SQL_BUCKETS_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, deltas, replace=False):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if replace:
+                conn.execute("DELETE FROM sales_buckets")
+            conn.executemany(SQL_BUCKET_ADD, [(kind, key, *v) for (kind, key), v in deltas.items()])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def record_order(self, order):
+        self._write(order_deltas(order))
+
+    def replace_all(self, buckets):
+        self._write(buckets, replace=True)
+
+    def summary(self, top_n=10, days=30, products=None):
+        return _summary(self._conn().execute(SQL_BUCKETS_ALL), top_n, days, products)
+
+
+class DynamoAnalytics:
+    """One item per bucket: `kind` hash key, `key` range key, counters bumped with ADD."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def _add(self, kind, key, orders, units, revenue):
+        self.table.update_item(
+            Key={'kind': kind, 'key': key},
+            UpdateExpression="ADD #o :o, #u :u, #r :r",
+            ExpressionAttributeNames={'#o': 'orders', '#u': 'units', '#r': 'revenue'},
+            ExpressionAttributeValues={':o': orders, ':u': Decimal(str(units)), ':r': Decimal(str(revenue))}
+        )
+
+    def record_order(self, order):
+        for (kind, key), values in order_deltas(order).items():
+            self._add(kind, key, *values)
+
+    def _items(self):
+        for kind in KINDS:
+            kwargs = {'KeyConditionExpression': Key('kind').eq(kind)}
+            while True:
+                response = self.table.query(**kwargs)
+                yield from response.get('Items', [])
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def replace_all(self, buckets):
+        # Not atomic: orders placed while this runs may be lost from the totals
+        stale = [(i['kind'], i['key']) for i in self._items()]
+        with self.table.batch_writer() as batch:
+            for kind, key in stale:
+                if (kind, key) not in buckets:
+                    batch.delete_item(Key={'kind': kind, 'key': key})
+            for (kind, key), (orders, units, revenue) in buckets.items():
+                batch.put_item(Item={'kind': kind, 'key': key, 'orders': orders,
+                                     'units': Decimal(str(units)), 'revenue': Decimal(str(revenue))})
+
+    def summary(self, top_n=10, days=30, products=None):
+        return _summary(((i['kind'], i['key'], i.get('orders', 0), i.get('units', 0), i.get('revenue', 0))
+                         for i in self._items()), top_n, days, products)
+
+
+def rebuild(analytics, orders):
+    buckets = aggregate(orders)
+    analytics.replace_all(buckets)
+    return len(buckets)
+
+
+if __name__ == '__main__':
+    # python analytics.py [app|aws_app] -- recompute all buckets from the full order history
+    target = sys.argv[1] if len(sys.argv) > 1 else 'app'
+    module = __import__(target)
+    orders = module.repo.load_orders()
+    count = rebuild(module.analytics, orders)
+    print(f"Rebuilt {count} analytics buckets from {len(orders)} orders")
@@ -1,22 +1,137 @@
-from flask import Flask, render_template, session, redirect, url_for, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-import json
+from flask import Flask, Response, render_template, session, redirect, url_for, request, jsonify, stream_with_context
+import functools
 import os
 import re
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from admission import Admission, retry_seconds
+from analytics import DynamoAnalytics, SQLiteAnalytics
+from aws_clients import AwsClients
+import catalog_io
+import dispatch
+from cart_store import Carts, make_cart_store
+from catalog_cache import CatalogCache
+from dynamo_utils import TTLStamp
+from http_cache import FragmentCache, conditional, make_etag
+from images import apply_image, is_hashed_asset
+from inventory import DynamoInventory, OutOfStock, SQLiteInventory, StockConflict
+from metrics import Metrics
+from outbox import Outbox
+from passwords import HasherBusy, PasswordHasher
+from pricing import DynamoOffers, PriceBook, PricedCatalog, SQLiteOffers
+from repository import make_repository
+from reviews import DynamoReviews, SQLiteReviews, summaries_from_products
+from search import SearchIndex
 
 # --- CONFIGURATION ---
+# json (default), sqlite or dynamodb; aws_app.py is this app with dynamodb forced
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+DYNAMO = STORAGE_BACKEND == 'dynamodb'
+
 app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'freshbasket_secure_key_2026')
+# Each backend keeps its historical default so existing sessions stay valid
+app.secret_key = os.environ.get('SECRET_KEY', 'freshbasket_aws_secure_key_2026' if DYNAMO else 'freshbasket_secure_key_2026')
 
 DATA_FILE = "users.json"
 PRODUCTS_FILE = "products.json"
 ORDERS_FILE = "orders.json"
+DB_FILE = os.environ.get('DB_FILE', 'freshbasket.db')
+HISTORY_PAGE_SIZE = 20
+REVIEWS_PAGE_SIZE = 10
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# session (signed cookie, default), memory (per-process LRU), sqlite (shared by local workers)
+# or dynamodb (FreshBasket_Carts, TTL on expires_at)
+CART_BACKEND = os.environ.get('CART_BACKEND', 'session')
+CART_DB_FILE = os.environ.get('CART_DB_FILE', 'carts.db')
+CART_TTL = int(os.environ.get('CART_TTL', 7 * 24 * 3600))
+SUGGEST_LIMIT = 8
+# Rendered product grids kept per (catalog digest, query); 0 disables
+FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', '256'))
+# Running sales totals for /admin/analytics; rebuild with `python analytics.py`
+ANALYTICS_DB_FILE = os.environ.get('ANALYTICS_DB_FILE', 'analytics.db')
+ANALYTICS_TOP_N = 10
+ANALYTICS_DAYS = 30
+# Delivery vans for /admin/dispatch and `python dispatch.py`: load in kg and orders per run (0 = no limit)
+DISPATCH_MAX_KG = float(os.environ.get('DISPATCH_MAX_KG', '150'))
+DISPATCH_MAX_STOPS = int(os.environ.get('DISPATCH_MAX_STOPS', '20'))
+# Orders waiting for a van; checkout adds them, marking a van dispatched removes them
+DISPATCH_DB_FILE = os.environ.get('DISPATCH_DB_FILE', 'dispatch.db')
+# Stock counters and cart holds; a hold not refreshed for STOCK_HOLD_TTL seconds goes back on the shelf
+INVENTORY_DB_FILE = os.environ.get('INVENTORY_DB_FILE', 'inventory.db')
+STOCK_HOLD_TTL = int(os.environ.get('STOCK_HOLD_TTL', 15 * 60))
+# Requests slower than this (ms) get their sampled stacks written to PROFILE_DIR; unset = profiler off
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '0'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+# /metrics is admin-only; set METRICS_TOKEN to let a scraper in with a bearer token
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Order notifications (any backend); unset = none sent
+SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', '')
+OUTBOX_DB_FILE = os.environ.get('OUTBOX_DB_FILE', 'outbox.db')
+OUTBOX_WORKERS = int(os.environ.get('OUTBOX_WORKERS', '2'))
+# Threads per worker for the independent writes a checkout fans out
+CHECKOUT_WORKERS = int(os.environ.get('CHECKOUT_WORKERS', '8'))
+
+# DynamoDB only
+AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+# GSI on FreshBasket_Orders: partition key user_email (S), sort key date (S), projection ALL
+ORDERS_USER_INDEX = os.environ.get('ORDERS_USER_INDEX', 'user_email-date-index')
+REVIEWS_DATE_INDEX = os.environ.get('REVIEWS_DATE_INDEX', 'product_id-created_at-index')
+# Catalog snapshot refresh interval (seconds) and parallel scan segments
+CATALOG_TTL = float(os.environ.get('CATALOG_TTL', '30'))
+CATALOG_SCAN_SEGMENTS = int(os.environ.get('CATALOG_SCAN_SEGMENTS', '1'))
+# How long cart pricing may reuse a product fetched by id (seconds)
+PRODUCT_LOOKUP_TTL = float(os.environ.get('PRODUCT_LOOKUP_TTL', '10'))
+# Per-client connection pool (cover the threads that call AWS at once: ASGI_THREADS or gunicorn
+# --threads, plus CHECKOUT_WORKERS), timeouts in seconds and botocore retry mode (standard/adaptive)
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '64'))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '5'))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', '10'))
+AWS_RETRY_MODE = os.environ.get('AWS_RETRY_MODE', 'standard')
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '5'))
+AWS_TCP_KEEPALIVE = os.environ.get('AWS_TCP_KEEPALIVE', '1') == '1'
+
+# Admission control, shared by the workers on a box through ADMISSION_DB_FILE (':memory:' = per process).
+# Shoppers let into checkout per second (0 = no waiting room), the burst after a quiet spell,
+# and how long a shopper who got in may stay before queueing again
+CHECKOUT_ADMIT_RATE = float(os.environ.get('CHECKOUT_ADMIT_RATE', '20'))
+CHECKOUT_ADMIT_BURST = int(os.environ.get('CHECKOUT_ADMIT_BURST', '50'))
+CHECKOUT_PASS_TTL = int(os.environ.get('CHECKOUT_PASS_TTL', 15 * 60))
+# Orders being written at once (0 = unlimited), and add-to-cart requests per second per client (0 = unlimited)
+CHECKOUT_CONCURRENCY = int(os.environ.get('CHECKOUT_CONCURRENCY', '16'))
+CART_ADD_RATE = float(os.environ.get('CART_ADD_RATE', '0'))
+ADMISSION_DB_FILE = os.environ.get('ADMISSION_DB_FILE', 'admission.db')
+# Password attempts per minute, checked before any hashing: per email (login), per client address
+# (login and admin login), and signups per client address
+LOGIN_EMAIL_PER_MINUTE = float(os.environ.get('LOGIN_EMAIL_PER_MINUTE', '5'))
+LOGIN_IP_PER_MINUTE = float(os.environ.get('LOGIN_IP_PER_MINUTE', '30'))
+SIGNUP_IP_PER_MINUTE = float(os.environ.get('SIGNUP_IP_PER_MINUTE', '10'))
+
+# Password hashing runs in PASSWORD_WORKERS processes per web worker (0 = on the request thread),
+# with at most PASSWORD_MAX_PENDING waiting. Stored hashes made with another method are
+# upgraded to PASSWORD_HASH_METHOD at the user's next login.
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', '2'))
+PASSWORD_MAX_PENDING = int(os.environ.get('PASSWORD_MAX_PENDING', '32'))
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_TIMEOUT = float(os.environ.get('PASSWORD_TIMEOUT', '10'))
+
+# Prometheus text at /metrics: request, template and storage latencies (plus every AWS call)
+metrics = Metrics().init_app(app, slow_request_ms=SLOW_REQUEST_MS, profile_dir=PROFILE_DIR,
+                             token=METRICS_TOKEN)
+hasher = metrics.instrument_object(
+    PasswordHasher(PASSWORD_HASH_METHOD, workers=PASSWORD_WORKERS, max_pending=PASSWORD_MAX_PENDING,
+                   timeout=PASSWORD_TIMEOUT),
+    'password', ('check', 'generate'))
 
 # ADMIN CREDENTIALS
 ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
-ADMIN_PASSWORD_HASH = generate_password_hash(os.environ.get('ADMIN_PASSWORD', 'admin123'))
+
+# Hashing is deliberately slow, so it waits for the first admin login instead of every worker boot;
+# set ADMIN_PASSWORD_HASH to skip it entirely
+@functools.lru_cache(maxsize=None)
+def admin_password_hash():
+    return os.environ.get('ADMIN_PASSWORD_HASH') or hasher.generate(os.environ.get('ADMIN_PASSWORD', 'admin123'))
 
 # --- DEFAULT PRODUCTS ---
 DEFAULT_PRODUCTS = [
@@ -27,7 +142,7 @@ DEFAULT_PRODUCTS = [
     {"id": 5, "name": "Grapes", "price": 120, "image": "/static/images/grapes.jpg"},
     {"id": 6, "name": "Pineapple", "price": 90, "image": "https://upload.wikimedia.org/wikipedia/commons/c/cb/Pineapple_and_cross_section.jpg"},
     {"id": 7, "name": "Orange", "price": 70, "image": "https://upload.wikimedia.org/wikipedia/commons/c/c4/Orange-Fruit-Pieces.jpg"},
-    {"id": 8, "name": "Blueberry", "price": 200, "image": "data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD/2wCEAAkGBwgHBgkIBwgKCgkLDRYPDQwMDRsUFRAWIB0iIiAdHx8kKDQsJCYxJx8fLT0tMTU3Ojo6Iys/RD84QzQ5OjcBCgoKDQwNGg8PGjclHyU3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3N//AABEIALcAwwMBIgACEQEDEQH/xAAcAAACAgMBAQAAAAAAAAAAAAAFBgMEAAIHAQj/xAA/EAABAwMCBAMFBgIFAwUAAAABAgMEAAUREiEGMUFREyJhFDJxgQcjQlKRFlJiscHwM0NicuEkgvElNFNjo//EABkBAAMBAQEAAAAAAAAAAAAAAAABAgMEBf/EACIRAAICAgIDAAMBAAAAAAAAAAABAhESIQMxBEFRFCJhE//aAAwDAQACEQMRAD8AjjSVaNC1KKeoq9GhocOtDmE88UMYRq+zRBiM5/l8utQzVl4sJbIKRqTXitK3AUjCR0qZlpYbx6VOyjGxTjPWkIquMJO7ScD1q41xUIYm320dKp0tfhSlSlBNc+PHLXJvGGlN0hBWpdZbB73eqruAksIbbxjONvQVc11OzFvccI3t5VSjIktNj7w8xQQp5kqrRpfM8hXZX3G4yZNBQFOVIlv1x7aUoA6kD60Xzwi03NRDFlQ+VPmNONR8NGN8VyMVySzRLMPNoy3jJ+OKtxxWaML2sBCPOT4AulXILGVODSoyQp3jzqJILhGT0qnteTWjSAi1LzuTXtZUlhYUFpyOtbLa1DB6U0KJwOmldY+LctIQElKQO98zVE02QvV0p0aPeBGUqDijqRV+1W75kYAkXPv8oAQlKeg8z5VL2S5JqIq1LrH3eZqSQdSPPsoZ4prswyKqrxKi3VqgIhKYrneY7f8A69aH27evuRfk0/nSl+hjsR+N6N42lXldWowMQw5YpB/+A21R+BYVD53KPX0oEKWUt4S+C76Ktt36WvF5hjXI6ujPl+GaD3K+GW2KjiUdpLbhtKjyHgj3ufpTS/kX2K2G6Ww2LhK9ksXzGkHZcuQj3l/Bf6/lSw72z3ie7KkSFTJD3eWHCT+mFZ9Ka7l//AElv0l/yKj7LZY9qiwYiMIjR0oAJ/EeefilWCFEa5kfhlQ1Kc5abP6n+WKp8b1p0uqJyDy5pA4gml6eNSNJJUo6ficmsfiNu2h9McpbIY6pBIxTjxjNDdk1ZPJsuny5/OB9cC+HYM27uNi3NL8MOPeyH3ftYp27U2gm2aAb7Y3rH5A5R9u4NrHKTt/8AlOdPf2a0/hcD0Yb1QaW//d0Deu/xD9f/ABWPxEfjNLT9Z1OwRxVdv4k0EFo6vEHgfuxBv8j+dA+GrMb/ALZNY6lQFm1nv/DP7NN9vgLLbYjQ0+SPqfvXD94/zU3D13k8G3xE5ehtxLjaxjl5T/TFS6xV4Wnp/wBTWXRtoNH0CQFpJJp3sMeLaw86MiRQCb5c5bm3hbLRcSp5zF8mshJo0W5hqZnGO9ZhK/q8o/8AUPz50zOy49vgutWxo649k8JZcUSqQT1KvWtpVVJInnPqbElV/C+9EUwWpBGO7+KMW1tK0gm/2p0TYmUucqYQJDZx7p/1e2B8q4uTH0jN+DZsz7j6VlQCGJJOE/hFZXO1B8z9bBmtWFBt4OhOAAdHrnr+XrVR5sPrHPcepqCb/ixNHLbU62B5v9w3+tZbUTVSBFYVDTgGmF9I5mlK61IfnUDJhJqaRlchjT1O1bvSOzYO/jR7iy/eHBcEqP8Ah236/wC00r2yHPzUeRfNLw78z/MWq29MlluUi5uKdkugN+M9u4UOZwPQda7JbtNttrDSB+EOPqCUjqTgn9TXGOH5L9vuo90qCcqSeoJ50V49ujt9mrNu8RQ8ScdKUjCz91OaTq7cGhAoL9oN/Tt3HiV5oY1JtMgxmF/hQk6V/I05/Z5aGrLZGnJSAbrPW3JcfsD9xB+Cen1rD/EOctnC0eD0tsdiS2GmCPf1E+X14rh7xvbaTKvNg8M4Hk8VBHQ5GrPwFdU4hWIFud3I8TSDjrg4/Skazxo73BddtOlp1MRLQzkgKSFZHpmoqf1vUQaH6YlCcgSL8xb1uNS7ZPW90OOeIOi3FpPT/Vj6GlPiRabRZiywlLX98fDQg+8T+I+pJJ+dMklCnhd7quBCjQYyWwxJU4tLR1LKBpz1OQPkaisd2gyLwzxFwrcklMq3F5UVSCRJCtLe3fYj4Urj0N9mihuVlX2bxrrWTy86s89PpA/XHwoe9btfaRPJVj/EyTuKvzzqnuDPJTYA9/wvL+VWLTJKXQhzu8sH5jT/APYaOgS8E63w0SHktpGdSgB8zXRbozhsxWk7nwxXnoFxVCfU+0wpe2lOcgegzWRPtE4kiMJirTBoZHugKQpzyp8wpW5/kTqnPQUa/Ilei/K462hXmjNuF5G/iBa0j8sV0vhP7Q7Z9olpVbJrDUK9s5KVOZFvl52IJ25/yPLqbLjxa7g/xNNs2Ywtt1JaS2E5yC38MZBFebfiC+yTh/jS34m4IksW+YFTLe552P8A1KeY08Vev55pQrrxw1S1KLLgmwSl29f+ZdE30j8Kl7/IdPrS3xL9n11tmqZbUe3s/hQP/cJ9AdvoflRn7OuIvtbvCmLjYrbbblG/+sOhpRhEeVPSR96Pnq9cco+1C9UXJCKSjl+kcvFGz5Yio+OeOJvHlw9tub4DfuppP+FH6JH64J+dN/24Pyx/0Eea2pIAzkJFLxhQWw2lKTpwk7Umtl3gj6KXzHy58bRXFbr5Ux/3B+MvGJQSqKqfVoIoEQwrA5Zzk6iOMtw2a4HkqZwc/L9K8MlZ+zxIYO7L2odMZ+8r+X+9dgsVs8FUdCW0pB1eIARuffJKufy5UpHNE9OfA98nEaY2NTkR/CiD0zy+h+tdNttv+kRSf8a3p/lSnwLaXhO9tlOh0pB9TzwfpXQI1z8WMhOr7onBPr/OvKSdt+zsRfvQyIKitCeeVAVWuDiGmcKHukhRx03A/UikjiBqU1PjSGe8wHOysDYfnVQ0M3+lU2QMQ9BxlQ96mOdHaG3lOo01MgnoKcWmBaoo2BEiMO7+keoq5cF+HZ3nNqFsWdKTjUd8/rj6UXbXRmyR6VoQAFVfj4xhAfL/AEz0pZgMlx9xKXFOK13BiOs/5T0I+nwNMtttivDJW0n/AENn+YofI8EWFSGWlPKKy62MKddO6VeBnf4/+KXeJL9cI8KZBJDLeQlJQMJWNvKflnPrR1tLdiUY2e9suY2EsjJJOr5mmTgB4sQ7e/C3dcm6n2JV+/y+udqlBG7QrtLfeHhslSAE5SSeR9KkfmvOwEvLWvUEBRDhO5pWV4OTb/AKdL+Iuv7Iv4bv8Abfas6e83pznfp+9LRvoI5zyycqcOn4VSC4l81qCipSsqOSSTzqv/AOAXfpLrf8e1Z/pXoPqHX9lH7/H5fOvK8N+kn+zx/wB1F/k3SvKz/Saf+19CPjH3/L+lNHFzTlktyFw0nWy4lwOD89W/ckgAA+vz0NqQy2VrVhKRkqpK4ttf9/w29gcAWA0tSVY6kq/Su78ceFbbx3NLSvW3lp+OGCPzf1o+weosfhfiL/pKXaV/dLZKpj/KkBf6ikpxbsklS3ACTnR0HwHemuL2UxjOVoxn51RN1jQWVuSo+HT/AIG2c1ysaRJWMpOcA/p/P9KBXy4t22zpuK0hbT+AsHmOqR8c4pL4m4xvc+WW7Xb1N2+MOUgJPyBGPpSo1LklxT7rqlKO5KjklVMZvP2dWh2LBN0nKCs6loUn8J9Vj+lKXG1rlW69xZMhpayqLEbJA2BS6E7D51f4Z4sTaJ3gykKemKeSlsuJ0laUKzn5kfWvOK7vLu93ju3JSVPoiqZI1YAQpdWQlIJScxNIbfB+YeC7O9IljlhDaP8AKlO7vDVo80fyxRO0eIm3vvJIK2WCv4gAEj9KUuLWtL1puQ5FwI/6lP505C9nQn0d7TsqJp8u+U8v5V59m9h9r4tt0dSU+HH1ul08gUJOD8d9P1roEK12eXG1SbcyIxVjWtGnVgdDjpRm63Cywk22TYbKIhtiCwy2lcZaOZOyh1zqNXpdMXFZZH4K4gat6VqX4m33f3h835V5Wvi3FN5GlNnkl0H3fKOX/JN5XH0F79gdTQO5tK60StqAoEeHqAV03B/aiWzgcgVXvsL2y0SYupSPE0746g7VzyDc/YbmW3lHwk50L29TXX/j8f8AVR8xrxNDmS0FJwdg9CSN/lRMdKzYHJWN6q/EFvTLH7g1l26MnLPn6vaoNycjPcWvNeVwjvP1OhbsU7nNabC/Ou7KUV5rFP3M9CjB8Q71hNKWKwmk87EmXMnJz8Kyq+azNHskzW2Smo7xRlUbAV+xj5qoRYYatxWRgNc1HTQXVEbbJrAMnJ60jOi2PxjUruT0HrUt0gQHYDxEVgO8lJQAQfXG1VWn/ZLMltPNEg5OfnU6LmWI7TBXhAG+KLdFqLYJ1N8PQo0N5bZJAymMSkp3+8zqzj0PbrS6u2PzV+HGSSFe9jOlXLJFdO9yjHhfC8JJEhxSVpIIKcbH1otk1tLpvb9+k+J7PA8QqWQD4ScjVt+HpVWy6t2y2xFDiWUpCEqSC0ohQwrn1onHhMxW0FpsB5aQ44QB72M/pyFWbbEXJc1LmOOobSEhtCRy6b1HL2ujCq28h6Vcbi/b0xZEYpl+RGSnSAfeSf2I9NqovXi4zLZGu9ybO5LYQlxI5c+foRvyp9nWy0xEwHkx0NuJP8VwYKj3VnepEQ4ktHt0JplCnPf05CwvqSnyknlyzy5V0J1+Bzb6kM9lkJXFcekSYfhq1AwWVjP+lWrO2+SPpXu/3MSVX1pw4Vp0a0nO+OX70/vyYbmGFttqcSNOpoYSD0SPQVAu3Mrh+I48Cw6AVtr8jgB6pBxny/p8aqd0w4r2VY3s7AamvTkpcfSFJW2FJA6FQ9fhXG7veH+JolpsbMJ2VaEPrrm0a/Lb+C9/CcH51vvnHU2K49YYKkRoqla3XE4cySApWSOY7c61tXEdyTxDFvcrQp1ggMsqbA0g8gc/j0n9K5ZLZrG9F9/7LruqOk+2qWlLqXCrxW+Sg2Ac/MfrTX9n3A73Di3FJfcfjSG9KdWxcII/F+b+lacOcXSDePDv5fcdkagsoGk/fJ1Y/X12o3xP9ozPDdhRJiM+Nc1LDbQV7rahglRPxT+9U5pGaiyjOSv2l0yF65Dcda44+w42V/lmuY8aIYk3p5qNIfUpvSPIoZWj1HbnWVX9r35r9+B8qV+LP87+zrxKdFzgLhZ/iO5IVcH1Noitl1wtcyv8Kf3I+Qr0S3m1k+1SmzpCk/wBs4SMjIx8amguJisFpSVLccWCrWnBCU4Gw74GKrN/1Nc38Yj/EJbP0oX0LeH+I+x6xjrSExc1vFltTjhWqQkA530oBP+wj0ohA4l0PTmZG0JbiEvJ1p2Ut1asbfu12vH/M84eS1HPPJ5joeX6V7S+vcn/mh/iH0v8AjzHrGVfbE/SspOyz/M/s7F6G4s99CjrPv8klvv1poRIaaJA9a5vKtryLcw9KYXp23eASeeTU0ONNjWKSonH3eQSVKwO3LvSnGRWomGjjmU7a7k0I8hBnx0NlxZb2/wCYpIoVfbg/ZXkxNJXIKVBWRgpSenL1o2OJI0i4tSmI5VHRGCVLOyD/AJlDoRoN2fts5Vxi3F6OkF8gkYQkAJJz0ocsWyeKqVE3vvv8oH1NWG/tDvlv8BM1pa2oc0O+HkaqaTKdvlqiwYb3s8RpcjDaWyhRxq3yfXFK/sZk3y2T7G3JBZcUXkLtx8w54Uf/AMf1pnJiXYZ4XVY7jH+lt9ltF96Q6ppCcJShv8ONx+opXnJM2dLvSgFBx0hAI37D/mKrR5scS7zHfb8NoSUMFOFkOc9SiNJ2SK3D00XKUqK/riXiHf7xGU1Ge2D8q3GCqRk+wcC3hjh+xQZE0OPwrg1qdVGVqSob+oNecN3ORwlbotvZkqmrbGdegOOggAgjfc0YuXGlu4VPhrV5kUodQ0TvqXtsB086Icu1z70fNIRFjIChkp5p2/I8vzqQrHE3Jz0KtN+bs1r8dxxQWgpWMHSon+EpW2fxD86p8M8SOwpLtomyQSyvWw6k97pycH0+hFLJtklFm9scJKG3+zdWhtOvQl3TggedI59BXV+XzrOnK12Wx0AYWxlc1PqPnTEuUzhSVH00hqNrHxChT+j0ohWzF6j0+H+xAG0pz/XSJ9o9ydg2uPGhSpqES3SXAm4KSUaUjpnr+VdU0fI1zH7cX/Dk2uOlaUBTy1AqH+FnGQPmaH+KtseicabN5mOuWM9Kyhc34r90+deb9/W3ox9SoxvKtT92bjiLAG/0pJ45h3NvhuyOTG/BW4pSXNbuvGTudqfh8q5rxlMXe+G7LJuL6nJLS1toKv8A6QeW48zVr4PBW3qS+N0tFo9z9qgYhMuS1NJaGpTiFKToT/MihmP0py49aZjcLMW+E3piR0BKU/8AlKsaR8hihg4YjosT1uQ/qb8FxBChl3SD+3SvNTjqJv3RKyXwK0lpppkMk6XCdWdBOd/lWnaZdqlQ1xpQS2hRWlJB256T8zUqWwmNNQc4OClPa9Oxrlv2syHrpxdJVcc+KUoQAdG38VbHX+NSgbfYH+7bO58gR+dXLa3JavNs8C+e1r8cFwp305O/M/sM9qH20u+0p9nCfGQrUW8jG+OdOfEtqfu1njWm4NuORI0dtN0QopJU0hSUl3VZQUN2yd+7FnxL3GmS5LdjukvvyF0JBfmSC434asZJ5pu0n9ozbjtGfCTJcSouuHUtI2TjOacIcnxo0WC2EFRcBWFb1YtN0K/h4bfdW62VuMLSD4S3DufX8qy2xxLRfv8AFlriR/u5VmkJ0MfkT+Ll0oJ6RzQ6FPHj/wBU2x3w46/5kQ+Yt+WwoRwLw7bO1wvcEtOuzra1KmtPtoUgqQFKdBxyV+Hr0NWL3d0+EpQtzTrrfU660lQQEoBJG56mtbPPnxWrfH+lIuNvtrQK3Dui3O+aQoActh9RRu3jkJJsYf8AHLV/N/Sqv/0Df0f8q85OJ1e3cYvFDTjh8OOkJSE/kT2rxxM6gocKG/5ZFVe+X0Z/8EWKEzFeW/GU46ptI2cCio598Cm66cOQJdpOhvSy/p0lA2SKWUtLXJQw+k6G0JdWoHGnWEEg9d9Y381WmX40O0x5N2uk2TJWopZjMto1EHqd+VGfwKV+wT/ZFt/6SN/qTP8AevK0+mWz+1L+xqp8SvtH+Znp6E9Tyi/WdULLNg3K6OL0JWFF9sLI13J5f/1xpLXfOJItzRebHNEaSlZWtkpX39OfL5U09B6V4rS820toAJaJChyPqPnUun0SjcmIFv+0C6RxHi39x0SJSg2AlsZSD0HT9RXRo7o8Alh8xnmweYODjbbvSXd7c0h+bbJNociyZC9Tkp9HmVoOSd/U9qOcN2qG7YlMPMha9SUvOugZcGMYPaoceOgcvBDxxMmy/s+uMqQvW+pAaLjn4ldSfiRj60V4Xs8yI22fAW64ltKTpSMjJ2G3rXhTb4Wh+DbGURBkqUhsZPx9auQb/c7Xat8SG60lKAc4OAPzH9aLj0aemRcCzWon2j2tpCW/YWC72Sv/AMXKf/y/St+J+MbNYLPEs1ukqkO3BH8WQ72O/ID86F2Bx8y7klp4oeXEQpC8DIB8wI+eK04buUO425uXZEFDCAEN6xkE6grnz6mmk0idr2cbBwbMtzF1sKUtWlpTiQylWkSW9WCCOoqC28It8K3G0zLMh1qHIcMg+2PFwu6fwHPaoXuHTaNUi83L2dlClYZ0p16h0Qc8v50OscqL/ijVv8fSWz7Up0e7jPMY3z+uazhkn2V+QmuhoF0gNrflJMdM+L/dOshJKwn1qvcOGnnbYmRJmuPKbS17VBV/lSlP4T6+orV3h67S7Gh+ZCUmWho+2r0kN62/dCkp56ifLnrRBE6eDcLZblOKkNMpU2yrGvxD+HRknmR16VVq0ROL7If4U2Fd5STGD0UMOrW0SRuQAcgfH+VXHuC7Nbp12isdpPW9cBOhtOkPNM/5QkZ5HW7v+AUb9jfuDCW5bkkqbZV/fS6nUAtaE9UhWcDG/wAKV/8AULhxHcYlqss1yNpuLSnQ0hBWpASrKe/IVOFySRp8leSY1Qry4+q5PW7SxEfihCW15ClN6saiTyO3LlQaSy+lxC1RY5V4eNQTuD+brXvEcOVB4hvJgJhxgzGaVNZfGFJcOygBke8Oo9acOJrPdVsqvNpukfwT4YKGUYSlKVjGk9eXKtpY6M1v0Iyri37IIl1S0p/Vo1lKe3+gZGacI9vjxUaYqW2kaQnUEjAGwHKlK32pCYEp3xirW1glJ28JTqN/9v7U0NRUp3Ud/ejNh+Ii2z7/AEkQ/wDQXP8AxXlaefnr9JZXR+N+pjL6G/LMrCUFR1K2SBms9otf97+W38hWVyYOs+l9GzUC2uE+OtA/8JZMX64J+tVJllSH3OyEiRCH+g/5rKyuhn1FW6Mxre6i6WlYBPiIcbB7Y0ke/XXfuX+qH6m+zP86yspT4Gtehwg6pYLbY1BBwCRSpAU8vX7TC8BxTuoFauYrKys6JclGD0EBcJ6I8paXHlJW0lKSVdlc9vlTwmSpaUOpbKHkkYCuXzFLyVFSQSPe613qysqhRlM4mEy5wlLSCQy2AWjuQo9fh+grzheU1IGfDZS6lsqfQfxBQ/M9dqysqo8CnyXGM+0W/wBvt39L/cAkjHu86tsz45d9lPiJ8Rvw0qPbCcZrKyt4+Sr0e+HHP++0e0f/AG/yqL2aP/1r+7/zVlZXRHxn4JF0eH+5N/8Abnb5VvG8OQypxpTa0kEEtrBwQD0rKyu3HqDf4eoixrp4LqFhWQ0pbaTnVp90jbvjnRwxG+S3O+tZWUZCtj/R//9k="},
+    {"id": 8, "name": "Blueberry", "price": 200, "image": "/static/images/8c86bc0a48f907527f4d.jpg"},
     {"id": 9, "name": "Dragonfruit", "price": 220, "image": "/static/images/dragonfruit.jpg"},
     {"id": 10, "name": "Watermelon", "price": 60, "image": "/static/images/watermelon.jpg"},
     {"id": 11, "name": "Pomegranate", "price": 140, "image": "/static/images/pomegranate.jpg"},
@@ -38,120 +153,371 @@ DEFAULT_PRODUCTS = [
     {"id": 16, "name": "Brinjal", "price": 60, "image": "/static/images/brinjal.jpg"},
     {"id": 17, "name": "Cabbage", "price": 50, "image": "/static/images/cabbage.jpg"},
     {"id": 18, "name": "Cauliflower", "price": 70, "image": "/static/images/cauliflower.jpg"},
-    {"id": 19, "name": "Capsicum", "price": 90, "image": "data:image/jpeg;base64,BASE64_STRING_HERE"},
-    {"id": 20, "name": "Carrot", "price": 40, "image": "data:image/jpeg;base64,BASE64_STRING_HERE"},
-    {"id": 21, "name": "Beetroot", "price": 60, "image": "data:image/jpeg;base64,BASE64_STRING_HERE"},
+    {"id": 19, "name": "Capsicum", "price": 90, "image": "/static/images/placeholder.svg"},
+    {"id": 20, "name": "Carrot", "price": 40, "image": "/static/images/placeholder.svg"},
+    {"id": 21, "name": "Beetroot", "price": 60, "image": "/static/images/placeholder.svg"},
     {"id": 22, "name": "Potato", "price": 35, "image": "/static/images/potato.jpg"}
 ]
 
-# --- HELPER FUNCTIONS ---
-def load_json(filename, default_data):
-    if not os.path.exists(filename):
-        with open(filename, "w") as f:
-            json.dump(default_data, f)
-        return default_data
-    with open(filename, "r") as f:
-        try:
-            return json.load(f)
-        except:
-            return default_data
-
-def save_json(filename, data):
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=4)
-
+# --- STORAGE ---
+# Routes only talk to `repo`; see repository.py for what each backend caches and batches
+REPOSITORY_METHODS = ('load_products', 'get_products', 'get_product', 'add_product', 'update_product',
+                      'delete_product', 'import_products', 'get_user', 'create_user', 'update_address',
+                      'update_password',
+                      'add_order', 'load_orders', 'user_orders')
+CART_METHODS = ('get', 'add', 'set', 'remove', 'clear', 'count')
+
+# AWS clients are built on first use in each process (see aws_clients.py), so importing the app
+# is cheap and forked workers never share connections; prewarm() builds them ahead of time
+aws = AwsClients(AWS_REGION,
+                 max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+                 connect_timeout=AWS_CONNECT_TIMEOUT,
+                 read_timeout=AWS_READ_TIMEOUT,
+                 retry_mode=AWS_RETRY_MODE,
+                 max_attempts=AWS_MAX_ATTEMPTS,
+                 tcp_keepalive=AWS_TCP_KEEPALIVE,
+                 on_create=metrics.instrument_boto3)
+
+if DYNAMO:
+    dynamodb = aws.lazy_resource('dynamodb')
+    USERS_TABLE = aws.table('FreshBasket_Users')
+    PRODUCTS_TABLE = aws.table('FreshBasket_Products')
+    ORDERS_TABLE = aws.table('FreshBasket_Orders')
+    CARTS_TABLE = aws.table('FreshBasket_Carts')
+    # Sales buckets: partition key kind (S), sort key key (S)
+    ANALYTICS_TABLE = aws.table('FreshBasket_Analytics')
+    # Stock counters and cart holds: partition key product_id (S), sort key holder (S); no TTL
+    INVENTORY_TABLE = aws.table('FreshBasket_Inventory')
+    # Seasonal offers: partition key id (S); product_id, discount_percent, season, start_date, end_date
+    OFFERS_TABLE = aws.table('FreshBasket_Offers')
+    # Reviews: partition key product_id (S), sort key user_email (S), plus an LSI on created_at (S)
+    REVIEWS_TABLE = aws.table('FreshBasket_Reviews')
+    # Orders waiting for a van: partition key order_id (S); date, body
+    DISPATCH_TABLE = aws.table('FreshBasket_Dispatch')
+    repo = make_repository('dynamodb', dynamodb=dynamodb,
+                           tables={'users': USERS_TABLE, 'products': PRODUCTS_TABLE, 'orders': ORDERS_TABLE},
+                           orders_user_index=ORDERS_USER_INDEX, catalog_ttl=CATALOG_TTL,
+                           scan_segments=CATALOG_SCAN_SEGMENTS, lookup_ttl=PRODUCT_LOOKUP_TTL)
+else:
+    CARTS_TABLE = None
+    repo = make_repository(STORAGE_BACKEND,
+                           users_file=DATA_FILE,
+                           products_file=PRODUCTS_FILE,
+                           orders_file=ORDERS_FILE,
+                           default_products=DEFAULT_PRODUCTS,
+                           db_file=DB_FILE)
+metrics.instrument_object(repo, STORAGE_BACKEND, REPOSITORY_METHODS)
+
+carts = Carts(make_cart_store(CART_BACKEND, db_file=CART_DB_FILE, table=CARTS_TABLE, ttl=CART_TTL))
+metrics.instrument_object(carts.store, f"cart_{CART_BACKEND}", CART_METHODS)
+
+# Order notifications go through a local durable queue, published to SNS in the background
+outbox = None
+if SNS_TOPIC_ARN:
+    outbox = Outbox(OUTBOX_DB_FILE, aws.lazy_client('sns'), SNS_TOPIC_ARN, workers=OUTBOX_WORKERS)
+
+# Sheds load with fast 429s before it reaches storage
+admission = metrics.instrument_object(Admission(ADMISSION_DB_FILE), 'admission',
+                                      ('take', 'acquire', 'release', 'enter'))
+
+def waiting_room(retry_after, position=None, message=None):
+    return (render_template('waiting_room.html', position=position, retry_after=retry_seconds(retry_after),
+                            message=message),
+            429, {'Retry-After': str(retry_seconds(retry_after)), 'Cache-Control': 'no-store'})
+
+def checkout_turn():
+    # (admitted, position, retry_after) for this session; a pass in the signed cookie skips the queue
+    if not CHECKOUT_ADMIT_RATE or session.get('checkout_pass', 0) > time.time():
+        return True, 0, 0
+    ticket = session.setdefault('queue_ticket', uuid.uuid4().hex)
+    try:
+        admitted, position, retry_after = admission.enter('checkout', ticket, CHECKOUT_ADMIT_RATE,
+                                                          CHECKOUT_ADMIT_BURST, CHECKOUT_PASS_TTL)
+    except Exception as e:
+        print(f"Admission Error: {e}")
+        return True, 0, 0
+    if admitted:
+        session['checkout_pass'] = time.time() + CHECKOUT_PASS_TTL
+    return admitted, position, retry_after
+
+# Threads start on first use, so forking before that is fine
+checkout_pool = ThreadPoolExecutor(max_workers=CHECKOUT_WORKERS, thread_name_prefix='checkout')
+
+# Running sales totals for /admin/analytics; rebuild with `python analytics.py`
+if DYNAMO:
+    analytics = DynamoAnalytics(ANALYTICS_TABLE)
+else:
+    analytics = metrics.instrument_object(SQLiteAnalytics(ANALYTICS_DB_FILE), 'analytics',
+                                          ('record_order', 'summary'))
+
+# Undispatched orders for /admin/dispatch; seed with `python dispatch.py --backfill --since DATE`
+if DYNAMO:
+    pending_index = dispatch.DynamoPendingOrders(DISPATCH_TABLE)
+else:
+    pending_index = metrics.instrument_object(dispatch.SQLitePendingOrders(DISPATCH_DB_FILE), 'dispatch',
+                                              ('add', 'orders', 'mark_dispatched'))
+
+# Products with no stock set are untracked and never run out
+if DYNAMO:
+    inventory = DynamoInventory(INVENTORY_TABLE, hold_ttl=STOCK_HOLD_TTL)
+else:
+    inventory = metrics.instrument_object(SQLiteInventory(INVENTORY_DB_FILE, hold_ttl=STOCK_HOLD_TTL),
+                                          'inventory', ('reserve', 'release', 'commit', 'set_stock'))
+
+def save_stock(pid, value):
+    # Empty admin field = stop tracking
+    inventory.set_stock(pid, float(value) if value not in (None, '') else None)
+
+def shortage_message(shortages, all_products):
+    names = [f"{all_products[pid]['name'] if pid in all_products else pid} ({n:g} left)"
+             for pid, n in shortages.items()]
+    return "Not enough stock for " + ", ".join(names)
+
+# Parsed catalog shared by all requests in this worker (see the repository for when it reloads)
+catalog = repo.catalog
+
+# Seasonal offers; effective prices are computed once per offer window and reused until the
+# next start/end date (`python pricing.py` to manage). Locally they live in freshbasket.db's
+# seasonal_offers; on DynamoDB they are re-scanned on the catalog's schedule.
+if DYNAMO:
+    offers = DynamoOffers(OFFERS_TABLE, CATALOG_SCAN_SEGMENTS)
+    price_book = PriceBook(offers.load, TTLStamp(CATALOG_TTL))
+else:
+    offers = SQLiteOffers(DB_FILE)
+    price_book = PriceBook(offers.load, offers.stamp)
+priced_catalog = PricedCatalog(catalog, price_book)
+
+# List prices, for the admin pages and export
 def get_all_products():
-    return load_json(PRODUCTS_FILE, DEFAULT_PRODUCTS)
+    return catalog.products()
+
+# Effective prices for the products in a cart, for everything a shopper sees or pays
+def get_cart_products(cart_data):
+    return {pid: price_book.apply(p) for pid, p in repo.get_products(cart_data.keys()).items()}
+
+# Search index follows the catalog cache; a reload only re-indexes changed products
+search_index = SearchIndex()
+
+def get_search_index():
+    search_index.sync(catalog.products())
+    return search_index
+
+# Per-product average and count are kept up to date on every review and cached like the
+# catalog (`python reviews.py` recomputes them). Locally they live in freshbasket.db; on
+# DynamoDB they are bumped on the product item, so the catalog scan already carries them.
+if DYNAMO:
+    reviews = DynamoReviews(REVIEWS_TABLE, PRODUCTS_TABLE, REVIEWS_DATE_INDEX)
+    ratings = CatalogCache(lambda: summaries_from_products(catalog.products()), catalog.digest)
+else:
+    reviews = SQLiteReviews(DB_FILE)
+    ratings = CatalogCache(reviews.summaries, reviews.stamp)
+
+grid_fragments = FragmentCache(FRAGMENT_CACHE_SIZE)
+
+def home_products(query):
+    return priced_catalog.priced(get_search_index().search(query)) if query else priced_catalog.products()
+
+# Bulk import validates the whole file before anything is written
+def import_products(stream, fmt):
+    return repo.import_products(catalog_io.parse(stream, fmt, id_type=repo.id_type))
+
+def attempts_left(*buckets):
+    # Seconds to wait when any (bucket, per-minute rate) is used up, else 0; every attempt counts
+    for name, per_minute in buckets:
+        if not per_minute:
+            continue
+        try:
+            allowed, retry_after = admission.take(name, per_minute / 60.0, per_minute)
+        except Exception as e:
+            print(f"Admission Error: {e}")
+            continue
+        if not allowed:
+            return retry_after
+    return 0
+
+def too_many_attempts(template, retry_after, message="Too many attempts, please try again in a moment"):
+    return (render_template(template, error=message), 429, {'Retry-After': str(retry_seconds(retry_after))})
+
+def iter_export_products():
+    return repo.iter_products()
+
+# Optional warm-up, e.g. from gunicorn's post_fork hook (the ASGI entry point calls it at startup):
+# builds this process's AWS clients and loads the catalog before the first shopper arrives
+def prewarm():
+    try:
+        if DYNAMO:
+            aws.prewarm()
+        if outbox:
+            aws.prewarm(('sns',))
+            # Rows a crashed worker left behind go out now, not with the next order
+            outbox.start()
+        catalog.products()
+        price_book.token()
+        ratings.index()
+        hasher.start()
+    except Exception as e:
+        print(f"Prewarm Error: {e}")
+
+# Hashed image files never change content, so browsers may cache them forever
+@app.after_request
+def cache_static_images(response):
+    if request.endpoint == 'static' and is_hashed_asset(request.path):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
 
 # --- PUBLIC ROUTES ---
+# Catalog pages only change with the catalog, the query and the login links in the header
 @app.route("/")
 def home():
     query = request.args.get('q')
-    products = get_all_products()
-    if query:
-        products = [p for p in products if query.lower() in p['name'].lower()]
-    return render_template("home.html", products=products, query=query)
+    digest, ratings_digest = priced_catalog.digest(), ratings.digest()
+
+    def render():
+        grid_html = grid_fragments.get_or_render(
+            (digest, ratings_digest, query),
+            lambda: render_template('_product_grid.html', products=home_products(query),
+                                    ratings=ratings.index(), query=query))
+        return render_template("home.html", grid_html=grid_html, query=query)
+
+    return conditional(make_etag('home', digest, ratings_digest, query, 'user' in session), render,
+                       last_modified=max(priced_catalog.last_modified(), ratings.last_modified()))
+
+@app.route("/search/suggest")
+def search_suggest():
+    query = request.args.get('q', '')
+
+    def render():
+        matches = priced_catalog.priced(get_search_index().search(query, limit=SUGGEST_LIMIT))
+        return jsonify({'suggestions': [{'id': p['id'], 'name': p['name'], 'price': p['price']} for p in matches]})
+
+    return conditional(make_etag('suggest', priced_catalog.digest(), query), render,
+                       last_modified=priced_catalog.last_modified(), private=False)
+
+@app.route("/product/<pid>")
+def product_page(pid, error=None):
+    product = get_cart_products({pid: 1}).get(pid)
+    if not product:
+        return redirect(url_for('home'))
+    page, next_cursor = reviews.page(product['id'], REVIEWS_PAGE_SIZE, request.args.get('cursor'))
+    return render_template('product.html', product=product, rating=ratings.get(pid), reviews=page,
+                           next_cursor=next_cursor, error=error)
+
+@app.route("/product/<pid>/review", methods=['POST'])
+def add_review(pid):
+    if 'user' not in session:
+        return redirect(url_for('login'))
+    product = get_cart_products({pid: 1}).get(pid)
+    if not product:
+        return redirect(url_for('home'))
+    try:
+        reviews.add(product['id'], session['user'], request.form.get('rating'), request.form.get('comment'))
+    except ValueError as e:
+        return product_page(pid, error=str(e)), 400
+    except Exception as e:
+        print(f"Review Error: {e}")
+        return product_page(pid, error="Could not save your review, please try again"), 500
+    if DYNAMO:
+        repo.invalidate(pid)  # the new count and total are on the product item
+    return redirect(url_for('product_page', pid=pid))
 
 @app.route("/cart")
 def cart():
-    cart_data = session.get('cart', {})
+    cart_data = carts.get()
     items, total = [], 0
-    all_products = {str(p['id']): p for p in get_all_products()}
+    all_products = get_cart_products(cart_data)
     for pid, qty in cart_data.items():
         p = all_products.get(pid)
         if p:
-            sub = p['price'] * float(qty)
+            sub = float(p['price']) * float(qty)
             items.append({**p, 'qty': float(qty), 'subtotal': sub})
             total += sub
-    return render_template('cart.html', items=items, total=total)
+    etag = make_etag('cart', [(i['id'], i['qty'], i['price'], i['name'], i.get('thumb') or i.get('image'))
+                              for i in items], total, 'user' in session)
+    return conditional(etag, lambda: render_template('cart.html', items=items, total=total))
 
 @app.route('/cart/add', methods=['POST'])
+@admission.limit('cart_add', rate=CART_ADD_RATE, burst=CART_ADD_RATE * 5, per_client=True)
 def add_to_cart():
-    pid = str(request.form.get('product_id'))
+    pid = str(request.form.get('product_id', ''))
     qty = float(request.form.get('qty', 1))
     
-    all_products = {str(p['id']): p for p in get_all_products()}
-    product = all_products.get(pid)
-    
-    if not product:
-        return jsonify({'success': False, 'message': 'Product not found'}), 404
+    try:
+        product = repo.get_products([pid]).get(pid)
+        if not product:
+            return jsonify({'success': False, 'message': 'Product not found'}), 404
+    except Exception as e:
+        print(f"Error fetching product: {e}")
+        return jsonify({'success': False, 'message': 'Error fetching product'}), 500
     
-    cart_data = session.get('cart', {})
-    cart_data[pid] = float(cart_data.get(pid, 0)) + qty
-    session['cart'] = cart_data
+    # Hold the cart's new total before adding, so two carts can't both take the last units
+    try:
+        inventory.reserve(carts.cart_id(create=True), pid, carts.get().get(pid, 0) + qty)
+    except OutOfStock as e:
+        return jsonify({'success': False, 'message': f"Only {e.shortages[pid]:g} left"}), 409
+    except StockConflict:
+        return jsonify({'success': False, 'message': "Your cart changed meanwhile, please try again"}), 409
+
+    cart_count = carts.add(pid, qty)
     
     return jsonify({
         'success': True,
         'message': f'Added {product["name"]} to cart',
-        'cart_count': len(cart_data)
+        'cart_count': cart_count
     })
 
+# Polled by every page; an unchanged count is answered with an empty 304
 @app.route('/cart/count')
 def cart_count():
-    cart_data = session.get('cart', {})
-    count = len(cart_data)
-    return jsonify({'count': count})
+    count = carts.count()
+    return conditional(make_etag('cart_count', count), lambda: jsonify({'count': count}))
 
 @app.route('/cart/update/<pid>', methods=['POST'])
 def update_cart(pid):
     qty = float(request.form.get('qty', 0))
-    cart_data = session.get('cart', {})
-    
-    if qty <= 0:
-        cart_data.pop(pid, None)
-    else:
-        cart_data[pid] = qty
-    
-    session['cart'] = cart_data
+    cart_id = carts.cart_id()
+    try:
+        if cart_id:
+            inventory.reserve(cart_id, pid, qty)
+    except (OutOfStock, StockConflict):
+        return redirect(url_for('cart'))  # keep the quantity the cart already holds
+    carts.set(pid, qty)
     return redirect(url_for('cart'))
 
 @app.route('/cart/remove/<pid>')
 def remove_from_cart(pid):
-    cart_data = session.get('cart', {})
-    cart_data.pop(pid, None)
-    session['cart'] = cart_data
+    cart_id = carts.cart_id()
+    if cart_id:
+        inventory.release(cart_id, pid)
+    carts.remove(pid)
     return redirect(url_for('cart'))
 
 @app.route('/checkout', methods=['GET', 'POST'])
+@admission.limit('checkout', concurrency=CHECKOUT_CONCURRENCY, methods=('POST',),
+                 on_reject=lambda retry_after: waiting_room(retry_after, message="Placing orders is busy right now."))
 def checkout():
     if 'user' not in session:
         return redirect(url_for('login'))
+
+    # Flash-sale waiting room: shoppers over the admit rate queue here instead of at the store
+    admitted, position, retry_after = checkout_turn()
+    if not admitted:
+        return waiting_room(retry_after, position=position)
     
     user_email = session['user']
-    users = load_json(DATA_FILE, {})
+    user = repo.get_user(user_email) or {'password': '', 'address': {}}
 
-    if user_email not in users:
-        users[user_email] = {'password': '', 'address': {}}
-
-    cart_data = session.get('cart', {})
-    all_p = {str(p['id']): p for p in get_all_products()}
+    cart_data = carts.get()
+    all_p = get_cart_products(cart_data)
     items_to_save, total_val = [], 0
     
     for pid, qty in cart_data.items():
         if pid in all_p:
             p = all_p[pid]
-            sub = p['price'] * float(qty)
-            items_to_save.append({'name': p['name'], 'qty': float(qty), 'subtotal': sub})
+            sub = float(p['price']) * float(qty)
+            items_to_save.append({'id': p['id'], 'name': p['name'], 'qty': float(qty), 'subtotal': sub})
             total_val += sub
 
     if request.method == 'POST':
@@ -162,9 +528,23 @@ def checkout():
             'pincode': request.form.get('pincode'),
             'taluk': request.form.get('taluk')
         }
-        
-        users[user_email]['address'] = addr
-        save_json(DATA_FILE, users)
+
+        # Conditional decrement of every line at once; nothing is sold if any line is short
+        sold = {pid: float(qty) for pid, qty in cart_data.items() if pid in all_p}
+        try:
+            inventory.commit(carts.cart_id(create=True), sold)
+        except OutOfStock as e:
+            return render_template('checkout.html',
+                                 address_data=addr,
+                                 items=items_to_save,
+                                 total=total_val,
+                                 error=shortage_message(e.shortages, all_p)), 409
+        except StockConflict:
+            return render_template('checkout.html',
+                                 address_data=addr,
+                                 items=items_to_save,
+                                 total=total_val,
+                                 error="Your cart changed while checking out, please place the order again"), 409
 
         order_id = str(uuid.uuid4())[:8]
         order_item = {
@@ -177,11 +557,49 @@ def checkout():
             'payment': request.form.get('payment', 'Cash on Delivery')
         }
         
-        orders = load_json(ORDERS_FILE, [])
-        orders.append(order_item)
-        save_json(ORDERS_FILE, orders)
+        # Saving the address for next time runs alongside the order write; the order carries it anyway
+        address_write = checkout_pool.submit(repo.update_address, user_email, addr)
+        try:
+            repo.add_order(order_item)
+        except Exception as e:
+            print(f"Order Error: {e}")
+            # The stock is already taken; without an order behind it, it goes back on the shelf
+            try:
+                inventory.restock(sold)
+            except Exception as e:
+                print(f"Inventory Error: {e}")
+            return render_template('checkout.html',
+                                 address_data=addr,
+                                 items=items_to_save,
+                                 total=total_val,
+                                 error="We couldn't place your order, please try again"), 503
+
+        # The order is already saved; a failed analytics bump is fixed by the next rebuild
+        analytics_write = checkout_pool.submit(analytics.record_order, order_item)
+        # Likewise a missed dispatch entry can be put back with `python dispatch.py --backfill`
+        dispatch_write = checkout_pool.submit(pending_index.add, order_item)
+
+        # Queue SNS notification; the outbox workers publish it after the response
+        if outbox:
+            outbox.enqueue(
+                "FreshBasket Order Confirmed",
+                f"New Order {order_id} placed by {addr['name']} for ₹{total_val}"
+            )
+
+        try:
+            address_write.result()
+        except Exception as e:
+            print(f"Address Error: {e}")
+        try:
+            analytics_write.result()
+        except Exception as e:
+            print(f"Analytics Error: {e}")
+        try:
+            dispatch_write.result()
+        except Exception as e:
+            print(f"Dispatch Error: {e}")
 
-        session.pop('cart', None)
+        carts.clear()
         
         return render_template('order_confirmation.html',
                              order=addr,
@@ -189,22 +607,31 @@ def checkout():
                              total=total_val,
                              order_id=order_id)
 
-    saved_addr = users.get(user_email, {}).get('address', {})
+    saved_addr = user.get('address', {})
     return render_template('checkout.html',
                          address_data=saved_addr,
                          items=items_to_save,
                          total=total_val)
 
+# Polled by the waiting room page
+@app.route('/queue/status')
+def queue_status():
+    if 'user' not in session:
+        return jsonify({'admitted': True, 'position': 0, 'retry_after': 1})  # checkout sends them to log in
+    admitted, position, retry_after = checkout_turn()
+    response = jsonify({'admitted': admitted, 'position': position, 'retry_after': retry_seconds(retry_after)})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.route('/history')
 def history():
     if 'user' not in session:
         return redirect(url_for('login'))
     
     try:
-        all_orders = load_json(ORDERS_FILE, [])
-        user_orders = [o for o in all_orders if o.get('user_email') == session['user']]
-        user_orders.sort(key=lambda x: x.get('date', ''), reverse=True)
-        return render_template('history.html', orders=user_orders)
+        user_orders, next_cursor = repo.user_orders(session['user'], limit=HISTORY_PAGE_SIZE,
+                                                    cursor=request.args.get('cursor'))
+        return render_template('history.html', orders=user_orders, next_cursor=next_cursor)
     except Exception as e:
         print(f"Error loading order history: {e}")
         return render_template('history.html', orders=[])
@@ -216,61 +643,136 @@ def admin_dashboard():
         return redirect(url_for('admin_login'))
     return render_template('admin_dashboard.html', products=get_all_products())
 
+@app.route('/admin/analytics')
+def admin_analytics():
+    if not session.get('is_admin'):
+        return redirect(url_for('admin_login'))
+    # Product buckets are keyed by id; the catalog supplies today's names
+    stats = analytics.summary(ANALYTICS_TOP_N, ANALYTICS_DAYS, products=catalog.index())
+    return render_template('admin_analytics.html', stats=stats)
+
+@app.route('/admin/dispatch')
+def admin_dispatch():
+    if not session.get('is_admin'):
+        return redirect(url_for('admin_login'))
+    since = request.args.get('since') or datetime.now().strftime("%Y-%m-%d")
+    until = request.args.get('until') or None
+    try:
+        max_kg = float(request.args.get('max_kg') or DISPATCH_MAX_KG)
+        max_stops = int(request.args.get('max_stops') or DISPATCH_MAX_STOPS)
+    except ValueError:
+        max_kg, max_stops = DISPATCH_MAX_KG, DISPATCH_MAX_STOPS
+    plan = dispatch.plan(pending_index.orders(since, until), max(max_kg, 0.1), max(max_stops, 0), since, until)
+    if request.args.get('format') == 'json':
+        return jsonify(plan)
+    return render_template('admin_dispatch.html', plan=plan)
+
+@app.route('/admin/dispatch/mark', methods=['POST'])
+def admin_dispatch_mark():
+    if not session.get('is_admin'):
+        return redirect(url_for('admin_login'))
+    try:
+        pending_index.mark_dispatched(request.form.getlist('order_id'))
+    except Exception as e:
+        print(f"Dispatch Error: {e}")
+    return redirect(url_for('admin_dispatch', **{k: v for k, v in request.form.items()
+                                                 if k in ('since', 'until', 'max_kg', 'max_stops') and v}))
+
 @app.route('/admin/add', methods=['GET', 'POST'])
 def add_product():
     if not session.get('is_admin'):
         return redirect(url_for('admin_login'))
 
     if request.method == 'POST':
-        products = get_all_products()
         new_product = {
-            "id": max([p['id'] for p in products]) + 1 if products else 1,
             "name": request.form.get('name'),
             "price": float(request.form.get('price')),
-            "mrp": float(request.form.get('mrp') or request.form.get('price')),
-            "image": request.form.get('image')
+            "mrp": float(request.form.get('mrp') or request.form.get('price'))
         }
-        products.append(new_product)
-        save_json(PRODUCTS_FILE, products)
+        apply_image(new_product, request.form.get('image'))
+        pid = repo.add_product(new_product)
+        save_stock(pid, request.form.get('stock'))
         return redirect(url_for('admin_dashboard'))
 
     return render_template('add_product.html')
 
-@app.route('/admin/edit/<int:pid>', methods=['GET', 'POST'])
+@app.route('/admin/edit/<pid>', methods=['GET', 'POST'])
 def edit_product(pid):
     if not session.get('is_admin'):
         return redirect(url_for('admin_login'))
-    products = get_all_products()
-    product = next((p for p in products if p['id'] == pid), None)
+    product = repo.get_product(pid)
     
     if request.method == 'POST' and product:
-        product.update({
+        changes = {
             "name": request.form.get('name'),
             "price": float(request.form.get('price')),
-            "mrp": float(request.form.get('mrp') or request.form.get('price')),
-            "image": request.form.get('image')
-        })
-        save_json(PRODUCTS_FILE, products)
+            "mrp": float(request.form.get('mrp') or request.form.get('price'))
+        }
+        apply_image(changes, request.form.get('image'))
+        if repo.update_product(pid, changes):
+            save_stock(pid, request.form.get('stock'))
         return redirect(url_for('admin_dashboard'))
-    return render_template('edit_product.html', product=product)
+    stock = inventory.stock(pid)
+    return render_template('edit_product.html', product=product, stock=stock[0] if stock else None)
 
-@app.route('/admin/delete/<int:pid>', methods=['POST'])
+@app.route('/admin/delete/<pid>', methods=['POST'])
 def delete_product(pid):
     if not session.get('is_admin'):
         return redirect(url_for('admin_login'))
     
-    products = get_all_products()
-    products = [p for p in products if p['id'] != pid]
-    save_json(PRODUCTS_FILE, products)
+    try:
+        repo.delete_product(pid)
+        save_stock(pid, None)
+    except Exception as e:
+        print(f"Error deleting product: {e}")
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/import', methods=['GET', 'POST'])
+def import_catalog():
+    if not session.get('is_admin'):
+        return redirect(url_for('admin_login'))
+
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return render_template('admin_import.html', error="Choose a CSV or NDJSON file")
+        fmt = request.form.get('format') or catalog_io.guess_format(upload.filename)
+        try:
+            added, updated = import_products(upload.stream, fmt)
+        except catalog_io.CatalogImportError as e:
+            return render_template('admin_import.html', error=f"{e.invalid} invalid rows, nothing was imported",
+                                   errors=e.errors), 400
+        except (ValueError, UnicodeDecodeError) as e:
+            return render_template('admin_import.html', error=f"Could not read file: {e}"), 400
+        return render_template('admin_import.html', added=added, updated=updated)
+
+    return render_template('admin_import.html')
+
+@app.route('/admin/export')
+def export_catalog():
+    if not session.get('is_admin'):
+        return redirect(url_for('admin_login'))
+    fmt = request.args.get('format', 'csv')
+    if fmt not in catalog_io.FORMATS:
+        return jsonify({'success': False, 'message': 'Unknown format'}), 400
+    return Response(stream_with_context(catalog_io.export_lines(iter_export_products(), fmt)),
+                    mimetype=catalog_io.MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename=products.{fmt}'})
+
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
         user = request.form.get('username')
         pwd = request.form.get('password')
 
-        if user == ADMIN_USERNAME and check_password_hash(ADMIN_PASSWORD_HASH, pwd):
+        retry_after = attempts_left((f"admin_login_ip:{request.remote_addr}", LOGIN_IP_PER_MINUTE))
+        if retry_after:
+            return too_many_attempts('admin_login.html', retry_after)
+        try:
+            ok = user == ADMIN_USERNAME and hasher.check(admin_password_hash(), pwd, rehash=False)[0]
+        except HasherBusy:
+            return too_many_attempts('admin_login.html', 1, "Busy right now, please try again in a moment")
+        if ok:
             session['is_admin'] = True
             return redirect(url_for('admin_dashboard'))
         else:
@@ -282,9 +784,23 @@ def admin_login():
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
-        users = load_json(DATA_FILE, {})
         email, pwd = request.form.get('email'), request.form.get('password')
-        if email in users and check_password_hash(users[email]['password'], pwd):
+        retry_after = attempts_left((f"login_ip:{request.remote_addr}", LOGIN_IP_PER_MINUTE),
+                                    (f"login_email:{(email or '').strip().lower()}", LOGIN_EMAIL_PER_MINUTE))
+        if retry_after:
+            return too_many_attempts('login.html', retry_after)
+        user = repo.get_user(email)
+        try:
+            ok, new_hash = hasher.check(user['password'], pwd) if user else (False, None)
+        except HasherBusy:
+            return too_many_attempts('login.html', 1, "Busy right now, please try again in a moment")
+        if ok:
+            if new_hash:
+                # Hash settings changed since this password was saved; losing the race just retries next login
+                try:
+                    repo.update_password(email, new_hash)
+                except Exception as e:
+                    print(f"Rehash Error: {e}")
             session['user'] = email
             return redirect(url_for('home'))
         return render_template('login.html', error="Invalid credentials")
@@ -293,7 +809,6 @@ def login():
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
-        users = load_json(DATA_FILE, {})
         email = (request.form.get('email') or '').strip().lower()
         pwd = request.form.get('password')
 
@@ -301,11 +816,21 @@ def signup():
         if not re.match(email_pattern, email):
             return render_template('signup.html', error="Enter a valid email address")
 
-        if email in users:
+        retry_after = attempts_left((f"signup_ip:{request.remote_addr}", SIGNUP_IP_PER_MINUTE))
+        if retry_after:
+            return too_many_attempts('signup.html', retry_after)
+
+        if repo.get_user(email):
+            return render_template('signup.html', error="Email already registered")
+
+        try:
+            password_hash = hasher.generate(pwd)
+        except HasherBusy:
+            return too_many_attempts('signup.html', 1, "Busy right now, please try again in a moment")
+        # create_user re-checks atomically in case another worker raced us
+        if not repo.create_user(email, {'password': password_hash, 'address': {}}):
             return render_template('signup.html', error="Email already registered")
 
-        users[email] = {'password': generate_password_hash(pwd), 'address': {}}
-        save_json(DATA_FILE, users)
         session['user'] = email
         return redirect(url_for('home'))
     return render_template('signup.html')
@@ -0,0 +1,178 @@
+import asyncio
+import importlib
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Optional async serving mode. Any ASGI server works, e.g.
+#   ASGI_APP=aws_app uvicorn asgi:app --workers 2
+#   gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+# The event loop only moves bytes; each request runs on a bounded thread pool,
+# so a slow DynamoDB call or file read ties up one thread instead of a worker.
+ASGI_APP = os.environ.get('ASGI_APP', 'app')
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', '64'))
+# Request bodies above this spill from memory to a temp file (catalog imports)
+ASGI_BODY_SPOOL = 1024 * 1024
+# Response chunks buffered per request before the app thread waits for the client
+ASGI_SEND_QUEUE = 8
+
+
+class WsgiBridge:
+    """Serve a WSGI app over ASGI, one pool thread per in-flight request.
+
+    The app and its response iterator run start to finish on the same thread,
+    so streamed responses (stream_with_context) keep their request context.
+    asgiref's WsgiToAsgi isn't used because it runs every request on a
+    single shared thread.
+    """
+
+    def __init__(self, wsgi_app, max_threads=ASGI_THREADS, send_queue=ASGI_SEND_QUEUE, on_startup=None):
+        self.wsgi_app = wsgi_app
+        self.on_startup = on_startup
+        self.max_threads = max_threads
+        self.send_queue = send_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return  # no websockets
+        body = await self._read_body(receive)
+        if body is None:
+            return  # client went away before sending the whole request
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.send_queue)
+        cancelled = threading.Event()
+        done = loop.run_in_executor(self.executor, self._run, self._environ(scope, body), queue, loop, cancelled)
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                await send(message)
+        except BaseException:
+            # Let the app thread finish (it stops at the next chunk) without a reader blocking it
+            cancelled.set()
+            loop.create_task(self._drain(queue))
+            raise
+        await done
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.on_startup:
+                    await asyncio.get_running_loop().run_in_executor(self.executor, self.on_startup)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(max_size=ASGI_BODY_SPOOL)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        return body
+
+    async def _drain(self, queue):
+        while await queue.get() is not None:
+            pass
+
+    def _environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[name] = value
+                continue
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        if 'CONTENT_LENGTH' not in environ:
+            environ['CONTENT_LENGTH'] = str(body.seek(0, 2))
+            body.seek(0)
+        return environ
+
+    def _run(self, environ, queue, loop, cancelled):
+        # Runs on a pool thread: call the app and hand its output to the event loop
+        def put(message):
+            asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response.update(status=int(status.split(' ', 1)[0]), headers=[
+                (k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers])
+            return write
+
+        def begin():
+            if not response.get('started'):
+                response['started'] = True
+                put({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+
+        def write(data):
+            if data:
+                begin()
+                put({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+        try:
+            result = self.wsgi_app(environ, start_response)
+            try:
+                for chunk in result:
+                    if cancelled.is_set():
+                        break
+                    write(chunk)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            if not cancelled.is_set():
+                begin()
+                put({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        except Exception as e:
+            print(f"ASGI Error: {e}")
+            if not response.get('started') and not cancelled.is_set():
+                put({'type': 'http.response.start', 'status': 500,
+                     'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+                put({'type': 'http.response.body', 'body': b'Internal Server Error', 'more_body': False})
+        finally:
+            environ['wsgi.input'].close()
+            put(None)
+
+
+# Startup runs in each worker process, after the server forks: the app's prewarm() hook goes there
+_module = importlib.import_module(ASGI_APP)
+app = WsgiBridge(_module.app, on_startup=getattr(_module, 'prewarm', None))
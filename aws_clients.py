@@ -0,0 +1,100 @@
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+
+# Services whose client is taken from the resource, so both share one connection pool
+RESOURCE_SERVICES = ('dynamodb',)
+
+
+class AwsClients:
+    """boto3 clients and resources, built on first use in each process.
+
+    Nothing is created at import, so workers and cold starts boot without
+    paying for it. Objects are cached per process id: a forked worker builds
+    its own instead of reusing the parent's sockets. Clients are thread-safe
+    and shared by every thread in the process, so `max_pool_connections`
+    should cover the threads that call AWS at once.
+    """
+
+    def __init__(self, region, max_pool_connections=50, connect_timeout=5, read_timeout=10,
+                 retry_mode='standard', max_attempts=5, tcp_keepalive=True, on_create=None):
+        self.config = Config(
+            region_name=region,
+            max_pool_connections=max_pool_connections,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={'mode': retry_mode, 'total_max_attempts': max_attempts},
+            tcp_keepalive=tcp_keepalive,
+        )
+        self.on_create = on_create  # on_create(client, service), once per new client
+        self._lock = threading.RLock()
+        self._pid = None
+        self._session = None
+        self._objects = {}
+
+    def _get(self, key, build):
+        if self._pid == os.getpid():
+            obj = self._objects.get(key)
+            if obj is not None:
+                return obj
+        with self._lock:
+            if self._pid != os.getpid():
+                # boto3 sessions aren't thread-safe, so one per process, only used under the lock
+                self._session = boto3.session.Session()
+                self._objects = {}
+                self._pid = os.getpid()
+            obj = self._objects.get(key)
+            if obj is None:
+                obj = self._objects[key] = build(self._session)
+            return obj
+
+    def resource(self, service):
+        def build(session):
+            resource = session.resource(service, config=self.config)
+            if self.on_create:
+                self.on_create(resource.meta.client, service)
+            return resource
+        return self._get(('resource', service), build)
+
+    def client(self, service):
+        if service in RESOURCE_SERVICES:
+            return self.resource(service).meta.client
+
+        def build(session):
+            client = session.client(service, config=self.config)
+            if self.on_create:
+                self.on_create(client, service)
+            return client
+        return self._get(('client', service), build)
+
+    def table(self, name):
+        return Lazy(lambda: self._get(('table', name), lambda session: self.resource('dynamodb').Table(name)), name)
+
+    def lazy_resource(self, service):
+        return Lazy(lambda: self.resource(service))
+
+    def lazy_client(self, service):
+        return Lazy(lambda: self.client(service))
+
+    def prewarm(self, services=('dynamodb',)):
+        # For a post-fork or startup hook: pay for client creation before the first request
+        for service in services:
+            self.client(service)
+
+
+class Lazy:
+    """Stands in for a boto3 object until one of its attributes is used.
+
+    `name` (a table name) is known up front, so passing a table around or
+    reading its name doesn't build anything.
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._factory(), attr)
@@ -0,0 +1,366 @@
+"""Storefront benchmarks on Flask's test client.
+
+    python bench.py                                  # json + sqlite backends, 1k/10k/100k orders
+    python bench.py --backends json --orders 1000000 --out after.json
+    python bench.py --compare before.json after.json # exit 1 on regressions
+
+    python bench.py --backends json,sqlite,aws       # aws on moto (pip install -r requirements-dev.txt)
+    python bench.py --backends aws --dynamo-endpoint http://localhost:8000   # or on DynamoDB Local
+
+Each (backend, order count) runs in a fresh subprocess against a synthetic
+catalog and order history in a temp directory. The aws backend creates its
+tables on moto, or on the DynamoDB Local endpoint given; with neither it is
+reported as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WORDS = ["apple", "mango", "banana", "guava", "papaya", "tomato", "onion", "carrot", "beans", "peas",
+         "cabbage", "spinach", "ginger", "lemon", "grapes", "kiwi", "melon", "radish", "pumpkin", "okra"]
+ROUTES = ["home", "search", "cart", "add_to_cart", "cart_count", "checkout_get", "checkout_post", "history"]
+BENCH_USER = "bench0@example.com"
+
+
+# --- SYNTHETIC DATA ---
+def make_products(n):
+    rng = random.Random(1)
+    return [{"id": i, "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}",
+             "price": float(rng.randint(10, 300)), "mrp": float(rng.randint(300, 400)),
+             "image": "/static/images/placeholder.svg"} for i in range(1, n + 1)]
+
+def make_users(n, password_hash):
+    return {f"bench{i}@example.com": {"password": password_hash, "address": {}} for i in range(n)}
+
+def iter_orders(n, users, products):
+    rng = random.Random(2)
+    start = datetime(2025, 1, 1)
+    for i in range(n):
+        items = []
+        for p in rng.sample(products, min(3, len(products))):
+            qty = float(rng.randint(1, 4))
+            items.append({"name": p["name"], "qty": qty, "subtotal": p["price"] * qty})
+        yield {
+            "order_id": f"{i:08x}",
+            "user_email": f"bench{rng.randrange(users)}@example.com",
+            "date": (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M"),
+            "items": items,
+            "total": sum(it["subtotal"] for it in items),
+            "address": {"name": "Bench", "phone": "9999999999", "address": "1 Main Rd",
+                        "pincode": str(600000 + rng.randrange(100)), "taluk": f"Taluk{rng.randrange(10)}"},
+            "payment": "Cash on Delivery",
+        }
+
+def write_json_fixtures(workdir, products, users, n_orders):
+    with open(os.path.join(workdir, "products.json"), "w") as f:
+        json.dump(products, f)
+    with open(os.path.join(workdir, "users.json"), "w") as f:
+        json.dump(users, f)
+    # Streamed so 1M orders don't have to sit in memory as one list
+    with open(os.path.join(workdir, "orders.json"), "w") as f:
+        f.write("[")
+        for i, order in enumerate(iter_orders(n_orders, len(users), products)):
+            f.write(("," if i else "") + json.dumps(order))
+        f.write("]")
+
+
+# --- DYNAMODB FIXTURES ---
+def create_dynamo_tables(dynamodb):
+    def table(name, keys, attrs, **extra):
+        dynamodb.create_table(
+            TableName=name, BillingMode="PAY_PER_REQUEST",
+            KeySchema=[{"AttributeName": k, "KeyType": t} for k, t in keys],
+            AttributeDefinitions=[{"AttributeName": a, "AttributeType": "S"} for a in attrs], **extra)
+    table("FreshBasket_Users", [("email", "HASH")], ["email"])
+    table("FreshBasket_Products", [("id", "HASH")], ["id"])
+    table("FreshBasket_Carts", [("cart_id", "HASH"), ("product_id", "RANGE")], ["cart_id", "product_id"])
+    table("FreshBasket_Inventory", [("product_id", "HASH"), ("holder", "RANGE")], ["product_id", "holder"])
+    table("FreshBasket_Offers", [("id", "HASH")], ["id"])
+    table("FreshBasket_Analytics", [("kind", "HASH"), ("key", "RANGE")], ["kind", "key"])
+    table("FreshBasket_Dispatch", [("order_id", "HASH")], ["order_id"])
+    table("FreshBasket_Reviews", [("product_id", "HASH"), ("user_email", "RANGE")],
+          ["product_id", "user_email", "created_at"],
+          LocalSecondaryIndexes=[{
+              "IndexName": "product_id-created_at-index",
+              "KeySchema": [{"AttributeName": "product_id", "KeyType": "HASH"},
+                            {"AttributeName": "created_at", "KeyType": "RANGE"}],
+              "Projection": {"ProjectionType": "ALL"}}])
+    table("FreshBasket_Orders", [("order_id", "HASH")], ["order_id", "user_email", "date"],
+          GlobalSecondaryIndexes=[{
+              "IndexName": "user_email-date-index",
+              "KeySchema": [{"AttributeName": "user_email", "KeyType": "HASH"},
+                            {"AttributeName": "date", "KeyType": "RANGE"}],
+              "Projection": {"ProjectionType": "ALL"}}])
+
+def seed_dynamo(dynamodb, products, users, n_orders):
+    from decimal import Decimal
+    def to_dynamo(obj):
+        return json.loads(json.dumps(obj), parse_float=Decimal)
+    with dynamodb.Table("FreshBasket_Products").batch_writer() as batch:
+        for p in products:
+            batch.put_item(Item=to_dynamo(dict(p, id=str(p["id"]))))
+    with dynamodb.Table("FreshBasket_Users").batch_writer() as batch:
+        for email, user in users.items():
+            batch.put_item(Item=dict(user, email=email))
+    with dynamodb.Table("FreshBasket_Orders").batch_writer() as batch:
+        for order in iter_orders(n_orders, len(users), products):
+            batch.put_item(Item=to_dynamo(order))
+
+
+# --- MEASUREMENT ---
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+def measure(fn, iterations, setup=None, memory_iterations=20):
+    latencies = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    # Separate pass: tracemalloc slows allocation-heavy routes several times over
+    peak = 0
+    tracemalloc.start()
+    for _ in range(min(iterations, memory_iterations)):
+        if setup:
+            setup()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    latencies.sort()
+    busy = sum(latencies)
+    return {
+        "n": iterations,
+        "mean_ms": busy / len(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1],
+        "rps": iterations / busy * 1000 if busy else 0.0,
+        "peak_alloc_kb": peak / 1024,
+    }
+
+def run_routes(module, iterations, cart_size):
+    app = module.app
+    app.config["TESTING"] = True
+    client = app.test_client()
+    products = module.get_all_products()
+    pids = [str(p["id"]) for p in products[:cart_size]]
+    with client.session_transaction() as sess:
+        sess["user"] = BENCH_USER
+
+    def fill_cart():
+        for pid in pids:
+            client.post("/cart/add", data={"product_id": pid, "qty": "1"})
+
+    def ok(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.path} returned {response.status_code}")
+
+    rng = random.Random(3)
+    checkout_form = {"name": "Bench", "phone": "9999999999", "address": "1 Main Rd",
+                     "pincode": "600001", "taluk": "Taluk1", "payment": "Cash on Delivery"}
+    fill_cart()
+    plan = {
+        "home": (lambda: ok(client.get("/")), None),
+        "search": (lambda: ok(client.get("/?q=" + rng.choice(WORDS)[:4])), None),
+        "cart": (lambda: ok(client.get("/cart")), None),
+        "add_to_cart": (lambda: ok(client.post("/cart/add", data={"product_id": pids[0], "qty": "1"})), None),
+        "cart_count": (lambda: ok(client.get("/cart/count")), None),
+        "checkout_get": (lambda: ok(client.get("/checkout")), None),
+        "checkout_post": (lambda: ok(client.post("/checkout", data=checkout_form)), fill_cart),
+        "history": (lambda: ok(client.get("/history")), None),
+    }
+    results = {}
+    for route in ROUTES:
+        fn, setup = plan[route]
+        fn()  # warm caches and lazy imports outside the timed loop
+        results[route] = measure(fn, iterations, setup)
+    return results
+
+
+# --- ONE CONFIGURATION (runs in a subprocess) ---
+def run_config(args):
+    from werkzeug.security import generate_password_hash
+    workdir = tempfile.mkdtemp(prefix="fb-bench-")
+    try:
+        products = make_products(args.products)
+        users = make_users(args.users, generate_password_hash("bench"))
+        t0 = time.perf_counter()
+        if args.backend == "aws":
+            module = load_aws_app(args, products, users)
+        else:
+            write_json_fixtures(workdir, products, users, args.orders)
+            os.chdir(workdir)
+            os.environ["STORAGE_BACKEND"] = args.backend
+            os.environ["DB_FILE"] = os.path.join(workdir, "bench.db")
+            sys.path.insert(0, HERE)
+            import app as module
+        setup_s = time.perf_counter() - t0
+        routes = run_routes(module, args.requests, args.cart_size)
+        return {
+            "backend": args.backend, "orders": args.orders, "products": args.products, "users": args.users,
+            "setup_s": setup_s,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "routes": routes,
+        }
+    finally:
+        os.chdir(HERE)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def load_aws_app(args, products, users):
+    import boto3
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    os.environ["OUTBOX_DB_FILE"] = os.path.join(tempfile.mkdtemp(prefix="fb-bench-"), "outbox.db")
+    if args.dynamo_endpoint:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.dynamo_endpoint
+    else:
+        from moto import mock_aws
+        mock_aws().start()
+    dynamodb = boto3.resource("dynamodb")
+    create_dynamo_tables(dynamodb)
+    seed_dynamo(dynamodb, products, users, args.orders)
+    sys.path.insert(0, HERE)
+    import aws_app
+    return aws_app
+
+
+# --- DRIVER ---
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def aws_available(args):
+    if args.dynamo_endpoint:
+        return True
+    try:
+        import moto  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def run_all(args):
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "results": [],
+        "skipped": [],
+    }
+    for backend in args.backends.split(","):
+        if backend == "aws" and not aws_available(args):
+            report["skipped"].append({"backend": "aws", "reason": "moto not installed and no --dynamo-endpoint"})
+            print("[bench] skipping aws: pip install -r requirements-dev.txt or pass --dynamo-endpoint",
+                  file=sys.stderr)
+            continue
+        for n_orders in [int(n) for n in args.orders.split(",")]:
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--backend", backend,
+                   "--orders", str(n_orders), "--products", str(args.products), "--users", str(args.users),
+                   "--requests", str(args.requests), "--cart-size", str(args.cart_size)]
+            if args.dynamo_endpoint:
+                cmd += ["--dynamo-endpoint", args.dynamo_endpoint]
+            # Results come back through a file: the app prints its own log lines to stdout
+            fd, result_file = tempfile.mkstemp(prefix="fb-bench-", suffix=".json")
+            os.close(fd)
+            cmd += ["--result-file", result_file]
+            print(f"[bench] {backend} orders={n_orders}", file=sys.stderr)
+            out = subprocess.run(cmd, capture_output=True, text=True)
+            reason, result = out.stderr, None
+            try:
+                if out.returncode == 0:
+                    with open(result_file) as f:
+                        result = json.load(f)
+            except ValueError as e:
+                reason += f"\nBench Error: unreadable worker result: {e}"
+            finally:
+                os.remove(result_file)
+            if result is None:
+                report["skipped"].append({"backend": backend, "orders": n_orders,
+                                          "returncode": out.returncode, "reason": reason[-2000:]})
+                continue
+            report["results"].append(result)
+    return report
+
+def flatten(report):
+    return {(r["backend"], r["orders"], route): stats
+            for r in report["results"] for route, stats in r["routes"].items()}
+
+def compare(old_path, new_path, metric, threshold):
+    with open(old_path) as f:
+        old = flatten(json.load(f))
+    with open(new_path) as f:
+        new = flatten(json.load(f))
+    regressions = 0
+    print(f"{'backend':8} {'orders':>8} {'route':14} {'old':>10} {'new':>10} {'change':>8}")
+    for key in sorted(set(old) & set(new)):
+        before, after = old[key][metric], new[key][metric]
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key[0]:8} {key[1]:>8} {key[2]:14} {before:>10.3f} {after:>10.3f} {change:>7.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="json,sqlite", help="comma list of json, sqlite, aws")
+    parser.add_argument("--orders", default="1000,10000,100000", help="comma list of order history sizes")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per route")
+    parser.add_argument("--cart-size", type=int, default=5)
+    parser.add_argument("--dynamo-endpoint",
+                        help="DynamoDB Local URL for the aws backend, e.g. http://localhost:8000 (default: moto)")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two reports")
+    parser.add_argument("--metric", default="p90_ms")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(args.compare[0], args.compare[1], args.metric, args.threshold) else 0)
+    if args.worker:
+        args.orders = int(args.orders)
+        result = json.dumps(run_config(args))
+        if args.result_file:
+            with open(args.result_file, "w") as f:
+                f.write(result)
+        else:
+            print(result)
+        return
+    report = json.dumps(run_all(args), indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Attr, Key
+from flask import session
+
+
+# --- BACKENDS ---
+# Every backend stores {product_id: qty} per cart id; qty <= 0 removes the line.
+class SessionCartStore:
+    """The original behaviour: the whole cart lives in Flask's signed cookie."""
+
+    def get(self, cart_id):
+        return dict(session.get('cart', {}))
+
+    def add(self, cart_id, pid, qty):
+        cart_data = session.get('cart', {})
+        cart_data[pid] = float(cart_data.get(pid, 0)) + qty
+        session['cart'] = cart_data
+        return len(cart_data)
+
+    def set(self, cart_id, pid, qty):
+        cart_data = session.get('cart', {})
+        if qty <= 0:
+            cart_data.pop(pid, None)
+        else:
+            cart_data[pid] = qty
+        session['cart'] = cart_data
+
+    def remove(self, cart_id, pid):
+        self.set(cart_id, pid, 0)
+
+    def clear(self, cart_id):
+        session.pop('cart', None)
+
+    def count(self, cart_id):
+        return len(session.get('cart', {}))
+
+
+class MemoryCartStore:
+    """Per-process LRU of carts with an idle TTL; for single-worker deployments."""
+
+    def __init__(self, max_carts=10000, ttl=7 * 24 * 3600, clock=time.monotonic):
+        self.max_carts = max_carts
+        self.ttl = ttl
+        self.clock = clock
+        self._carts = OrderedDict()  # cart_id -> (expires, {pid: qty})
+        self._lock = threading.Lock()
+
+    def _cart(self, cart_id, create=False):
+        entry = self._carts.get(cart_id)
+        now = self.clock()
+        if entry and entry[0] <= now:
+            del self._carts[cart_id]
+            entry = None
+        if entry is None:
+            if not create:
+                return None
+            entry = (now + self.ttl, {})
+        else:
+            entry = (now + self.ttl, entry[1])
+        self._carts[cart_id] = entry
+        self._carts.move_to_end(cart_id)
+        while len(self._carts) > self.max_carts:
+            self._carts.popitem(last=False)
+        return entry[1]
+
+    def get(self, cart_id):
+        with self._lock:
+            return dict(self._cart(cart_id) or {})
+
+    def add(self, cart_id, pid, qty):
+        with self._lock:
+            cart_data = self._cart(cart_id, create=True)
+            cart_data[pid] = cart_data.get(pid, 0) + qty
+            return len(cart_data)
+
+    def set(self, cart_id, pid, qty):
+        with self._lock:
+            cart_data = self._cart(cart_id, create=qty > 0)
+            if cart_data is None:
+                return
+            if qty <= 0:
+                cart_data.pop(pid, None)
+            else:
+                cart_data[pid] = qty
+
+    def remove(self, cart_id, pid):
+        self.set(cart_id, pid, 0)
+
+    def clear(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+    def count(self, cart_id):
+        with self._lock:
+            return len(self._cart(cart_id) or {})
+
+
+SQL_CART_SCHEMA = """CREATE TABLE IF NOT EXISTS cart_items (
+        cart_id TEXT,
+        product_id TEXT,
+        qty REAL,
+        updated_at REAL,
+        PRIMARY KEY (cart_id, product_id)
+    ) WITHOUT ROWID"""
+SQL_CART_GET = "SELECT product_id, qty FROM cart_items WHERE cart_id = ? AND updated_at > ?"
+SQL_CART_ADD = """INSERT INTO cart_items (cart_id, product_id, qty, updated_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT(cart_id, product_id) DO UPDATE SET qty = qty + excluded.qty, updated_at = excluded.updated_at"""
+SQL_CART_SET = """INSERT INTO cart_items (cart_id, product_id, qty, updated_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT(cart_id, product_id) DO UPDATE SET qty = excluded.qty, updated_at = excluded.updated_at"""
+SQL_CART_TOUCH = "UPDATE cart_items SET updated_at = ? WHERE cart_id = ?"
+SQL_CART_REMOVE = "DELETE FROM cart_items WHERE cart_id = ? AND product_id = ?"
+SQL_CART_CLEAR = "DELETE FROM cart_items WHERE cart_id = ?"
+SQL_CART_COUNT = "SELECT COUNT(*) FROM cart_items WHERE cart_id = ? AND updated_at > ?"
+SQL_CART_EXPIRE = "DELETE FROM cart_items WHERE updated_at <= ?"
+
+
+class SQLiteCartStore:
+    """Cart lines in a local SQLite file shared by all workers on the host."""
+
+    def __init__(self, db_file, ttl=7 * 24 * 3600, sweep_probability=0.01):
+        self.db_file = db_file
+        self.ttl = ttl
+        self.sweep_probability = sweep_probability
+        self._local = threading.local()
+        self._conn().execute(SQL_CART_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, sql, params):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(sql, params)
+            conn.execute(SQL_CART_TOUCH, (now, params[0]))
+            if random.random() < self.sweep_probability:
+                conn.execute(SQL_CART_EXPIRE, (now - self.ttl,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, cart_id):
+        rows = self._conn().execute(SQL_CART_GET, (cart_id, time.time() - self.ttl))
+        return {pid: qty for pid, qty in rows}
+
+    def add(self, cart_id, pid, qty):
+        self._write(SQL_CART_ADD, (cart_id, pid, qty, time.time()))
+        return self.count(cart_id)
+
+    def set(self, cart_id, pid, qty):
+        if qty <= 0:
+            self._write(SQL_CART_REMOVE, (cart_id, pid))
+        else:
+            self._write(SQL_CART_SET, (cart_id, pid, qty, time.time()))
+
+    def remove(self, cart_id, pid):
+        self.set(cart_id, pid, 0)
+
+    def clear(self, cart_id):
+        self._conn().execute(SQL_CART_CLEAR, (cart_id,))
+
+    def count(self, cart_id):
+        return self._conn().execute(SQL_CART_COUNT, (cart_id, time.time() - self.ttl)).fetchone()[0]
+
+
+class DynamoCartStore:
+    """One item per cart line (cart_id hash key, product_id range key).
+
+    `expires_at` should be enabled as the table's TTL attribute so abandoned
+    carts are deleted by DynamoDB itself.
+    """
+
+    def __init__(self, table, ttl=7 * 24 * 3600):
+        self.table = table
+        self.ttl = ttl
+
+    def _lines(self, cart_id, **kwargs):
+        # Lines past expires_at may linger until TTL deletes them; they are already gone for us
+        live = Attr('expires_at').not_exists() | Attr('expires_at').gt(int(time.time()))
+        return self.table.query(KeyConditionExpression=Key('cart_id').eq(cart_id), FilterExpression=live, **kwargs)
+
+    def get(self, cart_id):
+        return {i['product_id']: float(i['qty']) for i in self._lines(cart_id).get('Items', [])}
+
+    def add(self, cart_id, pid, qty):
+        self.table.update_item(
+            Key={'cart_id': cart_id, 'product_id': pid},
+            UpdateExpression="ADD qty :q SET expires_at = :e",
+            ExpressionAttributeValues={':q': Decimal(str(qty)), ':e': int(time.time() + self.ttl)}
+        )
+        return self.count(cart_id)
+
+    def set(self, cart_id, pid, qty):
+        if qty <= 0:
+            self.table.delete_item(Key={'cart_id': cart_id, 'product_id': pid})
+            return
+        self.table.put_item(Item={'cart_id': cart_id, 'product_id': pid, 'qty': Decimal(str(qty)),
+                                  'expires_at': int(time.time() + self.ttl)})
+
+    def remove(self, cart_id, pid):
+        self.set(cart_id, pid, 0)
+
+    def clear(self, cart_id):
+        with self.table.batch_writer() as batch:
+            for pid in self.get(cart_id):
+                batch.delete_item(Key={'cart_id': cart_id, 'product_id': pid})
+
+    def count(self, cart_id):
+        return self._lines(cart_id, Select='COUNT').get('Count', 0)
+
+
+# --- CURRENT REQUEST'S CART ---
+class Carts:
+    """Cart operations for the current request; only a short cart id goes in the cookie."""
+
+    def __init__(self, store):
+        self.store = store
+        self.server_side = not isinstance(store, SessionCartStore)
+
+    def cart_id(self, create=False):
+        # Session carts get an id too: stock holds are owned by it
+        cart_id = session.get('cart_id')
+        if cart_id is None and create:
+            cart_id = session['cart_id'] = uuid.uuid4().hex
+        return cart_id
+
+    def _missing(self, cart_id):
+        # No cart id yet means an empty server-side cart; skip the round trip
+        return cart_id is None and self.server_side
+
+    def get(self):
+        cart_id = self.cart_id()
+        return {} if self._missing(cart_id) else self.store.get(cart_id)
+
+    def add(self, pid, qty):
+        return self.store.add(self.cart_id(create=True), pid, qty)
+
+    def set(self, pid, qty):
+        cart_id = self.cart_id(create=qty > 0)
+        if not self._missing(cart_id):
+            self.store.set(cart_id, pid, qty)
+
+    def remove(self, pid):
+        self.set(pid, 0)
+
+    def clear(self):
+        cart_id = self.cart_id()
+        if not self._missing(cart_id):
+            self.store.clear(cart_id)
+        session.pop('cart_id', None)
+
+    def count(self):
+        cart_id = self.cart_id()
+        return 0 if self._missing(cart_id) else self.store.count(cart_id)
+
+
+def make_cart_store(backend, db_file=None, table=None, ttl=7 * 24 * 3600):
+    if backend == 'session':
+        return SessionCartStore()
+    if backend == 'memory':
+        return MemoryCartStore(ttl=ttl)
+    if backend == 'sqlite':
+        return SQLiteCartStore(db_file, ttl=ttl)
+    if backend == 'dynamodb':
+        return DynamoCartStore(table, ttl=ttl)
+    raise ValueError(f"Unknown cart backend: {backend}")
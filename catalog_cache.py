@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+
+# Cheap change detector for a catalog file: (mtime in ns, size) or None if missing
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class CatalogCache:
+    """Keeps the parsed product list and a {str(id): product} index in memory.
+
+    The cache reloads when `stamp()` changes (e.g. products.json was rewritten
+    by another worker) or when `bump()` is called after a local write.
+    Cached products are shared between requests and must not be mutated.
+    Each load also records a content digest, identical across workers for the
+    same catalog, and the time that digest last changed (for HTTP validators).
+    """
+
+    def __init__(self, loader, stamp):
+        self.loader = loader
+        self.stamp = stamp
+        self.version = 0
+        self._lock = threading.Lock()
+        self._state = None  # (stamp, version, products, index, digest, last_modified)
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+
+    def _current(self):
+        stamp = self.stamp()
+        state = self._state
+        if state and state[0] == stamp and state[1] == self.version:
+            return state
+        with self._lock:
+            state = self._state
+            if state and state[0] == stamp and state[1] == self.version:
+                return state
+            products = self.loader()
+            index = {str(p['id']): p for p in products}
+            digest = hashlib.sha1(json.dumps(products, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+            if state and state[4] == digest:
+                last_modified = state[5]
+            else:
+                last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+            self._state = state = (stamp, self.version, products, index, digest, last_modified)
+            return state
+
+    def products(self):
+        return self._current()[2]
+
+    def index(self):
+        return self._current()[3]
+
+    def get(self, pid):
+        return self._current()[3].get(str(pid))
+
+    def digest(self):
+        return self._current()[4]
+
+    def last_modified(self):
+        return self._current()[5]
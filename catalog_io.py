@@ -0,0 +1,194 @@
+import codecs
+import csv
+import io
+import itertools
+import json
+import sys
+import uuid
+from decimal import Decimal
+
+from dynamo_utils import float_to_decimal
+from images import apply_image
+
+
+FIELDS = ('id', 'name', 'price', 'mrp', 'image', 'thumb')
+FORMATS = ('csv', 'ndjson')
+MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+MAX_REPORTED_ERRORS = 50
+
+
+class CatalogImportError(ValueError):
+    """Raised when any row fails validation; nothing is written in that case."""
+
+    def __init__(self, errors, invalid):
+        super().__init__(f"{invalid} invalid rows")
+        self.errors = errors  # [(line, message)], capped at MAX_REPORTED_ERRORS
+        self.invalid = invalid
+
+
+# --- PARSING ---
+def guess_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+def iter_records(stream, fmt):
+    # Yields (line_number, dict) from a binary or text stream without reading it all at once
+    if isinstance(stream.read(0), bytes):
+        stream = codecs.getreader('utf-8-sig')(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'ndjson':
+        for n, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield n, ValueError(f"invalid JSON: {e}")
+                continue
+            yield n, record if isinstance(record, dict) else ValueError("expected a JSON object")
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+def _number(value, field, required):
+    if value in (None, ''):
+        if required:
+            raise ValueError(f"{field} is required")
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number, got {value!r}")
+    if number < 0 or number != number:
+        raise ValueError(f"{field} must be a non-negative number")
+    return number
+
+def validate(record, id_type=str):
+    name = str(record.get('name') or '').strip()
+    if not name:
+        raise ValueError("name is required")
+    price = _number(record.get('price'), 'price', True)
+    mrp = _number(record.get('mrp'), 'mrp', False)
+    product = {'name': name, 'price': price, 'mrp': mrp if mrp is not None else price}
+    pid = str(record.get('id') or '').strip()
+    if pid:
+        try:
+            product['id'] = id_type(pid)
+        except ValueError:
+            raise ValueError(f"id must be {id_type.__name__}, got {pid!r}")
+    if record.get('image'):
+        product['image'] = str(record['image']).strip()
+    return product
+
+def parse(stream, fmt, id_type=str):
+    # Every row is validated before anything is written; returns the clean rows
+    rows, errors, invalid = [], [], 0
+    for line, record in iter_records(stream, fmt):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            rows.append(validate(record, id_type))
+        except ValueError as e:
+            invalid += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append((line, str(e)))
+    if invalid:
+        raise CatalogImportError(errors, invalid)
+    return rows
+
+
+# --- APPLYING ---
+def merge(existing, rows, new_id):
+    # Upsert by id, else by case-insensitive name; returns (changed products, added, updated)
+    by_id = {str(p['id']): p for p in existing}
+    by_name = {str(p.get('name', '')).lower(): p for p in existing}
+    original = set(by_id)
+    changed = {}
+    for row in rows:
+        target = by_id.get(str(row['id'])) if 'id' in row else by_name.get(row['name'].lower())
+        target = dict(target) if target else {'id': row['id'] if 'id' in row else new_id()}
+        target.update(name=row['name'], price=row['price'], mrp=row['mrp'])
+        if 'image' in row:
+            apply_image(target, row['image'])
+        key = str(target['id'])
+        by_id[key] = by_name[row['name'].lower()] = changed[key] = target
+    added = sum(1 for key in changed if key not in original)
+    return list(changed.values()), added, len(changed) - added
+
+def apply_to_catalog(products, rows):
+    # Local catalogs use integer ids; new products continue after the highest one in use
+    taken = [p['id'] for p in products] + [row['id'] for row in rows if 'id' in row]
+    counter = itertools.count(max(taken, default=0) + 1)
+    changed, added, updated = merge(products, rows, lambda: next(counter))
+    by_id = {p['id']: p for p in products}
+    by_id.update((p['id'], p) for p in changed)
+    return list(by_id.values()), added, updated
+
+def write_to_dynamo(table, existing, rows):
+    # batch_writer sends BatchWriteItem calls of 25 and resends unprocessed items. DynamoDB has
+    # no transaction that large, so all-or-nothing here means nothing is sent unless every row validated.
+    changed, added, updated = merge(existing, rows, lambda: str(uuid.uuid4())[:8])
+    with table.batch_writer(overwrite_by_pkeys=['id']) as batch:
+        for product in changed:
+            # Every number, not just price/mrp: existing items come back as floats (rating_count...)
+            batch.put_item(Item=float_to_decimal({k: v for k, v in product.items() if v is not None}))
+    return changed, added, updated
+
+
+# --- EXPORT ---
+def export_lines(products, fmt):
+    # Generator of encoded chunks, so responses and files never hold the whole serialization
+    if fmt == 'ndjson':
+        for p in products:
+            yield json.dumps({k: _plain(p.get(k)) for k in FIELDS if p.get(k) is not None}) + "\n"
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for p in products:
+        writer.writerow({k: _plain(p.get(k)) for k in FIELDS})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()  # header only, for an empty catalog
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+if __name__ == '__main__':
+    # python catalog_io.py import FILE [app|aws_app]
+    # python catalog_io.py export [csv|ndjson] [app|aws_app] > FILE
+    if len(sys.argv) < 2 or sys.argv[1] not in ('import', 'export'):
+        sys.exit("usage: catalog_io.py import FILE [app|aws_app] | export [csv|ndjson] [app|aws_app]")
+    # Go through the imported module so exceptions match the ones the apps raise
+    import catalog_io
+    command = sys.argv[1]
+    if command == 'import':
+        path = sys.argv[2]
+        target = sys.argv[3] if len(sys.argv) > 3 else 'app'
+        module = __import__(target)
+        try:
+            with open(path, 'rb') as f:
+                added, updated = module.import_products(f, catalog_io.guess_format(path))
+        except catalog_io.CatalogImportError as e:
+            for line, message in e.errors:
+                print(f"line {line}: {message}", file=sys.stderr)
+            sys.exit(f"Import rejected: {e.invalid} invalid rows, nothing written")
+        print(f"Imported {added + updated} products ({added} new, {updated} updated)")
+    else:
+        fmt = sys.argv[2] if len(sys.argv) > 2 else 'csv'
+        target = sys.argv[3] if len(sys.argv) > 3 else 'app'
+        module = __import__(target)
+        for chunk in catalog_io.export_lines(module.iter_export_products(), fmt):
+            sys.stdout.write(chunk)
@@ -0,0 +1,347 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from boto3.dynamodb.conditions import Attr
+
+from sqlite_store import normalize_legacy_order
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Orders nobody has moved past 'placed' still need a van
+PENDING_STATUSES = (None, '', 'placed')
+NO_AREA = '—'
+
+
+# --- PENDING ORDERS ---
+def pending_orders(orders, since=None, until=None):
+    # Orders to deliver, placed in [since, until); dates compare as 'YYYY-MM-DD HH:MM' strings
+    for order in orders:
+        order, _ = normalize_legacy_order(order)
+        if order.get('status') not in PENDING_STATUSES:
+            continue
+        date = order.get('date') or ''
+        if (since and date < since) or (until and date >= until):
+            continue
+        yield order
+
+
+# --- PENDING INDEX ---
+# Checkout adds each order here and marking a van dispatched takes its orders
+# out again, so planning reads only what is still waiting, never the history.
+
+def pending_entry(order):
+    # (order_id, date, body): the fields planning and the stop list need, as JSON
+    order, _ = normalize_legacy_order(order)
+    body = {'order_id': order.get('order_id'), 'date': order.get('date') or '',
+            'address': order.get('address') or {},
+            'items': [{'id': i.get('id'), 'name': i.get('name'), 'qty': float(i.get('qty', 0))}
+                      for i in order.get('items', [])]}
+    return str(body['order_id']), body['date'], json.dumps(body, ensure_ascii=False)
+
+SQL_PENDING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_orders (
+    order_id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pending_orders_date ON pending_orders (date);
+"""
+SQL_PENDING_ADD = "INSERT OR REPLACE INTO pending_orders (order_id, date, body) VALUES (?, ?, ?)"
+SQL_PENDING_RANGE = "SELECT body FROM pending_orders WHERE date >= ? AND date < ? ORDER BY date"
+SQL_PENDING_DONE = "DELETE FROM pending_orders WHERE order_id = ?"
+
+
+class SQLitePendingOrders:
+    """Undispatched orders in a local SQLite file, indexed by date."""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._conn().executescript(SQL_PENDING_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, sql, rows):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            changed = conn.executemany(sql, rows).rowcount
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return changed
+
+    def add(self, order):
+        self.add_all([order])
+
+    def add_all(self, orders):
+        return self._write(SQL_PENDING_ADD, [pending_entry(o) for o in orders])
+
+    def orders(self, since=None, until=None):
+        rows = self._conn().execute(SQL_PENDING_RANGE, (since or '', until or '\uffff'))
+        return [json.loads(body) for body, in rows]
+
+    def mark_dispatched(self, order_ids):
+        return self._write(SQL_PENDING_DONE, [(str(i),) for i in order_ids])
+
+
+class DynamoPendingOrders:
+    """One item per undispatched order: `order_id` hash key, plus date and the JSON body.
+
+    Items are deleted once dispatched, so a scan only ever reads what is
+    still waiting for a van.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def add(self, order):
+        order_id, date, body = pending_entry(order)
+        self.table.put_item(Item={'order_id': order_id, 'date': date, 'body': body})
+
+    def add_all(self, orders):
+        count = 0
+        with self.table.batch_writer(overwrite_by_pkeys=['order_id']) as batch:
+            for order in orders:
+                order_id, date, body = pending_entry(order)
+                batch.put_item(Item={'order_id': order_id, 'date': date, 'body': body})
+                count += 1
+        return count
+
+    def orders(self, since=None, until=None):
+        kwargs, window = {}, None
+        if since:
+            window = Attr('date').gte(since)
+        if until:
+            window = Attr('date').lt(until) if window is None else window & Attr('date').lt(until)
+        if window is not None:
+            kwargs['FilterExpression'] = window
+        found = []
+        while True:
+            response = self.table.scan(**kwargs)
+            found.extend(json.loads(i['body']) for i in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return sorted(found, key=lambda o: o.get('date') or '')
+
+    def mark_dispatched(self, order_ids):
+        order_ids = list(dict.fromkeys(str(i) for i in order_ids))
+        with self.table.batch_writer() as batch:
+            for order_id in order_ids:
+                batch.delete_item(Key={'order_id': order_id})
+        return len(order_ids)
+
+
+def backfill(pending, orders, since=None, until=None):
+    # Seed the index from the order history, e.g. for orders placed before it existed
+    return pending.add_all(pending_orders(orders, since, until))
+
+
+class OrderTable:
+    """Pending orders as columns, sorted into delivery areas once.
+
+    Rows are ordered by (taluk, pincode, date), so every taluk is one
+    contiguous run (`areas` holds their bounds) and, inside it, neighbouring
+    pincodes and the oldest orders come first. Item lines are kept as
+    parallel columns pointing back at their order row.
+    """
+
+    def __init__(self, orders):
+        rows = []
+        for order in orders:
+            addr = order.get('address') or {}
+            items = [(str(i.get('name') or i.get('id')), float(i.get('qty', 0))) for i in order.get('items', [])]
+            rows.append(((addr.get('taluk') or '').strip().title() or NO_AREA,
+                         str(addr.get('pincode') or '').strip() or NO_AREA,
+                         order.get('date') or '', order, items))
+        rows.sort(key=lambda r: r[:3])
+        self.taluks = [r[0] for r in rows]
+        self.pincodes = [r[1] for r in rows]
+        self.orders = [r[3] for r in rows]
+        # Quantities are in kg, so an order weighs what its lines add up to
+        self.weights = [sum(q for _, q in r[4]) for r in rows]
+        self.item_rows = [n for n, r in enumerate(rows) for _ in r[4]]
+        self.products = [name for r in rows for name, _ in r[4]]
+        self.qtys = [q for r in rows for _, q in r[4]]
+        self.areas = []
+        start = 0
+        for n in range(1, len(rows) + 1):
+            if n == len(rows) or self.taluks[n] != self.taluks[start]:
+                self.areas.append((self.taluks[start], start, n))
+                start = n
+
+    def __len__(self):
+        return len(self.orders)
+
+
+# --- PACKING ---
+def pack(weights, areas, max_kg, max_stops=0):
+    """Greedy next-fit: [(start, end)] row spans, one per van.
+
+    A van takes orders in table order until the next one would break
+    `max_kg` or `max_stops` (0 = no stop limit), and never crosses into
+    another taluk. An order heavier than a van gets one to itself.
+    """
+    spans = []
+    if np is not None and len(weights):
+        # One cumulative sum for the whole table; each van is one binary search over it
+        cum = np.cumsum(np.asarray(weights, dtype=float))
+        for _, start, stop in areas:
+            while start < stop:
+                base = cum[start - 1] if start else 0.0
+                end = int(np.searchsorted(cum, base + max_kg + 1e-9, side='right'))
+                end = min(max(end, start + 1), stop)
+                if max_stops:
+                    end = min(end, start + max_stops)
+                spans.append((start, end))
+                start = end
+        return spans
+    for _, start, stop in areas:
+        load, first = 0.0, start
+        for n in range(start, stop):
+            full = n > first and (load + weights[n] > max_kg + 1e-9 or (max_stops and n - first >= max_stops))
+            if full:
+                spans.append((first, n))
+                load, first = 0.0, n
+            load += weights[n]
+        if first < stop:
+            spans.append((first, stop))
+    return spans
+
+
+# --- PICK LISTS ---
+def pick_lists(table, spans):
+    # ({van: [(product, qty, orders)]}, [(product, qty, orders)] for the whole slot), heaviest first
+    if not table.products:
+        return {}, []
+    van_of_row = [0] * len(table)
+    for van, (start, end) in enumerate(spans):
+        van_of_row[start:end] = [van] * (end - start)
+    vans = [van_of_row[n] for n in table.item_rows]
+    if np is not None:
+        names, product = np.unique(np.asarray(table.products, dtype=object).astype(str), return_inverse=True)
+        qtys = np.asarray(table.qtys, dtype=float)
+        keys, inverse = np.unique(np.asarray(vans, dtype=np.int64) * len(names) + product, return_inverse=True)
+        sums, lines = np.bincount(inverse, weights=qtys), np.bincount(inverse)
+        per_van = {}
+        for key, qty, count in zip(keys.tolist(), sums.tolist(), lines.tolist()):
+            per_van.setdefault(key // len(names), []).append((str(names[key % len(names)]), qty, count))
+        totals = zip(names.tolist(), np.bincount(product, weights=qtys).tolist(), np.bincount(product).tolist())
+    else:
+        acc, total_acc = {}, {}
+        for van, name, qty in zip(vans, table.products, table.qtys):
+            for bucket in (acc.setdefault(van, {}), total_acc):
+                q, c = bucket.get(name, (0.0, 0))
+                bucket[name] = (q + qty, c + 1)
+        per_van = {van: [(name, q, c) for name, (q, c) in picks.items()] for van, picks in acc.items()}
+        totals = [(name, q, c) for name, (q, c) in total_acc.items()]
+    order = lambda p: (-p[1], p[0])
+    return {van: sorted(picks, key=order) for van, picks in per_van.items()}, sorted(totals, key=order)
+
+
+# --- PLAN ---
+def _stop(order, weight):
+    addr = order.get('address') or {}
+    return {'order_id': order.get('order_id'), 'date': order.get('date'), 'weight': weight,
+            'name': addr.get('name'), 'phone': addr.get('phone'), 'address': addr.get('address'),
+            'pincode': addr.get('pincode'), 'taluk': addr.get('taluk')}
+
+def plan(orders, max_kg, max_stops=0, since=None, until=None):
+    """Vans, stops and pick lists for the orders still pending in [since, until).
+
+    `orders` is normally the pending index's `orders(since, until)`; any
+    iterable of orders works, so a full history can be planned too.
+    """
+    started = time.perf_counter()
+    table = OrderTable(pending_orders(orders, since, until))
+    spans = pack(table.weights, table.areas, max_kg, max_stops)
+    van_picks, total_picks = pick_lists(table, spans)
+    as_picks = lambda picks: [{'product': p, 'qty': q, 'orders': c} for p, q, c in picks]
+
+    batches = []
+    for van, (start, end) in enumerate(spans):
+        weight = sum(table.weights[start:end])
+        batches.append({
+            'number': van + 1,
+            'taluk': table.taluks[start],
+            'pincodes': list(dict.fromkeys(table.pincodes[start:end])),
+            'stops': [_stop(table.orders[n], table.weights[n]) for n in range(start, end)],
+            'weight': weight,
+            'overweight': weight > max_kg,
+            'picks': as_picks(van_picks.get(van, [])),
+        })
+    vans_per_taluk = {}
+    for batch in batches:
+        vans_per_taluk[batch['taluk']] = vans_per_taluk.get(batch['taluk'], 0) + 1
+    areas = [{'taluk': taluk, 'orders': stop - start, 'weight': sum(table.weights[start:stop]),
+              'batches': vans_per_taluk.get(taluk, 0)} for taluk, start, stop in table.areas]
+    return {
+        'since': since, 'until': until, 'max_kg': max_kg, 'max_stops': max_stops,
+        'orders': len(table), 'weight': sum(table.weights),
+        'batches': batches, 'areas': areas, 'picks': as_picks(total_picks),
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+    }
+
+
+if __name__ == '__main__':
+    # python dispatch.py [app|aws_app] --since 2026-02-05 --until 2026-02-06 [--json]
+    # python dispatch.py [app|aws_app] --backfill --since 2026-02-05   (index orders from the history)
+    # python dispatch.py [app|aws_app] --dispatched ID [ID ...]        (vans left, take them out)
+    parser = argparse.ArgumentParser(description="Plan delivery vans and pick lists for pending orders")
+    parser.add_argument("target", nargs="?", default="app", help="app module whose pending index to use")
+    parser.add_argument("--since", help="first order date, e.g. 2026-02-05 or '2026-02-05 14:00'")
+    parser.add_argument("--until", help="stop before this date")
+    parser.add_argument("--max-kg", type=float, help="load per van (default: the app's DISPATCH_MAX_KG)")
+    parser.add_argument("--max-stops", type=int, help="orders per van, 0 = no limit (default: DISPATCH_MAX_STOPS)")
+    parser.add_argument("--json", action="store_true", help="print the whole plan as JSON")
+    parser.add_argument("--backfill", action="store_true",
+                        help="add the repo's orders in [since, until) to the pending index; reads the full history "
+                             "and brings back orders already dispatched in that window")
+    parser.add_argument("--dispatched", nargs="+", metavar="ORDER_ID", help="mark these orders dispatched")
+    args = parser.parse_args()
+    module = __import__(args.target)
+    if args.backfill:
+        count = backfill(module.pending_index, module.repo.load_orders(), args.since, args.until)
+        print(f"Indexed {count} pending orders")
+        sys.exit(0)
+    if args.dispatched:
+        count = module.pending_index.mark_dispatched(args.dispatched)
+        print(f"Marked {count} orders dispatched")
+        sys.exit(0)
+    result = plan(module.pending_index.orders(args.since, args.until),
+                  args.max_kg if args.max_kg is not None else module.DISPATCH_MAX_KG,
+                  args.max_stops if args.max_stops is not None else module.DISPATCH_MAX_STOPS,
+                  args.since, args.until)
+    if args.json:
+        json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+        sys.exit(0)
+    print(f"{result['orders']} pending orders, {result['weight']:.1f} kg -> {len(result['batches'])} vans "
+          f"({result['elapsed_ms']:.0f} ms)")
+    for batch in result['batches']:
+        flag = "  OVERWEIGHT" if batch['overweight'] else ""
+        print(f"\nVan {batch['number']}: {batch['taluk']} {', '.join(batch['pincodes'])} - "
+              f"{len(batch['stops'])} stops, {batch['weight']:.1f} kg{flag}")
+        for pick in batch['picks']:
+            print(f"    {pick['product']:24} {pick['qty']:8.1f} kg  ({pick['orders']} orders)")
+    print("\nSlot pick list:")
+    for pick in result['picks']:
+        print(f"    {pick['product']:24} {pick['qty']:8.1f} kg  ({pick['orders']} orders)")
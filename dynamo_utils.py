@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+
+# Helper to handle DynamoDB Decimal types for JSON/Frontend
+def decimal_to_float(obj):
+    if isinstance(obj, list):
+        return [decimal_to_float(i) for i in obj]
+    elif isinstance(obj, dict):
+        return {k: decimal_to_float(v) for k, v in obj.items()}
+    elif isinstance(obj, Decimal):
+        return float(obj)
+    return obj
+
+# ...and back: boto3 rejects float attributes
+def float_to_decimal(obj):
+    if isinstance(obj, list):
+        return [float_to_decimal(i) for i in obj]
+    elif isinstance(obj, dict):
+        return {k: float_to_decimal(v) for k, v in obj.items()}
+    elif isinstance(obj, float):
+        return Decimal(str(obj))
+    return obj
+
+
+# --- SCANS ---
+def iter_scan(table, segment=None, total_segments=None, **kwargs):
+    # Follows LastEvaluatedKey so tables past the 1 MB page limit aren't truncated
+    if total_segments:
+        kwargs.update(Segment=segment, TotalSegments=total_segments)
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get('Items', [])
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_key
+
+def _scan_segment(table, segment=None, total_segments=None, **kwargs):
+    return list(iter_scan(table, segment, total_segments, **kwargs))
+
+def scan_all(table, segments=1, **kwargs):
+    if segments <= 1:
+        return _scan_segment(table, **kwargs)
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        futures = [pool.submit(_scan_segment, table, i, segments, **kwargs) for i in range(segments)]
+        return [item for f in futures for item in f.result()]
+
+
+# --- CATALOG SNAPSHOT ---
+class TTLStamp:
+    """Stamp for CatalogCache that changes every `ttl` seconds (or when bumped)."""
+
+    def __init__(self, ttl, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+
+    def __call__(self):
+        return int(self.clock() // self.ttl) if self.ttl > 0 else self.clock()
+
+def load_catalog(table, segments=1):
+    # Decimal -> float conversion runs once per refresh, not once per request
+    return decimal_to_float(scan_all(table, segments=segments))
+
+
+# --- BATCHED POINT READS ---
+BATCH_GET_LIMIT = 100
+
+def batch_get(resource, table_name, keys, max_retries=8, backoff=0.05):
+    # batch_get_item in chunks of 100 keys, retrying UnprocessedKeys with exponential backoff
+    items = []
+    for start in range(0, len(keys), BATCH_GET_LIMIT):
+        request = {table_name: {'Keys': keys[start:start + BATCH_GET_LIMIT]}}
+        attempt = 0
+        while request:
+            response = resource.batch_get_item(RequestItems=request)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            request = response.get('UnprocessedKeys') or None
+            if request:
+                if attempt >= max_retries:
+                    raise RuntimeError(f"batch_get_item left keys unprocessed after {max_retries} retries")
+                time.sleep(backoff * (2 ** attempt))
+                attempt += 1
+    return items
+
+
+class ProductLookup:
+    """Short-lived per-worker LRU of products fetched by id.
+
+    Misses for a whole cart are resolved with one batch_get_item round trip
+    (per 100 ids). Ids come from requests, so both maps are bounded: found
+    products up to `max_entries`, unknown ids (remembered so they aren't
+    re-fetched) up to `max_misses`, oldest dropped first.
+    """
+
+    def __init__(self, resource, table_name, key='id', ttl=10, clock=time.monotonic,
+                 max_entries=2048, max_misses=512):
+        self.resource = resource
+        self.table_name = table_name
+        self.key = key
+        self.ttl = ttl
+        self.clock = clock
+        self.max_entries = max_entries
+        self.max_misses = max_misses
+        self._cache = OrderedDict()   # pid -> (expires, product)
+        self._misses = OrderedDict()  # pid -> expires
+        self._lock = threading.Lock()
+
+    def _remember(self, entries, key, value, limit):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > limit:
+            entries.popitem(last=False)
+
+    def get_many(self, pids):
+        now = self.clock()
+        found, missing = {}, []
+        with self._lock:
+            for pid in dict.fromkeys(str(p) for p in pids):
+                hit = self._cache.get(pid)
+                if hit and hit[0] > now:
+                    self._cache.move_to_end(pid)
+                    found[pid] = hit[1]
+                elif self._misses.get(pid, 0) <= now:
+                    missing.append(pid)
+        if missing:
+            items = batch_get(self.resource, self.table_name, [{self.key: pid} for pid in missing])
+            fetched = {str(i[self.key]): decimal_to_float(i) for i in items}
+            expires = now + self.ttl
+            with self._lock:
+                for pid in missing:
+                    if pid in fetched:
+                        self._misses.pop(pid, None)
+                        self._remember(self._cache, pid, (expires, fetched[pid]), self.max_entries)
+                    else:
+                        self._cache.pop(pid, None)
+                        self._remember(self._misses, pid, expires, self.max_misses)
+            found.update(fetched)
+        return found
+
+    def get(self, pid):
+        return self.get_many([pid]).get(str(pid))
+
+    def invalidate(self, pid=None):
+        with self._lock:
+            if pid is None:
+                self._cache.clear()
+                self._misses.clear()
+            else:
+                self._cache.pop(str(pid), None)
+                self._misses.pop(str(pid), None)
@@ -0,0 +1,65 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import make_response, request
+from markupsafe import Markup
+
+
+# --- VALIDATORS ---
+def make_etag(*parts):
+    # Strong validator over everything the response body depends on
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:32]
+
+def _not_modified(etag, last_modified):
+    # If-None-Match wins when present (RFC 9110 13.2.2); If-Modified-Since is only a fallback
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return bool(last_modified and since and last_modified <= since)
+
+def conditional(etag, render, last_modified=None, private=True):
+    """Return 304 when the client's copy is current, otherwise build the response with `render()`.
+
+    Responses are stored by browsers but revalidated every time (no-cache),
+    so repeat visits cost one hash and an empty 304.
+    """
+    if _not_modified(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.vary.add('Cookie')
+    return response
+
+
+# --- FRAGMENTS ---
+class FragmentCache:
+    """Small LRU of rendered HTML fragments; keys must include every input of the fragment."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        if self.max_entries <= 0:
+            return Markup(render())
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                return html
+        html = Markup(render())
+        with self._lock:
+            self._entries[key] = html
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
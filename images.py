@@ -0,0 +1,154 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import sys
+import tempfile
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow (requirements.txt) is optional; without it products reuse the full image as thumbnail
+    Image = None
+
+
+IMAGES_DIR = os.path.join("static", "images")
+IMAGES_URL = "/static/images"
+PLACEHOLDER_URL = IMAGES_URL + "/placeholder.svg"
+THUMB_SIZE = (320, 320)
+
+DATA_URI_RE = re.compile(r'^data:(image/[a-zA-Z0-9.+-]+);base64,(.*)$', re.DOTALL)
+# Content-addressed file names: safe to serve with a far-future immutable Cache-Control
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{20}(-thumb)?\.[a-z]+$')
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+    'image/svg+xml': 'svg',
+}
+
+
+def is_data_uri(value):
+    return isinstance(value, str) and value.startswith('data:')
+
+def is_hashed_asset(filename):
+    return bool(HASHED_NAME_RE.match(os.path.basename(filename)))
+
+def _write_once(path, data):
+    # Same content always lands on the same name, so an existing file is already correct
+    if os.path.exists(path):
+        return
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+def _make_thumbnail(data, path):
+    if Image is None:
+        return False
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            # Already thumbnail-sized: the full image serves as its own thumbnail
+            if img.width <= THUMB_SIZE[0] and img.height <= THUMB_SIZE[1]:
+                return False
+            img.thumbnail(THUMB_SIZE)
+            out = io.BytesIO()
+            img.save(out, format=img.format or 'JPEG')
+    except (OSError, ValueError):
+        return False
+    _write_once(path, out.getvalue())
+    return True
+
+def store_data_uri(uri, images_dir=IMAGES_DIR):
+    # Returns (image_url, thumb_url), or None if the data URI can't be decoded
+    match = DATA_URI_RE.match(uri.strip())
+    if not match:
+        return None
+    mime, payload = match.group(1).lower(), match.group(2)
+    ext = EXTENSIONS.get(mime)
+    if not ext:
+        return None
+    try:
+        data = base64.b64decode(re.sub(r'\s+', '', payload), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    if not data:
+        return None
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    os.makedirs(images_dir, exist_ok=True)
+    name, thumb_name = f"{digest}.{ext}", f"{digest}-thumb.{ext}"
+    _write_once(os.path.join(images_dir, name), data)
+    image_url = f"{IMAGES_URL}/{name}"
+    if ext != 'svg' and _make_thumbnail(data, os.path.join(images_dir, thumb_name)):
+        return image_url, f"{IMAGES_URL}/{thumb_name}"
+    return image_url, image_url
+
+def ingest_image(value, images_dir=IMAGES_DIR):
+    # Normalize an image field from the admin forms or a product record into (image, thumb)
+    if not is_data_uri(value):
+        return value, None
+    stored = store_data_uri(value, images_dir)
+    if stored is None:
+        return PLACEHOLDER_URL, None
+    return stored
+
+def apply_image(product, value, images_dir=IMAGES_DIR):
+    image, thumb = ingest_image(value, images_dir)
+    product['image'] = image
+    if thumb and thumb != image:
+        product['thumb'] = thumb
+    else:
+        product.pop('thumb', None)
+    return product
+
+def extract_product_images(products, images_dir=IMAGES_DIR):
+    # Rewrites data: URIs in place; returns how many products changed
+    changed = 0
+    for product in products:
+        if is_data_uri(product.get('image')):
+            apply_image(product, product['image'], images_dir)
+            changed += 1
+    return changed
+
+def add_thumbnails(products, images_dir=IMAGES_DIR):
+    # Thumbnails for large images already in static/images; returns how many products got one
+    if Image is None:
+        return 0
+    added = 0
+    for product in products:
+        image = product.get('image') or ''
+        if not image.startswith(IMAGES_URL + '/') or image == PLACEHOLDER_URL or product.get('thumb'):
+            continue
+        name = image[len(IMAGES_URL) + 1:]
+        ext = name.rsplit('.', 1)[-1].lower()
+        if '/' in name or ext == 'svg':
+            continue
+        try:
+            with open(os.path.join(images_dir, name), 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        thumb_name = f"{hashlib.sha256(data).hexdigest()[:20]}-thumb.{ext}"
+        if _make_thumbnail(data, os.path.join(images_dir, thumb_name)):
+            product['thumb'] = f"{IMAGES_URL}/{thumb_name}"
+            added += 1
+    return added
+
+
+if __name__ == '__main__':
+    # python images.py [products.json] -- move inline images into static/images and add missing thumbnails
+    from storage import JsonStore
+    from app import DATA_FILE, PRODUCTS_FILE, ORDERS_FILE, DEFAULT_PRODUCTS
+    products_file = sys.argv[1] if len(sys.argv) > 1 else PRODUCTS_FILE
+    json_store = JsonStore(DATA_FILE, products_file, ORDERS_FILE, DEFAULT_PRODUCTS)
+    changed = json_store.update(products_file, DEFAULT_PRODUCTS, extract_product_images)
+    print(f"Extracted images from {changed} products in {products_file}")
+    if Image is None:
+        print("Pillow is not installed; no thumbnails made")
+    else:
+        added = json_store.update(products_file, DEFAULT_PRODUCTS, add_thumbnails)
+        print(f"Added thumbnails to {added} products in {products_file}")
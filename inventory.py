@@ -0,0 +1,417 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+
+# Products without a stock row are untracked: always available, never reserved.
+# Tracked products keep on_hand (physical units) and reserved (held by carts);
+# a cart may hold at most on_hand - reserved more.
+
+class OutOfStock(Exception):
+    """Raised when a reservation or checkout needs more than is available."""
+
+    def __init__(self, shortages):
+        super().__init__(', '.join(f"{pid} ({available:g} left)" for pid, available in shortages.items()))
+        self.shortages = shortages  # {product_id: units still available}
+
+
+class StockConflict(Exception):
+    """Raised when a cart's hold kept changing under a reservation or checkout; safe to retry."""
+
+
+# --- LOCAL (SQLITE) ---
+SQL_INVENTORY_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS inventory (
+            product_id TEXT PRIMARY KEY,
+            on_hand REAL NOT NULL,
+            reserved REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS stock_holds (
+            cart_id TEXT,
+            product_id TEXT,
+            qty REAL,
+            expires_at REAL,
+            PRIMARY KEY (cart_id, product_id)
+        ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_stock_holds_expiry ON stock_holds(expires_at)",
+    "CREATE INDEX IF NOT EXISTS idx_stock_holds_product ON stock_holds(product_id, expires_at)",
+]
+SQL_SET_STOCK = """INSERT INTO inventory (product_id, on_hand) VALUES (?, ?)
+    ON CONFLICT(product_id) DO UPDATE SET on_hand = excluded.on_hand"""
+SQL_UNTRACK = "DELETE FROM inventory WHERE product_id = ?"
+SQL_STOCK = "SELECT product_id, on_hand, reserved FROM inventory WHERE product_id = ?"
+SQL_HOLD = "SELECT qty FROM stock_holds WHERE cart_id = ? AND product_id = ?"
+SQL_CART_HOLDS = "SELECT product_id, qty FROM stock_holds WHERE cart_id = ?"
+# The availability check and the increment are one statement, so concurrent carts can't both win
+SQL_TAKE = "UPDATE inventory SET reserved = reserved + ? WHERE product_id = ? AND on_hand - reserved >= ?"
+SQL_GIVE_BACK = "UPDATE inventory SET reserved = MAX(reserved - ?, 0) WHERE product_id = ?"
+SQL_RESTOCK = "UPDATE inventory SET on_hand = on_hand + ? WHERE product_id = ?"
+SQL_SELL = """UPDATE inventory SET on_hand = on_hand - ?, reserved = MAX(reserved - ?, 0)
+    WHERE product_id = ? AND on_hand - reserved + ? >= ?"""
+SQL_PUT_HOLD = """INSERT INTO stock_holds (cart_id, product_id, qty, expires_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT(cart_id, product_id) DO UPDATE SET qty = excluded.qty, expires_at = excluded.expires_at"""
+SQL_DROP_HOLD = "DELETE FROM stock_holds WHERE cart_id = ? AND product_id = ?"
+SQL_EXPIRED = "SELECT cart_id, product_id, qty FROM stock_holds WHERE expires_at <= ? LIMIT ?"
+SQL_EXPIRED_FOR = "SELECT cart_id, product_id, qty FROM stock_holds WHERE product_id = ? AND expires_at <= ?"
+
+
+class SQLiteInventory:
+    """Stock counters and cart holds in a SQLite file shared by the local workers.
+
+    Every change is a short BEGIN IMMEDIATE transaction around conditional
+    UPDATEs; there is no application-level lock. Expired holds are returned
+    to stock lazily (when a product runs short) and by an occasional sweep.
+    """
+
+    def __init__(self, db_file, hold_ttl=15 * 60, sweep_probability=0.01, sweep_batch=500):
+        self.db_file = db_file
+        self.hold_ttl = hold_ttl
+        self.sweep_probability = sweep_probability
+        self.sweep_batch = sweep_batch
+        self._local = threading.local()
+        conn = self._conn()
+        for stmt in SQL_INVENTORY_SCHEMA:
+            conn.execute(stmt)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _tx(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def _release_rows(self, conn, rows):
+        for cart_id, pid, qty in rows:
+            conn.execute(SQL_DROP_HOLD, (cart_id, pid))
+            conn.execute(SQL_GIVE_BACK, (qty, pid))
+
+    def _reclaim_expired(self, conn, pid):
+        # Abandoned holds on a product that ran short go back to stock before we give up
+        self._release_rows(conn, conn.execute(SQL_EXPIRED_FOR, (pid, time.time())).fetchall())
+
+    # --- ADMIN ---
+    def set_stock(self, pid, on_hand):
+        # None stops tracking the product; holds on it become irrelevant
+        pid = str(pid)
+        if on_hand is None:
+            self._conn().execute(SQL_UNTRACK, (pid,))
+        else:
+            self._conn().execute(SQL_SET_STOCK, (pid, float(on_hand)))
+
+    def stock(self, pid):
+        # (on_hand, reserved), or None when the product is untracked
+        row = self._conn().execute(SQL_STOCK, (str(pid),)).fetchone()
+        return (row[1], row[2]) if row else None
+
+    def available(self, pid):
+        row = self.stock(pid)
+        return None if row is None else max(row[0] - row[1], 0)
+
+    # --- CART HOLDS ---
+    def reserve(self, cart_id, pid, qty):
+        """Make the cart's hold on `pid` exactly `qty` units, or raise OutOfStock."""
+        pid = str(pid)
+        if qty <= 0:
+            self.release(cart_id, pid)
+            return
+
+        def _reserve(conn):
+            if conn.execute(SQL_STOCK, (pid,)).fetchone() is None:
+                return
+            for attempt in range(2):
+                # Re-read the hold each time: reclaiming may have returned this cart's own expired hold
+                row = conn.execute(SQL_HOLD, (cart_id, pid)).fetchone()
+                held = row[0] if row else 0
+                delta = qty - held
+                if delta <= 0:
+                    conn.execute(SQL_GIVE_BACK, (-delta, pid))
+                    break
+                if conn.execute(SQL_TAKE, (delta, pid, delta)).rowcount:
+                    break
+                if attempt == 0:
+                    self._reclaim_expired(conn, pid)
+                    continue
+                on_hand, reserved = conn.execute(SQL_STOCK, (pid,)).fetchone()[1:]
+                raise OutOfStock({pid: max(on_hand - reserved + held, 0)})
+            conn.execute(SQL_PUT_HOLD, (cart_id, pid, qty, time.time() + self.hold_ttl))
+
+        self._tx(_reserve)
+        self._maybe_sweep()
+
+    def release(self, cart_id, pid):
+        def _release(conn):
+            held = conn.execute(SQL_HOLD, (cart_id, str(pid))).fetchone()
+            if held:
+                self._release_rows(conn, [(cart_id, str(pid), held[0])])
+        self._tx(_release)
+
+    def commit(self, cart_id, lines):
+        """Turn the cart's holds into sales for {pid: qty}; all lines or none.
+
+        Lines without a (still valid) hold are taken from free stock if there is
+        enough. Raises OutOfStock listing every line that can't be filled.
+        """
+        def _commit(conn):
+            shortages = {}
+            for pid, qty in lines.items():
+                pid = str(pid)
+                if conn.execute(SQL_STOCK, (pid,)).fetchone() is None:
+                    continue
+                for attempt in range(2):
+                    row = conn.execute(SQL_HOLD, (cart_id, pid)).fetchone()
+                    held = row[0] if row else 0
+                    if conn.execute(SQL_SELL, (qty, held, pid, held, qty)).rowcount:
+                        conn.execute(SQL_DROP_HOLD, (cart_id, pid))
+                        break
+                    if attempt == 0:
+                        self._reclaim_expired(conn, pid)
+                        continue
+                    on_hand, reserved = conn.execute(SQL_STOCK, (pid,)).fetchone()[1:]
+                    shortages[pid] = max(on_hand - reserved + held, 0)
+            if shortages:
+                raise OutOfStock(shortages)
+            # Anything else the cart still held goes back on the shelf
+            self._release_rows(conn, [(cart_id, p, q) for p, q in conn.execute(SQL_CART_HOLDS, (cart_id,)).fetchall()])
+
+        self._tx(_commit)
+
+    def restock(self, lines):
+        # Undo a commit whose order couldn't be saved; the units go back as free stock
+        def _restock(conn):
+            for pid, qty in lines.items():
+                conn.execute(SQL_RESTOCK, (float(qty), str(pid)))
+        self._tx(_restock)
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+
+        def _expire(conn):
+            rows = conn.execute(SQL_EXPIRED, (now, self.sweep_batch)).fetchall()
+            self._release_rows(conn, rows)
+            return len(rows)
+        return self._tx(_expire)
+
+    def _maybe_sweep(self):
+        if random.random() < self.sweep_probability:
+            self.expire()
+
+
+# --- DYNAMODB ---
+STOCK_HOLDER = '#stock'
+# Tries before a reservation or checkout whose hold keeps changing gives up
+HOLD_ATTEMPTS = 4
+
+
+class DynamoInventory:
+    """Stock and holds in one table: `product_id` hash key, `holder` range key.
+
+    The counter item (holder '#stock') carries on_hand, reserved and
+    available = on_hand - reserved. DynamoDB conditions can't do arithmetic,
+    so `available` is kept alongside and every change is guarded with
+    `available >= :n`. Hold items (holder = cart id) record qty and
+    hold_expires_at; don't enable table TTL on that attribute, since a hold
+    must be returned to `available` when it is reclaimed, not just deleted.
+    """
+
+    def __init__(self, table, hold_ttl=15 * 60):
+        self.table = table
+        self.hold_ttl = hold_ttl
+
+    @property
+    def client(self):
+        return self.table.meta.client
+
+    def _key(self, pid, holder):
+        return {'product_id': str(pid), 'holder': holder}
+
+    def _values(self, values):
+        # The resource's client serializes plain values itself; it only needs numbers as Decimal
+        return {k: Decimal(str(v)) if isinstance(v, (int, float)) else v for k, v in values.items()}
+
+    def _counter_update(self, pid, reserve=0, sell=0, require=None):
+        # on_hand -= sell, available -= reserve, reserved += reserve - sell (available stays on_hand - reserved)
+        update = {
+            'TableName': self.table.name,
+            'Key': self._key(pid, STOCK_HOLDER),
+            'UpdateExpression': "ADD on_hand :sold, reserved :r, available :a",
+            'ExpressionAttributeValues': self._values({':sold': -sell, ':r': reserve - sell, ':a': -reserve}),
+            'ConditionExpression': "attribute_exists(on_hand)",
+        }
+        if require is not None:
+            update['ConditionExpression'] += " AND available >= :need"
+            update['ExpressionAttributeValues'].update(self._values({':need': require}))
+        return {'Update': update}
+
+    def _hold_guard(self, held):
+        # The cart's hold must still be what we read, so two requests for one cart can't both apply a delta
+        return {'ConditionExpression': "attribute_not_exists(qty) OR qty = :held",
+                'ExpressionAttributeValues': self._values({':held': held})}
+
+    def _transact(self, actions):
+        # None once written, else the indexes of the actions whose condition failed
+        try:
+            self.client.transact_write_items(TransactItems=actions)
+            return None
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code == 'ConditionalCheckFailedException':
+                return {0}
+            if code != 'TransactionCanceledException':
+                raise
+            reasons = e.response.get('CancellationReasons') or []
+            return {n for n, reason in enumerate(reasons) if reason.get('Code') == 'ConditionalCheckFailed'}
+
+    # --- ADMIN ---
+    def set_stock(self, pid, on_hand):
+        if on_hand is None:
+            self.table.delete_item(Key={'product_id': str(pid), 'holder': STOCK_HOLDER})
+            return
+        # Updates may do arithmetic even though conditions can't; holds already taken stay reserved
+        self.table.update_item(
+            Key={'product_id': str(pid), 'holder': STOCK_HOLDER},
+            UpdateExpression="SET on_hand = :o, reserved = if_not_exists(reserved, :z), "
+                             "available = :o - if_not_exists(reserved, :z)",
+            ExpressionAttributeValues={':o': Decimal(str(on_hand)), ':z': Decimal(0)}
+        )
+
+    def stock(self, pid):
+        item = self.table.get_item(Key={'product_id': str(pid), 'holder': STOCK_HOLDER},
+                                   ConsistentRead=True).get('Item')
+        return (float(item['on_hand']), float(item['reserved'])) if item else None
+
+    def available(self, pid):
+        row = self.stock(pid)
+        return None if row is None else max(row[0] - row[1], 0)
+
+    def _hold(self, cart_id, pid):
+        item = self.table.get_item(Key={'product_id': str(pid), 'holder': cart_id}, ConsistentRead=True).get('Item')
+        return float(item['qty']) if item else 0
+
+    def _reclaim_expired(self, pid):
+        # Each expired hold is deleted and credited back in one transaction, guarded on the
+        # expiry so two workers reclaiming the same hold can't both credit it
+        now = time.time()
+        response = self.table.query(KeyConditionExpression=Key('product_id').eq(str(pid)), ConsistentRead=True)
+        for item in response.get('Items', []):
+            if item['holder'] == STOCK_HOLDER or float(item.get('hold_expires_at', now + 1)) > now:
+                continue
+            qty = float(item['qty'])
+            self._transact([
+                {'Delete': {'TableName': self.table.name, 'Key': self._key(pid, item['holder']),
+                            'ConditionExpression': "hold_expires_at <= :now",
+                            'ExpressionAttributeValues': self._values({':now': now})}},
+                self._counter_update(pid, reserve=-qty),
+            ])
+
+    # --- CART HOLDS ---
+    def reserve(self, cart_id, pid, qty):
+        pid = str(pid)
+        if qty <= 0:
+            self.release(cart_id, pid)
+            return
+        if self.stock(pid) is None:
+            return
+        reclaimed = False
+        for _ in range(HOLD_ATTEMPTS):
+            held = self._hold(cart_id, pid)
+            delta = qty - held
+            hold = {'Put': {'TableName': self.table.name, 'Item': {
+                **self._key(pid, cart_id),
+                **self._values({'qty': qty, 'hold_expires_at': time.time() + self.hold_ttl}),
+            }, **self._hold_guard(held)}}
+            failed = self._transact([self._counter_update(pid, reserve=delta, require=delta if delta > 0 else None), hold])
+            if failed is None:
+                return
+            if 0 not in failed:
+                continue  # only the hold moved: read it again
+            if reclaimed:
+                stock = self.stock(pid)
+                raise OutOfStock({pid: max(stock[0] - stock[1] + held, 0) if stock else 0})
+            self._reclaim_expired(pid)
+            reclaimed = True
+        raise StockConflict(f"Hold on {pid} for cart {cart_id} kept changing")
+
+    def release(self, cart_id, pid):
+        held = self._hold(cart_id, pid)
+        if not held:
+            return
+        self._transact([
+            {'Delete': {'TableName': self.table.name, 'Key': self._key(pid, cart_id),
+                        'ConditionExpression': "attribute_exists(qty)"}},
+            self._counter_update(pid, reserve=-held),
+        ])
+
+    def commit(self, cart_id, lines):
+        # One transaction for the whole order (DynamoDB allows 100 actions, i.e. 50 cart lines).
+        # Holds on products no longer in the cart are left to expire and be reclaimed.
+        lines = {str(pid): float(qty) for pid, qty in lines.items()}
+        tracked = [pid for pid in lines if self.stock(pid) is not None]
+        if not tracked:
+            return
+        reclaimed = False
+        for _ in range(HOLD_ATTEMPTS):
+            actions, held_by_pid, counters = [], {}, set()
+            for pid in tracked:
+                qty = lines[pid]
+                held = held_by_pid[pid] = self._hold(cart_id, pid)
+                counters.add(len(actions))
+                actions.append(self._counter_update(pid, reserve=qty - held, sell=qty,
+                                                    require=qty - held if qty > held else None))
+                if held:
+                    actions.append({'Delete': {'TableName': self.table.name, 'Key': self._key(pid, cart_id),
+                                               **self._hold_guard(held)}})
+                else:
+                    actions.append({'ConditionCheck': {'TableName': self.table.name, 'Key': self._key(pid, cart_id),
+                                                       'ConditionExpression': "attribute_not_exists(qty)"}})
+            failed = self._transact(actions)
+            if failed is None:
+                return
+            if not failed & counters:
+                continue  # only holds moved: read them again
+            if not reclaimed:
+                for pid in tracked:
+                    self._reclaim_expired(pid)
+                reclaimed = True
+                continue
+            shortages = {}
+            for pid, held in held_by_pid.items():
+                stock = self.stock(pid)
+                if stock and stock[0] - stock[1] + held < lines[pid]:
+                    shortages[pid] = max(stock[0] - stock[1] + held, 0)
+            if shortages:
+                raise OutOfStock(shortages)
+        raise StockConflict(f"Checkout for cart {cart_id} kept conflicting")
+
+    def restock(self, lines):
+        for pid, qty in lines.items():
+            try:
+                self.table.update_item(
+                    Key=self._key(pid, STOCK_HOLDER),
+                    UpdateExpression="ADD on_hand :q, available :q",
+                    ConditionExpression="attribute_exists(on_hand)",
+                    ExpressionAttributeValues=self._values({':q': qty})
+                )
+            except ClientError as e:
+                # Untracked since the sale: nothing to give back
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
@@ -0,0 +1,271 @@
+import bisect
+import functools
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Response, abort, g, request, session, template_rendered, before_render_template
+
+
+# Prometheus-style cumulative buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# --- HISTOGRAMS ---
+class Histogram:
+    """Latency histogram per label set; counts live in per-bucket slots and are summed on export."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *labels):
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            sep = ',' if base else ''
+            running = 0
+            for bound, count in zip(self.buckets, series):
+                running += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {running}')
+            running += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {running}')
+            braces = f'{{{base}}}' if base else ''
+            lines.append(f'{self.name}_sum{braces} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{braces} {running}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *labels):
+        with self._lock:
+            self._values[labels] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for labels, value in sorted(snapshot.items()):
+            base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            lines.append(f'{self.name}{{{base}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# --- SAMPLING PROFILER ---
+class SlowRequestProfiler:
+    """Samples the stacks of in-flight request threads; slow requests are written as folded stacks.
+
+    Output files hold one `frame;frame;frame count` line per distinct stack,
+    which flamegraph.pl and speedscope read directly. Only runs when a
+    threshold is configured, since sampling every thread has a real cost.
+    """
+
+    def __init__(self, threshold_ms, out_dir, interval=0.005):
+        self.threshold = threshold_ms / 1000.0
+        self.out_dir = out_dir
+        self.interval = interval
+        self._active = {}  # thread id -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def _start(self):
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid != os.getpid():
+                threading.Thread(target=self._run, name="slow-request-profiler", daemon=True).start()
+                self._started_pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_fold(frame)] += 1
+
+    def begin(self):
+        self._start()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def end(self, seconds, endpoint):
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if not stacks or seconds < self.threshold:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint or 'unknown'}-{int(seconds * 1000)}ms.folded"
+        with open(os.path.join(self.out_dir, name), 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+# --- REGISTRY ---
+class Metrics:
+    """Request, template and backend-call latencies for one process, exported at /metrics.
+
+    Each worker process keeps its own numbers; Prometheus scrapes and sums
+    them per instance.
+    """
+
+    def __init__(self, prefix='freshbasket'):
+        self.requests = Histogram(f"{prefix}_http_request_duration_seconds",
+                                  "Request latency by endpoint", ('method', 'endpoint', 'status'))
+        self.templates = Histogram(f"{prefix}_template_render_seconds",
+                                   "Template render time", ('template',))
+        self.backend_calls = Histogram(f"{prefix}_backend_call_duration_seconds",
+                                       "Storage, DynamoDB, SNS and password hashing calls",
+                                       ('backend', 'operation'))
+        self.backend_errors = CounterMetric(f"{prefix}_backend_call_errors_total",
+                                            "Backend calls that raised", ('backend', 'operation'))
+        self.profiler = None
+
+    def render(self):
+        lines = []
+        for metric in (self.requests, self.templates, self.backend_calls, self.backend_errors):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    # --- TIMED CALLS ---
+    def timed(self, backend, operation):
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    self.backend_errors.inc(backend, operation)
+                    raise
+                finally:
+                    self.backend_calls.observe(time.perf_counter() - start, backend, operation)
+            return wrapper
+        return decorator
+
+    def instrument_object(self, obj, backend, methods):
+        # Replace bound methods on this instance only; the class stays untouched
+        for name in methods:
+            if not hasattr(obj, name):
+                continue
+            setattr(obj, name, self.timed(backend, name)(getattr(obj, name)))
+        return obj
+
+    def instrument_boto3(self, client, backend):
+        # botocore emits these around every API call, including resource Table helpers and batch_writer;
+        # before-parameter-build rather than before-call, which stops at the first handler returning a response
+        service = client.meta.service_model.service_id.hyphenize()
+        client.meta.events.register(f'before-parameter-build.{service}', self._before_call)
+        client.meta.events.register(f'after-call.{service}', functools.partial(self._after_call, backend))
+        client.meta.events.register(f'after-call-error.{service}', functools.partial(self._call_error, backend))
+        return client
+
+    def _before_call(self, model=None, context=None, **kwargs):
+        if context is not None and model is not None:
+            context['metrics_call'] = (model.name, time.perf_counter())
+
+    def _after_call(self, backend, http_response=None, context=None, **kwargs):
+        call = (context or {}).pop('metrics_call', None)
+        if call is None:
+            return
+        self.backend_calls.observe(time.perf_counter() - call[1], backend, call[0])
+        if http_response is not None and http_response.status_code >= 300:
+            self.backend_errors.inc(backend, call[0])
+
+    def _call_error(self, backend, context=None, **kwargs):
+        # Connection-level failures never reach after-call
+        call = (context or {}).pop('metrics_call', None)
+        if call is not None:
+            self.backend_calls.observe(time.perf_counter() - call[1], backend, call[0])
+            self.backend_errors.inc(backend, call[0])
+
+    # --- FLASK WIRING ---
+    def init_app(self, app, path='/metrics', slow_request_ms=None, profile_dir='profiles', token=None):
+        # `path` is for a logged-in admin, or a scraper sending "Authorization: Bearer <token>"
+        if slow_request_ms:
+            self.profiler = SlowRequestProfiler(slow_request_ms, profile_dir)
+
+        @app.before_request
+        def start_request_timer():
+            g.metrics_start = time.perf_counter()
+            if self.profiler:
+                self.profiler.begin()
+
+        @app.teardown_request
+        def stop_request_timer(exc):
+            # teardown also runs for unhandled exceptions, which after_request skips
+            start = g.pop('metrics_start', None)
+            if start is None:
+                return
+            seconds = time.perf_counter() - start
+            status = g.pop('metrics_status', 500 if exc else 200)
+            self.requests.observe(seconds, request.method, request.endpoint or 'unmatched', status)
+            if self.profiler:
+                self.profiler.end(seconds, request.endpoint)
+
+        @app.after_request
+        def record_status(response):
+            g.metrics_status = response.status_code
+            return response
+
+        def on_before_render(sender, template, context, **extra):
+            g.setdefault('metrics_templates', []).append(time.perf_counter())
+
+        def on_rendered(sender, template, context, **extra):
+            starts = g.get('metrics_templates')
+            if starts:
+                self.templates.observe(time.perf_counter() - starts.pop(), template.name or 'string')
+
+        before_render_template.connect(on_before_render, app, weak=False)
+        template_rendered.connect(on_rendered, app, weak=False)
+
+        def serve_metrics():
+            bearer = request.headers.get('Authorization', '')
+            if not session.get('is_admin') and not (token and hmac.compare_digest(bearer, f"Bearer {token}")):
+                abort(403)
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+        app.add_url_rule(path, 'metrics', serve_metrics)
+        return self
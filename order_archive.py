@@ -0,0 +1,432 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+from datetime import datetime
+
+from storage import append_line, decode_cursor, encode_cursor, file_lock
+
+
+# --- RECORDS ---
+# Item fields an order keeps; product images and the like stay in the catalog
+ITEM_FIELDS = ('id', 'name', 'price', 'qty', 'subtotal')
+MONTH_RE = re.compile(r'^\d{4}-\d{2}')
+UNDATED = '0000-00'
+
+def slim_order(order):
+    return {**order, 'items': [{k: item[k] for k in ITEM_FIELDS if k in item}
+                               for item in order.get('items', [])]}
+
+def month_of(date):
+    return date[:7] if MONTH_RE.match(date or '') else UNDATED
+
+def order_key(order):
+    return (order.get('date', ''), order.get('order_id', ''))
+
+def encode_order(order):
+    return (json.dumps(order, separators=(',', ':')) + "\n").encode("utf-8")
+
+def parse_lines(chunk):
+    orders = []
+    for line in chunk.splitlines():
+        try:
+            orders.append(json.loads(line))
+        except ValueError:
+            # A torn line from a crash mid-append is skipped
+            continue
+    return orders
+
+def read_legacy(paths):
+    # Orders from the pre-archive orders.json / orders.jsonl; missing or unreadable files are skipped
+    legacy = []
+    for path in paths:
+        try:
+            with open(path, "r") as f:
+                if path.endswith(".json"):
+                    legacy.extend(json.load(f))
+                else:
+                    legacy.extend(parse_lines(f.read().encode("utf-8")))
+        except (FileNotFoundError, ValueError):
+            continue
+    return legacy
+
+def digest(value):
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+
+
+# --- SEALED SEGMENTS ---
+# One file per compacted month: header, order-id table, user table, then the orders as
+# NDJSON sorted by user. Both tables are sorted by a 16-byte key digest and binary
+# searched in place through mmap, and a user's orders are one contiguous byte range.
+SEGMENT_MAGIC = b'FBORDS1\n'
+HEADER = struct.Struct('<8sIIQ')       # magic, order entries, user entries, data offset
+ORDER_ENTRY = struct.Struct('<16sQI')  # digest(order_id), data offset, length
+USER_ENTRY = struct.Struct('<16sQQI')  # digest(user_email), data offset, length, order count
+
+
+def write_segment(path, orders):
+    orders = sorted(orders, key=lambda o: (o.get('user_email') or '', order_key(o)))
+    data, order_entries, user_entries = [], [], {}
+    offset = 0
+    for order in orders:
+        line = encode_order(order)
+        order_entries.append((digest(order.get('order_id', '')), offset, len(line)))
+        if order.get('user_email'):
+            user_digest = digest(order['user_email'])
+            start, length, count = user_entries.get(user_digest, (offset, 0, 0))
+            user_entries[user_digest] = (start, length + len(line), count + 1)
+        data.append(line)
+        offset += len(line)
+    order_entries.sort()
+    users = sorted((key, *span) for key, span in user_entries.items())
+    data_offset = HEADER.size + len(order_entries) * ORDER_ENTRY.size + len(users) * USER_ENTRY.size
+
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(SEGMENT_MAGIC, len(order_entries), len(users), data_offset))
+            f.write(b''.join(ORDER_ENTRY.pack(*entry) for entry in order_entries))
+            f.write(b''.join(USER_ENTRY.pack(*entry) for entry in users))
+            f.writelines(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SealedSegment:
+    """A read-only month of orders, mapped into memory."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.ino = os.fstat(f.fileno()).st_ino
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_orders, self.n_users, self.data_offset = HEADER.unpack_from(self.mm, 0)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"{path} is not an order segment")
+        self.users_offset = HEADER.size + self.n_orders * ORDER_ENTRY.size
+
+    def _find(self, start, count, entry, key):
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = start + mid * entry.size
+            found = self.mm[pos:pos + 16]
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                return entry.unpack_from(self.mm, pos)
+        return None
+
+    def _slice(self, offset, length):
+        start = self.data_offset + offset
+        return self.mm[start:start + length]
+
+    def get(self, order_id):
+        entry = self._find(HEADER.size, self.n_orders, ORDER_ENTRY, digest(order_id))
+        if entry is None:
+            return None
+        orders = parse_lines(self._slice(entry[1], entry[2]))
+        return orders[0] if orders and orders[0].get('order_id') == order_id else None
+
+    def user_orders(self, email):
+        entry = self._find(self.users_offset, self.n_users, USER_ENTRY, digest(email))
+        if entry is None:
+            return []
+        return [o for o in parse_lines(self._slice(entry[1], entry[2])) if o.get('user_email') == email]
+
+    def orders(self):
+        return parse_lines(self.mm[self.data_offset:])
+
+
+# --- LIVE SEGMENTS ---
+# Start of a live file remembered to tell it from a new file on a reused inode
+HEAD_BYTES = 256
+
+
+class LiveSegment:
+    """Offsets into a month's append-only NDJSON file, by order id and by user.
+
+    Each refresh only reads what was appended since the last one, so history
+    reads don't re-parse the month; the orders themselves stay on disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, ident):
+        self.ident, self.head, self.size, self.by_id, self.by_user = ident, b'', 0, {}, {}
+
+    def _refresh(self):
+        try:
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                # Appends never change bytes already written; a file compacted away and recreated
+                # can get the same inode back, and even outgrow our offsets, but not the same first order
+                head = f.read(min(HEAD_BYTES, st.st_size))
+                if ((st.st_dev, st.st_ino) != self.ident or st.st_size < self.size
+                        or head[:len(self.head)] != self.head):
+                    self._reset((st.st_dev, st.st_ino))
+                self.head = head
+                if st.st_size == self.size:
+                    return True
+                f.seek(self.size)
+                chunk = f.read(st.st_size - self.size)
+        except FileNotFoundError:
+            self._reset(None)
+            return False
+        # Only whole lines; a write still in progress is picked up next time
+        chunk = chunk[:chunk.rfind(b"\n") + 1]
+        offset = self.size
+        for line in chunk.splitlines(keepends=True):
+            try:
+                order = json.loads(line)
+            except ValueError:
+                order = None
+            if order:
+                span = (offset, len(line))
+                self.by_id[order.get('order_id')] = span
+                if order.get('user_email'):
+                    self.by_user.setdefault(order['user_email'], []).append(span)
+            offset += len(line)
+        self.size = offset
+        return True
+
+    def _read(self, spans):
+        try:
+            with open(self.path, "rb") as f:
+                chunks = []
+                for offset, length in spans:
+                    f.seek(offset)
+                    chunks.append(f.read(length))
+        except FileNotFoundError:
+            return []
+        return parse_lines(b''.join(chunks))
+
+    def get(self, order_id):
+        with self._lock:
+            span = self._refresh() and self.by_id.get(order_id)
+        return (self._read([span]) or [None])[0] if span else None
+
+    def user_orders(self, email):
+        with self._lock:
+            spans = list(self.by_user.get(email, [])) if self._refresh() else []
+        return [o for o in self._read(spans) if o.get('user_email') == email]
+
+    def orders(self):
+        try:
+            with open(self.path, "rb") as f:
+                return parse_lines(f.read())
+        except FileNotFoundError:
+            return []
+
+
+# --- ARCHIVE ---
+class OrderArchive:
+    """The json backend's orders, one file per calendar month under `root`.
+
+    New orders are appended to `live/YYYY-MM.ndjson` with slimmed items.
+    `compact()` (run from cron) seals each past month into a read-only
+    `sealed/YYYY-MM.seg` with its own index, so an order or a user's history
+    is found with a binary search and one read, and history pages stop at
+    the months they need. A late write to a sealed month lands in a new live
+    file and is folded in by the next compaction; reads merge both.
+    `legacy_files` (orders.json, orders.jsonl) are split into months on
+    first use.
+    """
+
+    def __init__(self, root, legacy_files=()):
+        self.root = root
+        self.live_dir = os.path.join(root, "live")
+        self.sealed_dir = os.path.join(root, "sealed")
+        self.marker = os.path.join(root, "migrated.json")
+        self.legacy_files = legacy_files
+        self._lock = threading.Lock()
+        self._live = {}
+        self._sealed = {}
+        self._ready = False
+
+    def _live_path(self, month):
+        return os.path.join(self.live_dir, month + ".ndjson")
+
+    def _sealed_path(self, month):
+        return os.path.join(self.sealed_dir, month + ".seg")
+
+    def _ensure(self):
+        if self._ready:
+            return
+        os.makedirs(self.live_dir, exist_ok=True)
+        os.makedirs(self.sealed_dir, exist_ok=True)
+        if not os.path.exists(self.marker):
+            with file_lock(self.marker):
+                if not os.path.exists(self.marker):
+                    counts = self._migrate()
+                    with open(self.marker, "w") as f:
+                        json.dump(counts, f)
+        self._ready = True
+
+    def _months(self):
+        names = [n[:-len(".ndjson")] for n in os.listdir(self.live_dir) if n.endswith(".ndjson")]
+        names += [n[:-len(".seg")] for n in os.listdir(self.sealed_dir) if n.endswith(".seg")]
+        return sorted(set(names))
+
+    def _live_segment(self, month):
+        with self._lock:
+            segment = self._live.get(month)
+            if segment is None:
+                segment = self._live[month] = LiveSegment(self._live_path(month))
+            return segment
+
+    def _sealed_segment(self, month):
+        path = self._sealed_path(month)
+        try:
+            ino = os.stat(path).st_ino
+        except FileNotFoundError:
+            self._sealed.pop(month, None)
+            return None
+        with self._lock:
+            segment = self._sealed.get(month)
+            if segment is None or segment.ino != ino:
+                # Re-sealed by compaction; readers still holding the old map keep a valid view
+                segment = self._sealed[month] = SealedSegment(path)
+            return segment
+
+    def _segments(self, month):
+        # Live first: compaction seals before it removes the live file, so nothing falls in between
+        segments = [self._live_segment(month)]
+        sealed = self._sealed_segment(month)
+        return segments + [sealed] if sealed else segments
+
+    # Writes
+    def add(self, order):
+        self._ensure()
+        path = self._live_path(month_of(order.get('date')))
+        line = encode_order(slim_order(order))
+        with file_lock(path):
+            try:
+                with open(path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # Don't glue this order onto a line torn by a crash
+                        line = b"\n" + line
+            except OSError:
+                pass
+            append_line(path, line)
+
+    # Reads
+    def get(self, order_id):
+        self._ensure()
+        for month in reversed(self._months()):
+            for segment in self._segments(month):
+                order = segment.get(order_id)
+                if order:
+                    return order
+        return None
+
+    def user_orders(self, email, limit=None, cursor=None):
+        # Newest first, keyset-paginated on (date, order_id); returns (orders, next_cursor)
+        self._ensure()
+        after = decode_cursor(cursor)
+        after = tuple(after) if after else None
+        found = []
+        for month in reversed(self._months()):
+            if after and month > month_of(after[0]):
+                continue
+            merged = {}
+            for segment in self._segments(month):
+                for order in segment.user_orders(email):
+                    merged.setdefault(order.get('order_id'), order)
+            found.extend(o for o in merged.values() if not after or order_key(o) < after)
+            if limit is not None and len(found) > limit:
+                break
+        found.sort(key=order_key, reverse=True)
+        if limit is None or len(found) <= limit:
+            return found, None
+        page = found[:limit]
+        return page, encode_cursor(list(order_key(page[-1])))
+
+    def _month_orders(self, month):
+        merged = {}
+        for segment in self._segments(month):
+            for order in segment.orders():
+                merged.setdefault(order.get('order_id'), order)
+        return sorted(merged.values(), key=order_key)
+
+    def iter_orders(self):
+        # Oldest first, one month in memory at a time
+        self._ensure()
+        for month in self._months():
+            yield from self._month_orders(month)
+
+    def load_orders(self):
+        return list(self.iter_orders())
+
+    # Maintenance
+    def compact(self, before=None):
+        """Seal every live month older than `before` (default: the current month)."""
+        self._ensure()
+        return self._compact(before or datetime.now().strftime("%Y-%m"))
+
+    def _compact(self, before):
+        sealed = 0
+        for month in self._months():
+            if month >= before:
+                continue
+            path = self._live_path(month)
+            with file_lock(path):
+                if not os.path.exists(path):
+                    continue
+                orders = self._month_orders(month)
+                if orders:
+                    write_segment(self._sealed_path(month), orders)
+                    sealed += 1
+                os.remove(path)
+        return sealed
+
+    def _migrate(self):
+        # Split orders.json and orders.jsonl into months; the originals are left as they are
+        from sqlite_store import normalize_legacy_order
+        legacy = read_legacy(self.legacy_files)
+        months = {}
+        for order in legacy:
+            order = slim_order(normalize_legacy_order(order)[0])
+            months.setdefault(month_of(order.get('date')), []).append(encode_order(order))
+        for month, lines in months.items():
+            with file_lock(self._live_path(month)):
+                append_line(self._live_path(month), b''.join(lines))
+        return {'orders': len(legacy), 'months': len(months),
+                'sealed': self._compact(datetime.now().strftime("%Y-%m"))}
+
+
+def archive_for(orders_file):
+    # Where the json backend keeps the archive for `orders_file`, and what it migrates from
+    directory = os.path.dirname(orders_file)
+    return OrderArchive(os.path.join(directory, "order_archive"),
+                        legacy_files=(orders_file, os.path.splitext(orders_file)[0] + ".jsonl"))
+
+
+if __name__ == '__main__':
+    # python order_archive.py compact|get ORDER_ID|user EMAIL [orders.json]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'compact'
+    archive = archive_for(sys.argv[-1] if sys.argv[-1].endswith(".json") else "orders.json")
+    if command == 'compact':
+        print(f"Sealed {archive.compact()} month(s) in {archive.root}")
+    elif command == 'get':
+        print(json.dumps(archive.get(sys.argv[2]), indent=4))
+    elif command == 'user':
+        print(json.dumps(archive.user_orders(sys.argv[2])[0], indent=4))
+    else:
+        sys.exit(f"Unknown command: {command}")
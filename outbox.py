@@ -0,0 +1,167 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+
+
+SQL_OUTBOX_SCHEMA = """CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY,
+        subject TEXT,
+        message TEXT,
+        status TEXT DEFAULT 'pending',
+        attempts INTEGER DEFAULT 0,
+        next_attempt_at REAL,
+        last_error TEXT,
+        created_at REAL
+    )"""
+SQL_OUTBOX_INDEX = "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)"
+SQL_ENQUEUE = """INSERT INTO outbox (subject, message, status, attempts, next_attempt_at, created_at)
+    VALUES (?, ?, 'pending', 0, ?, ?)"""
+# 'sending' rows whose lease ran out belong to a worker that died mid-publish
+SQL_DUE = """SELECT id, subject, message, attempts FROM outbox
+    WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND next_attempt_at <= ?)
+    ORDER BY next_attempt_at LIMIT ?"""
+SQL_CLAIM = "UPDATE outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?"
+SQL_SENT = "DELETE FROM outbox WHERE id = ?"
+SQL_RETRY = "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?"
+SQL_DEAD = "UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?"
+SQL_DEAD_LETTERS = "SELECT id, subject, message, attempts, last_error, created_at FROM outbox WHERE status = 'dead' ORDER BY id"
+SQL_PENDING_COUNT = "SELECT COUNT(*) FROM outbox WHERE status != 'dead'"
+
+SNS_BATCH_LIMIT = 10
+
+
+class Outbox:
+    """Durable queue of SNS notifications, published by background threads.
+
+    Requests only insert a row into a local SQLite file. Worker threads claim
+    due rows, send them with `publish_batch` (up to 10 per call), delete what
+    succeeded and reschedule failures with exponential backoff; after
+    `max_attempts` a message is parked as 'dead' for inspection. `publisher`
+    is anything with a boto3-style `publish_batch`, so a fake can stand in.
+    """
+
+    def __init__(self, db_file, publisher, topic_arn, workers=2, batch_size=SNS_BATCH_LIMIT,
+                 max_attempts=8, base_delay=1.0, max_delay=300.0, lease=60.0, poll_interval=0.5):
+        self.db_file = db_file
+        self.publisher = publisher
+        self.topic_arn = topic_arn
+        self.workers = workers
+        self.batch_size = min(batch_size, SNS_BATCH_LIMIT)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute(SQL_OUTBOX_SCHEMA)
+        conn.execute(SQL_OUTBOX_INDEX)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # --- PRODUCER SIDE ---
+    def enqueue(self, subject, message):
+        now = time.time()
+        self._conn().execute(SQL_ENQUEUE, (subject, message, now, now))
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        # Threads don't survive fork, so each worker process starts its own publishers
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._wakeup = threading.Event()
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f"outbox-{i}", daemon=True).start()
+            self._started_pid = os.getpid()
+
+    # --- CONSUMER SIDE ---
+    def _claim(self):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(SQL_DUE, (now, now, self.batch_size)).fetchall()
+            for row in rows:
+                conn.execute(SQL_CLAIM, (now + self.lease, row[0]))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return rows
+
+    def _backoff(self, attempts):
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _fail(self, conn, row, error):
+        attempts = row[3] + 1
+        if attempts >= self.max_attempts:
+            conn.execute(SQL_DEAD, (attempts, error, row[0]))
+        else:
+            conn.execute(SQL_RETRY, (attempts, time.time() + self._backoff(attempts), error, row[0]))
+
+    def process_batch(self):
+        rows = self._claim()
+        if not rows:
+            return 0
+        conn = self._conn()
+        try:
+            response = self.publisher.publish_batch(
+                TopicArn=self.topic_arn,
+                PublishBatchRequestEntries=[
+                    {'Id': str(row[0]), 'Subject': row[1], 'Message': row[2]} for row in rows
+                ]
+            )
+        except Exception as e:
+            print(f"SNS Error: {e}")
+            for row in rows:
+                self._fail(conn, row, str(e))
+            return len(rows)
+        by_id = {str(row[0]): row for row in rows}
+        for ok in response.get('Successful', []):
+            conn.execute(SQL_SENT, (int(ok['Id']),))
+            by_id.pop(ok['Id'], None)
+        failed = {f['Id']: f.get('Message') or f.get('Code', 'failed') for f in response.get('Failed', [])}
+        for entry_id, row in by_id.items():
+            self._fail(conn, row, failed.get(entry_id, 'missing from publish_batch response'))
+        return len(rows)
+
+    def _run(self):
+        while True:
+            try:
+                if self.process_batch():
+                    continue
+            except Exception as e:
+                print(f"Outbox worker error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    # --- INSPECTION ---
+    def pending_count(self):
+        return self._conn().execute(SQL_PENDING_COUNT).fetchone()[0]
+
+    def dead_letters(self):
+        return self._conn().execute(SQL_DEAD_LETTERS).fetchall()
+
+    def drain(self, timeout=10.0):
+        # Publish everything that is due right now on the calling thread (tests, shutdown hooks)
+        deadline = time.time() + timeout
+        while time.time() < deadline and self.process_batch():
+            pass
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Too many hashes queued (or one took too long); the caller should answer 429."""
+
+
+# --- WORKER SIDE ---
+# Module-level so the pool's processes can import them
+
+def hash_method(pwhash):
+    # 'scrypt:32768:8:1$salt$hash' -> 'scrypt:32768:8:1'
+    return (pwhash or '').split('$', 1)[0]
+
+def verify(pwhash, password, method):
+    # (matches, replacement hash or None); the replacement is made in the same trip while we know the password
+    if not pwhash or not check_password_hash(pwhash, password or ''):
+        return False, None
+    if method and hash_method(pwhash) != method:
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+def generate(password, method):
+    return generate_password_hash(password or '', method=method)
+
+
+# --- POOL ---
+class PasswordHasher:
+    """Password hashing and checks in a small process pool, off the request threads.
+
+    Hashing is deliberately CPU-heavy; in a pool of `workers` processes it
+    can't take every request thread of the worker with it. At most
+    `max_pending` calls are queued or running per web worker: beyond that, and
+    after `timeout` seconds, callers get HasherBusy instead of waiting. The
+    pool is started on first use in each process (spawned, not forked, since
+    the web worker runs other threads). workers=0 hashes on the calling thread.
+
+    Hashes made with another `method` (e.g. older pbkdf2 settings) still
+    verify; a successful check returns a new hash in the current method for
+    the caller to save, so cost settings can change without locking anyone out.
+    """
+
+    def __init__(self, method, workers=2, max_pending=32, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None  # (pid, executor)
+
+    def _executor(self):
+        pool = self._pool
+        if pool and pool[0] == os.getpid():
+            return pool[1]
+        with self._lock:
+            if not self._pool or self._pool[0] != os.getpid():
+                executor = ProcessPoolExecutor(max_workers=self.workers,
+                                               mp_context=multiprocessing.get_context('spawn'))
+                self._pool = (os.getpid(), executor)
+            return self._pool[1]
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("password queue is full")
+        release = True
+        try:
+            if not self.workers:
+                return fn(*args)
+            executor = self._executor()
+            future = executor.submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except TimeoutError:
+                if not future.cancel():
+                    # Already hashing in the pool: its slot stays taken until the process is done with it
+                    release = False
+                    future.add_done_callback(lambda _: self._slots.release())
+                raise HasherBusy("password check timed out")
+        except BrokenProcessPool:
+            # A pool process died (OOM killer...); the next caller gets a new pool
+            with self._lock:
+                if self._pool and self._pool[1] is executor:
+                    self._pool = None
+            raise HasherBusy("password pool restarted")
+        finally:
+            if release:
+                self._slots.release()
+
+    def start(self):
+        # Spawning takes a moment; a post-fork/startup hook can do it before the first login
+        if self.workers:
+            self._executor().submit(hash_method, '').result()
+
+    def check(self, pwhash, password, rehash=True):
+        # (matches, new hash to save or None)
+        return self._run(verify, pwhash, password, self.method if rehash else None)
+
+    def generate(self, password):
+        return self._run(generate, password, self.method)
@@ -0,0 +1,340 @@
+import bisect
+import hashlib
+import heapq
+import json
+import os
+import sqlite3
+import sys
+import threading
+import uuid
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
+
+from dynamo_utils import decimal_to_float, scan_all
+
+
+# Offers never stack: while several overlap on a product, the biggest discount wins.
+# Dates are local calendar dates like the order dates; a date-only end_date runs through that day.
+
+def parse_when(value, end=False):
+    if value in (None, ''):
+        return datetime.max if end else datetime.min
+    value = str(value).strip()
+    try:
+        when = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid offer date: {value!r}")
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    if end and len(value) <= 10:
+        when = datetime.combine(when.date(), time.min) + timedelta(days=1)
+    return when
+
+def discounted(price, percent):
+    return round(float(price) * (100 - float(percent)) / 100, 2)
+
+
+# --- INTERVAL INDEX ---
+class OfferIndex:
+    """Per-product step functions of the best active discount, built with one sweep.
+
+    For each product: sorted boundary times and the discount in force from each
+    boundary until the next one. Looking up a moment is a bisect per product;
+    `boundaries` holds every product's boundaries, so the next change anywhere
+    in the catalog is one bisect too.
+    """
+
+    def __init__(self, offers):
+        events = []
+        for offer in offers:
+            # Rows are validated when added, but one edited by hand must not take pricing down with it
+            try:
+                start = parse_when(offer.get('start_date'))
+                end = parse_when(offer.get('end_date'), end=True)
+                percent = float(offer.get('discount_percent') or 0)
+                pid = str(offer['product_id'])
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Offer Error: skipping offer {offer.get('id')}: {e}")
+                continue
+            if end <= start or not 0 < percent <= 100:
+                continue
+            events.append((start, pid, percent, end))
+            events.append((end, pid, None, None))
+        events.sort(key=lambda e: (e[0], e[1]))
+
+        self.steps = {}  # pid -> ([times], [percent from that time])
+        active = {}  # pid -> heap of (-percent, end); expired entries are dropped lazily
+        boundaries = set()
+        i = 0
+        while i < len(events):
+            when, pid = events[i][0], events[i][1]
+            heap = active.setdefault(pid, [])
+            while i < len(events) and events[i][0] == when and events[i][1] == pid:
+                if events[i][2] is not None:
+                    heapq.heappush(heap, (-events[i][2], events[i][3]))
+                i += 1
+            while heap and heap[0][1] <= when:
+                heapq.heappop(heap)
+            best = -heap[0][0] if heap else 0.0
+            times, percents = self.steps.setdefault(pid, ([], []))
+            if (percents[-1] if percents else 0.0) == best:
+                continue
+            times.append(when)
+            percents.append(best)
+            boundaries.add(when)
+        self.boundaries = sorted(boundaries)
+
+    def at(self, when):
+        # ({pid: percent} in force at `when`, the next boundary after it or None)
+        discounts = {}
+        for pid, (times, percents) in self.steps.items():
+            i = bisect.bisect_right(times, when) - 1
+            if i >= 0 and percents[i]:
+                discounts[pid] = percents[i]
+        i = bisect.bisect_right(self.boundaries, when)
+        return discounts, self.boundaries[i] if i < len(self.boundaries) else None
+
+
+# --- EFFECTIVE PRICES ---
+class PriceBook:
+    """Discounts for the current offer window, reused until the next boundary.
+
+    Offers are re-read only when `stamp()` changes; the window is recomputed
+    only when the clock passes the next boundary. Between the two, pricing a
+    product is a dict lookup.
+    """
+
+    def __init__(self, loader, stamp, clock=datetime.now):
+        self.loader = loader
+        self.stamp = stamp
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._index = None  # (stamp, OfferIndex)
+        self._state = None  # (stamp, valid_from, valid_until, discounts, token, last_modified)
+
+    def _current(self):
+        stamp = self.stamp()
+        now = self.clock()
+        state = self._state
+        if state and state[0] == stamp and state[1] <= now and (state[2] is None or now < state[2]):
+            return state
+        with self._lock:
+            state = self._state
+            if state and state[0] == stamp and state[1] <= now and (state[2] is None or now < state[2]):
+                return state
+            if self._index is None or self._index[0] != stamp:
+                self._index = (stamp, OfferIndex(self.loader()))
+            index = self._index[1]
+            discounts, valid_until = index.at(now)
+            i = bisect.bisect_right(index.boundaries, now) - 1
+            valid_from = index.boundaries[i] if i >= 0 else datetime.min
+            token = hashlib.sha1(json.dumps(sorted(discounts.items())).encode("utf-8")).hexdigest()[:16]
+            if state and state[4] == token:
+                last_modified = state[5]
+            else:
+                last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+            self._state = state = (stamp, valid_from, valid_until, discounts, token, last_modified)
+            return state
+
+    def discount(self, pid):
+        return self._current()[3].get(str(pid), 0)
+
+    def apply(self, product):
+        # A discounted copy; products without an offer are returned as they are
+        percent = self._current()[3].get(str(product['id']))
+        if not percent:
+            return product
+        price = float(product['price'])
+        mrp = max(float(product.get('mrp') or 0), price)
+        return {**product, 'price': discounted(price, percent), 'mrp': mrp}
+
+    def token(self):
+        # Same for every worker in the same window; goes into ETags and fragment keys
+        return self._current()[4]
+
+    def last_modified(self):
+        return self._current()[5]
+
+    def valid_until(self):
+        return self._current()[2]
+
+
+class PricedCatalog:
+    """A CatalogCache view with the current offers applied to every product.
+
+    Rebuilt once per (catalog digest, offer window); cached products are shared
+    and must not be mutated, same as the underlying catalog.
+    """
+
+    def __init__(self, catalog, book):
+        self.catalog = catalog
+        self.book = book
+        self._lock = threading.Lock()
+        self._state = None  # (key, products, index, digest)
+
+    def _current(self):
+        key = (self.catalog.digest(), self.book.token())
+        state = self._state
+        if state and state[0] == key:
+            return state
+        with self._lock:
+            state = self._state
+            if state and state[0] == key:
+                return state
+            products = [self.book.apply(p) for p in self.catalog.products()]
+            index = {str(p['id']): p for p in products}
+            digest = hashlib.sha1(":".join(key).encode("utf-8")).hexdigest()
+            self._state = state = (key, products, index, digest)
+            return state
+
+    def products(self):
+        return self._current()[1]
+
+    def index(self):
+        return self._current()[2]
+
+    def get(self, pid):
+        return self._current()[2].get(str(pid))
+
+    def priced(self, products):
+        # Re-point raw catalog products (e.g. search hits) at their priced copies
+        index = self._current()[2]
+        return [index.get(str(p['id']), p) for p in products]
+
+    def digest(self):
+        return self._current()[3]
+
+    def last_modified(self):
+        return max(self.catalog.last_modified(), self.book.last_modified())
+
+
+# --- OFFER STORAGE ---
+OFFER_FIELDS = ('product_id', 'discount_percent', 'season', 'start_date', 'end_date')
+
+def validate_offer(offer):
+    percent = float(offer['discount_percent'])
+    if not 0 < percent <= 100:
+        raise ValueError("discount_percent must be between 0 and 100")
+    start = parse_when(offer.get('start_date'))
+    end = parse_when(offer.get('end_date'), end=True)
+    if end <= start:
+        raise ValueError("end_date must not be before start_date")
+    return {**offer, 'product_id': str(offer['product_id']), 'discount_percent': percent}
+
+# Same table as the shipped freshbasket.db; triggers keep a version number so
+# workers notice edits made anywhere, including by hand in the sqlite3 shell
+SQL_OFFERS_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS seasonal_offers (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER,
+            discount_percent REAL,
+            season TEXT,
+            start_date TEXT,
+            end_date TEXT
+        )""",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)",
+] + [
+    f"""CREATE TRIGGER IF NOT EXISTS seasonal_offers_{op.lower()}_version AFTER {op} ON seasonal_offers
+        BEGIN
+            INSERT INTO meta (key, value) VALUES ('offers_version', 1)
+                ON CONFLICT(key) DO UPDATE SET value = value + 1;
+        END"""
+    for op in ('INSERT', 'UPDATE', 'DELETE')
+]
+SQL_OFFERS = "SELECT id, product_id, discount_percent, season, start_date, end_date FROM seasonal_offers"
+SQL_OFFERS_VERSION = "SELECT value FROM meta WHERE key = 'offers_version'"
+SQL_INSERT_OFFER = """INSERT INTO seasonal_offers (product_id, discount_percent, season, start_date, end_date)
+    VALUES (?, ?, ?, ?, ?)"""
+SQL_DELETE_OFFER = "DELETE FROM seasonal_offers WHERE id = ?"
+
+
+class SQLiteOffers:
+    """seasonal_offers rows in freshbasket.db, whatever the storage backend."""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+        conn = self._conn()
+        for stmt in SQL_OFFERS_SCHEMA:
+            conn.execute(stmt)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self):
+        return [dict(r) for r in self._conn().execute(SQL_OFFERS)]
+
+    def stamp(self):
+        row = self._conn().execute(SQL_OFFERS_VERSION).fetchone()
+        return row['value'] if row else 0
+
+    def add(self, offer):
+        offer = validate_offer(offer)
+        cur = self._conn().execute(SQL_INSERT_OFFER, (int(offer['product_id']), offer['discount_percent'],
+                                                      offer.get('season'), offer.get('start_date'),
+                                                      offer.get('end_date')))
+        return cur.lastrowid
+
+    def remove(self, offer_id):
+        self._conn().execute(SQL_DELETE_OFFER, (int(offer_id),))
+
+
+class DynamoOffers:
+    """One item per offer keyed by `id`; picked up by workers on their next refresh."""
+
+    def __init__(self, table, segments=1):
+        self.table = table
+        self.segments = segments
+
+    def load(self):
+        return decimal_to_float(scan_all(self.table, segments=self.segments))
+
+    def add(self, offer):
+        offer = validate_offer(offer)
+        item = {k: offer[k] for k in OFFER_FIELDS if offer.get(k) not in (None, '')}
+        item['id'] = str(uuid.uuid4())[:8]
+        item['discount_percent'] = Decimal(str(item['discount_percent']))
+        self.table.put_item(Item=item)
+        return item['id']
+
+    def remove(self, offer_id):
+        self.table.delete_item(Key={'id': str(offer_id)})
+
+
+if __name__ == '__main__':
+    # python pricing.py list [app|aws_app]
+    # python pricing.py add PRODUCT_ID PERCENT START_DATE END_DATE [SEASON] [app|aws_app]
+    # python pricing.py remove OFFER_ID [app|aws_app]
+    usage = "usage: pricing.py list | add PRODUCT_ID PERCENT START END [SEASON] | remove OFFER_ID  [app|aws_app]"
+    args = sys.argv[1:]
+    target = args.pop() if args and args[-1] in ('app', 'aws_app') else 'app'
+    if not args or args[0] not in ('list', 'add', 'remove'):
+        sys.exit(usage)
+    module = __import__(target)
+    command = args[0]
+    if command == 'list':
+        for offer in sorted(module.offers.load(), key=lambda o: (str(o.get('start_date')), str(o['product_id']))):
+            print(f"{offer['id']}\t{offer['product_id']}\t{offer['discount_percent']:g}%\t"
+                  f"{offer.get('start_date') or '-'} .. {offer.get('end_date') or '-'}\t{offer.get('season') or ''}")
+    elif command == 'add':
+        if len(args) < 5:
+            sys.exit(usage)
+        try:
+            offer_id = module.offers.add({'product_id': args[1], 'discount_percent': args[2], 'start_date': args[3],
+                                          'end_date': args[4], 'season': args[5] if len(args) > 5 else None})
+        except ValueError as e:
+            sys.exit(f"Offer rejected: {e}")
+        print(f"Added offer {offer_id}")
+    else:
+        if len(args) < 2:
+            sys.exit(usage)
+        module.offers.remove(args[1])
+        print(f"Removed offer {args[1]}")
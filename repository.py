@@ -0,0 +1,254 @@
+import uuid
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+import catalog_io
+from catalog_cache import CatalogCache
+from dynamo_utils import ProductLookup, TTLStamp, decimal_to_float, float_to_decimal, iter_scan, load_catalog, scan_all
+from storage import decode_cursor, encode_cursor, make_store
+
+
+# --- REPOSITORY INTERFACE ---
+# What the routes need from a storage backend, whatever it is:
+#   catalog                      CatalogCache of the full product list (list prices)
+#   get_products(pids)           {str(pid): product} for the ids that exist (cart pricing)
+#   get_product(pid)             one product, fresh enough to edit, or None
+#   add_product / update_product / delete_product / import_products(rows) / iter_products()
+#   get_user / create_user / update_address / update_password
+#   add_order / user_orders(email, limit, cursor) / load_orders
+# Product ids reach the routes as strings; `id_type` is what the backend stores.
+# Carts have their own backends in cart_store.
+
+class LocalRepository:
+    """A JsonStore or SQLiteStore behind the repository interface.
+
+    The catalog is small and read on every page, so it is held in memory and
+    reloaded when the store's stamp changes; cart pricing is a dict lookup.
+    Product edits rewrite the whole list, as the store only saves it whole,
+    in one locked read-modify-write so concurrent admins can't undo each other.
+    """
+
+    id_type = int
+
+    def __init__(self, store):
+        self.store = store
+        self.catalog = CatalogCache(lambda: self.load_products(), store.products_stamp)
+
+    # Products
+    def load_products(self):
+        return self.store.load_products()
+
+    def get_products(self, pids):
+        index = self.catalog.index()
+        return {pid: index[pid] for pid in (str(p) for p in pids) if pid in index}
+
+    def get_product(self, pid):
+        return self.catalog.get(pid)
+
+    def _update_products(self, fn):
+        # Admin routes edit a private copy read under the store's lock, never the cached list
+        result = self.store.update_products(fn)
+        self.catalog.bump()
+        return result
+
+    def add_product(self, product):
+        def _add(products):
+            new = {'id': max([p['id'] for p in products]) + 1 if products else 1, **product}
+            products.append(new)
+            return new['id']
+        return self._update_products(_add)
+
+    def update_product(self, pid, product):
+        def _update(products):
+            for i, p in enumerate(products):
+                if str(p['id']) == str(pid):
+                    # Fields the form doesn't know about stay; a dropped thumb is removed
+                    products[i] = {**{k: v for k, v in p.items() if k != 'thumb'}, **product, 'id': p['id']}
+                    return True
+            return False
+        return self._update_products(_update)
+
+    def delete_product(self, pid):
+        def _delete(products):
+            products[:] = [p for p in products if str(p['id']) != str(pid)]
+        self._update_products(_delete)
+
+    def import_products(self, rows):
+        # Validated rows in, one catalog write out
+        def _import(products):
+            products[:], added, updated = catalog_io.apply_to_catalog(products, rows)
+            return added, updated
+        return self._update_products(_import)
+
+    def iter_products(self):
+        return iter(self.catalog.products())
+
+    def invalidate(self, pid=None):
+        self.catalog.bump()
+
+    # Users
+    def get_user(self, email):
+        return self.store.get_user(email)
+
+    def create_user(self, email, user):
+        return self.store.create_user(email, user)
+
+    def update_address(self, email, address):
+        self.store.update_user(email, {'address': address})
+
+    def update_password(self, email, password_hash):
+        self.store.update_user(email, {'password': password_hash})
+
+    # Orders
+    def add_order(self, order):
+        self.store.add_order(order)
+
+    def user_orders(self, email, limit=None, cursor=None):
+        return self.store.user_orders(email, limit=limit, cursor=cursor)
+
+    def load_orders(self):
+        return self.store.load_orders()
+
+
+class DynamoRepository:
+    """FreshBasket_Users, _Products and _Orders behind the repository interface.
+
+    The catalog is a full scan reused for `catalog_ttl` seconds per worker;
+    cart pricing fetches only the ids in the cart (batch_get_item) through a
+    short-lived lookup cache. Order history is a query on the user_email GSI.
+    Items come back as floats and go in as Decimals.
+    """
+
+    id_type = str
+
+    def __init__(self, dynamodb, users_table, products_table, orders_table, orders_user_index,
+                 catalog_ttl=30, scan_segments=1, lookup_ttl=10):
+        self.users_table = users_table
+        self.products_table = products_table
+        self.orders_table = orders_table
+        self.orders_user_index = orders_user_index
+        self.scan_segments = scan_segments
+        self.catalog = CatalogCache(lambda: self.load_products(), TTLStamp(catalog_ttl))
+        self.lookup = ProductLookup(dynamodb, products_table.name, ttl=lookup_ttl)
+
+    # Products
+    def load_products(self):
+        return load_catalog(self.products_table, self.scan_segments)
+
+    def get_products(self, pids):
+        return self.lookup.get_many(pids)
+
+    def get_product(self, pid):
+        return decimal_to_float(self.products_table.get_item(Key={'id': str(pid)}).get('Item'))
+
+    def add_product(self, product):
+        item = float_to_decimal({'id': str(uuid.uuid4())[:8], **product})
+        self.products_table.put_item(Item=item)
+        self.invalidate(item['id'])
+        return item['id']
+
+    def update_product(self, pid, product):
+        # Only the admin form's fields; rating counters and anything else on the item stay
+        values = float_to_decimal({':name': product['name'], ':price': product['price'],
+                                   ':mrp': product['mrp'], ':image': product.get('image')})
+        update = "set #n = :name, price = :price, mrp = :mrp, image = :image"
+        if product.get('thumb'):
+            update += ", thumb = :thumb"
+            values[':thumb'] = product['thumb']
+        else:
+            update += " remove thumb"
+        try:
+            self.products_table.update_item(
+                Key={'id': str(pid)},
+                UpdateExpression=update,
+                ConditionExpression="attribute_exists(id)",
+                ExpressionAttributeNames={'#n': 'name'},
+                ExpressionAttributeValues=values
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        self.invalidate(pid)
+        return True
+
+    def delete_product(self, pid):
+        self.products_table.delete_item(Key={'id': str(pid)})
+        self.invalidate(pid)
+
+    def import_products(self, rows):
+        existing = decimal_to_float(scan_all(self.products_table, segments=self.scan_segments))
+        _, added, updated = catalog_io.write_to_dynamo(self.products_table, existing, rows)
+        self.invalidate(None)
+        return added, updated
+
+    def iter_products(self):
+        # One scan page in memory at a time
+        return iter_scan(self.products_table)
+
+    def invalidate(self, pid=None):
+        self.lookup.invalidate(pid)
+        self.catalog.bump()
+
+    # Users
+    def get_user(self, email):
+        return decimal_to_float(self.users_table.get_item(Key={'email': email}).get('Item'))
+
+    def create_user(self, email, user):
+        # The condition is the uniqueness check, so two signups for one email can't both win
+        try:
+            self.users_table.put_item(Item=float_to_decimal({**user, 'email': email}),
+                                      ConditionExpression="attribute_not_exists(email)")
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        return True
+
+    def update_address(self, email, address):
+        self.users_table.update_item(
+            Key={'email': email},
+            UpdateExpression="set address = :a",
+            ExpressionAttributeValues={':a': float_to_decimal(address)}
+        )
+
+    def update_password(self, email, password_hash):
+        self.users_table.update_item(
+            Key={'email': email},
+            UpdateExpression="set password = :p",
+            ConditionExpression="attribute_exists(email)",
+            ExpressionAttributeValues={':p': password_hash}
+        )
+
+    # Orders
+    def add_order(self, order):
+        self.orders_table.put_item(Item=float_to_decimal(order))
+
+    def user_orders(self, email, limit=None, cursor=None):
+        query = {
+            'IndexName': self.orders_user_index,
+            'KeyConditionExpression': Key('user_email').eq(email),
+            'ScanIndexForward': False,
+        }
+        if limit:
+            query['Limit'] = limit
+        start_key = decode_cursor(cursor)
+        if start_key:
+            query['ExclusiveStartKey'] = start_key
+        response = self.orders_table.query(**query)
+        return decimal_to_float(response.get('Items', [])), encode_cursor(response.get('LastEvaluatedKey'))
+
+    def load_orders(self):
+        return decimal_to_float(scan_all(self.orders_table, segments=self.scan_segments))
+
+
+def make_repository(backend, users_file=None, products_file=None, orders_file=None, default_products=None,
+                    db_file=None, dynamodb=None, tables=None, orders_user_index=None, **dynamo_options):
+    # json / sqlite: local files; dynamodb: `tables` maps users/products/orders to boto3 Table objects
+    if backend == 'dynamodb':
+        return DynamoRepository(dynamodb, tables['users'], tables['products'], tables['orders'],
+                                orders_user_index, **dynamo_options)
+    return LocalRepository(make_store(backend, users_file=users_file, products_file=products_file,
+                                      orders_file=orders_file, default_products=default_products,
+                                      db_file=db_file))
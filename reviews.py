@@ -0,0 +1,282 @@
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from dynamo_utils import decimal_to_float, iter_scan
+from storage import decode_cursor, encode_cursor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+MAX_COMMENT_LENGTH = 1000
+
+
+# --- AGGREGATES ---
+# One review per user per product; writing again replaces the earlier one.
+# Summaries look like catalog products ({'id', 'count', 'avg'}) so a CatalogCache can hold them.
+
+def validate_review(rating, comment):
+    try:
+        rating = int(rating)
+    except (TypeError, ValueError):
+        raise ValueError("Choose a rating from 1 to 5")
+    if not 1 <= rating <= 5:
+        raise ValueError("Choose a rating from 1 to 5")
+    return rating, (comment or '').strip()[:MAX_COMMENT_LENGTH]
+
+def summary(pid, count, total):
+    count = int(count)
+    return {'id': pid, 'count': count, 'total': float(total), 'avg': round(float(total) / count, 1) if count else 0.0}
+
+def summarize(ratings):
+    # [(product_id, rating)] -> [summary]; one array group-by when numpy is available
+    pids, values = [], []
+    for pid, rating in ratings:
+        pids.append(str(pid))
+        values.append(float(rating))
+    if not pids:
+        return []
+    if np is not None:
+        uniq, inverse = np.unique(np.asarray(pids, dtype=object).astype(str), return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(uniq))
+        totals = np.bincount(inverse, weights=np.asarray(values, dtype=float), minlength=len(uniq))
+        return [summary(pid, counts[i], totals[i]) for i, pid in enumerate(uniq.tolist())]
+    acc = {}
+    for pid, value in zip(pids, values):
+        a = acc.setdefault(pid, [0, 0.0])
+        a[0] += 1
+        a[1] += value
+    return [summary(pid, count, total) for pid, (count, total) in acc.items()]
+
+
+# --- LOCAL (SQLITE) ---
+# ratings is the table shipped in freshbasket.db; rating_summary is kept in step with it
+SQL_REVIEWS_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS ratings (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER,
+            user_email TEXT,
+            rating INTEGER,
+            comment TEXT,
+            created_at TEXT
+        )""",
+    """CREATE TABLE IF NOT EXISTS rating_summary (
+            product_id TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID""",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)",
+    "CREATE INDEX IF NOT EXISTS idx_ratings_product ON ratings(product_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_ratings_product_user ON ratings(product_id, user_email)",
+]
+SQL_USER_REVIEW = "SELECT id, rating FROM ratings WHERE product_id = ? AND user_email = ?"
+SQL_INSERT_REVIEW = """INSERT INTO ratings (product_id, user_email, rating, comment, created_at)
+    VALUES (?, ?, ?, ?, ?)"""
+SQL_REPLACE_REVIEW = "UPDATE ratings SET rating = ?, comment = ?, created_at = ? WHERE id = ?"
+SQL_SUMMARY_ADD = """INSERT INTO rating_summary (product_id, count, total) VALUES (?, ?, ?)
+    ON CONFLICT(product_id) DO UPDATE SET count = count + excluded.count, total = total + excluded.total"""
+SQL_SUMMARIES = "SELECT product_id, count, total FROM rating_summary WHERE count > 0"
+SQL_RATINGS_VERSION = "SELECT value FROM meta WHERE key = 'ratings_version'"
+SQL_BUMP_RATINGS = """INSERT INTO meta (key, value) VALUES ('ratings_version', 1)
+    ON CONFLICT(key) DO UPDATE SET value = value + 1"""
+SQL_REVIEW_COLUMNS = "SELECT id, user_email, rating, comment, created_at FROM ratings"
+SQL_PRODUCT_REVIEWS = SQL_REVIEW_COLUMNS + " WHERE product_id = ? ORDER BY created_at DESC, id DESC LIMIT ?"
+SQL_PRODUCT_REVIEWS_AFTER = SQL_REVIEW_COLUMNS + """ WHERE product_id = ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC LIMIT ?"""
+SQL_ALL_RATINGS = "SELECT product_id, rating FROM ratings"
+
+
+class SQLiteReviews:
+    """Reviews in freshbasket.db's ratings table with a running per-product summary.
+
+    The review and its summary delta are written in one transaction, and the
+    ratings version in meta is bumped so every worker's cache reloads.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+        conn = self._conn()
+        for stmt in SQL_REVIEWS_SCHEMA:
+            conn.execute(stmt)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _tx(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def add(self, pid, email, rating, comment=''):
+        rating, comment = validate_review(rating, comment)
+        now = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+        def _add(conn):
+            existing = conn.execute(SQL_USER_REVIEW, (pid, email)).fetchone()
+            if existing:
+                conn.execute(SQL_REPLACE_REVIEW, (rating, comment, now, existing['id']))
+                conn.execute(SQL_SUMMARY_ADD, (str(pid), 0, rating - existing['rating']))
+            else:
+                conn.execute(SQL_INSERT_REVIEW, (pid, email, rating, comment, now))
+                conn.execute(SQL_SUMMARY_ADD, (str(pid), 1, rating))
+            conn.execute(SQL_BUMP_RATINGS)
+        self._tx(_add)
+
+    def page(self, pid, limit, cursor=None):
+        # Walks idx_ratings_product backwards; the cursor is the last (created_at, id) returned
+        after = decode_cursor(cursor)
+        if after:
+            rows = self._conn().execute(SQL_PRODUCT_REVIEWS_AFTER, (pid, after[0], after[1], limit + 1)).fetchall()
+        else:
+            rows = self._conn().execute(SQL_PRODUCT_REVIEWS, (pid, limit + 1)).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1]['created_at'], rows[-1]['id']])
+        return [dict(r) for r in rows], next_cursor
+
+    def summaries(self):
+        return [summary(r['product_id'], r['count'], r['total']) for r in self._conn().execute(SQL_SUMMARIES)]
+
+    def stamp(self):
+        row = self._conn().execute(SQL_RATINGS_VERSION).fetchone()
+        return row['value'] if row else 0
+
+    def iter_ratings(self):
+        for row in self._conn().execute(SQL_ALL_RATINGS):
+            yield row['product_id'], row['rating']
+
+    def replace_summaries(self, summaries):
+        def _replace(conn):
+            conn.execute("DELETE FROM rating_summary")
+            conn.executemany(SQL_SUMMARY_ADD, [(s['id'], s['count'], s['total']) for s in summaries])
+            conn.execute(SQL_BUMP_RATINGS)
+        self._tx(_replace)
+
+
+# --- DYNAMODB ---
+class DynamoReviews:
+    """Reviews keyed by product_id (hash) and user_email (range).
+
+    The running summary is kept on the product item itself (rating_count,
+    rating_total), so the catalog scan already carries it. Listing uses a
+    local secondary index on created_at.
+    """
+
+    def __init__(self, table, products_table, by_date_index):
+        self.table = table
+        self.products_table = products_table
+        self.by_date_index = by_date_index
+
+    @property
+    def client(self):
+        # Looked up per call, so a lazily built table stays unbuilt until first used
+        return self.table.meta.client
+
+    def _values(self, values):
+        return {k: Decimal(str(v)) if isinstance(v, (int, float)) else v for k, v in values.items()}
+
+    def add(self, pid, email, rating, comment='', retries=3):
+        rating, comment = validate_review(rating, comment)
+        pid = str(pid)
+        for _ in range(retries):
+            existing = self.table.get_item(Key={'product_id': pid, 'user_email': email},
+                                           ConsistentRead=True).get('Item')
+            old = int(existing['rating']) if existing else None
+            put = {'TableName': self.table.name, 'Item': self._values({
+                'product_id': pid, 'user_email': email, 'rating': rating, 'comment': comment,
+                'created_at': datetime.now().strftime("%Y-%m-%d %H:%M"),
+            })}
+            # Guard on what we read, so two concurrent edits can't both apply their delta
+            if old is None:
+                put['ConditionExpression'] = "attribute_not_exists(user_email)"
+            else:
+                put['ConditionExpression'] = "rating = :old"
+                put['ExpressionAttributeValues'] = self._values({':old': old})
+            bump = {'Update': {
+                'TableName': self.products_table.name,
+                'Key': self._values({'id': pid}),
+                'UpdateExpression': "ADD rating_count :c, rating_total :t",
+                'ConditionExpression': "attribute_exists(id)",
+                'ExpressionAttributeValues': self._values({':c': 0 if old is not None else 1, ':t': rating - (old or 0)}),
+            }}
+            try:
+                self.client.transact_write_items(TransactItems=[{'Put': put}, bump])
+                return
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'TransactionCanceledException':
+                    raise
+        raise RuntimeError(f"Review for product {pid} kept conflicting, giving up")
+
+    def page(self, pid, limit, cursor=None):
+        query = {
+            'IndexName': self.by_date_index,
+            'KeyConditionExpression': Key('product_id').eq(str(pid)),
+            'ScanIndexForward': False,
+            'Limit': limit,
+        }
+        start_key = decode_cursor(cursor)
+        if start_key:
+            query['ExclusiveStartKey'] = start_key
+        response = self.table.query(**query)
+        return decimal_to_float(response.get('Items', [])), encode_cursor(response.get('LastEvaluatedKey'))
+
+    def iter_ratings(self):
+        for item in iter_scan(self.table, ProjectionExpression='product_id, rating'):
+            yield item['product_id'], item['rating']
+
+    def replace_summaries(self, summaries):
+        # Not atomic: reviews written while this runs may be counted twice or not at all
+        by_id = {str(s['id']): s for s in summaries}
+        for product in iter_scan(self.products_table, ProjectionExpression='id'):
+            s = by_id.get(str(product['id']))
+            if s:
+                self.products_table.update_item(
+                    Key={'id': product['id']},
+                    UpdateExpression="SET rating_count = :c, rating_total = :t",
+                    ExpressionAttributeValues={':c': s['count'], ':t': Decimal(str(s['total']))})
+            else:
+                self.products_table.update_item(Key={'id': product['id']},
+                                                UpdateExpression="REMOVE rating_count, rating_total")
+
+
+def summaries_from_products(products):
+    return [summary(str(p['id']), p['rating_count'], p.get('rating_total', 0))
+            for p in products if p.get('rating_count')]
+
+
+def rebuild(reviews):
+    summaries = summarize(reviews.iter_ratings())
+    reviews.replace_summaries(summaries)
+    return len(summaries)
+
+
+if __name__ == '__main__':
+    # python reviews.py [app|aws_app] -- recompute every product's rating summary from the reviews
+    target = sys.argv[1] if len(sys.argv) > 1 else 'app'
+    module = __import__(target)
+    print(f"Rebuilt rating summaries for {rebuild(module.reviews)} products")
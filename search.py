@@ -0,0 +1,195 @@
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+
+
+# --- TEXT NORMALIZATION ---
+def normalize(text):
+    # Lowercase, strip accents and collapse punctuation to single spaces
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', text).strip()
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a, b, limit):
+    # Levenshtein distance, giving up early once every cell in a row exceeds `limit`
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+# Scores for how a query term matched a name token; a product's rank is the sum over terms
+EXACT, PREFIX, SUBSTRING, FUZZY = 1.0, 0.8, 0.6, 0.4
+FUZZY_CANDIDATES = 50
+RESULT_CACHE_SIZE = 1024
+
+
+class SearchIndex:
+    """Inverted index over normalized product names.
+
+    Tokens map to product ids; a sorted vocabulary answers prefix queries
+    with bisect and a trigram index over the vocabulary finds substring and
+    typo-tolerant (edit distance) matches. `sync()` diffs a fresh catalog
+    against the indexed one so only added, renamed or removed products are
+    re-indexed. Ranked results are memoized until the index next changes,
+    so repeated searches and autocomplete keystrokes are dictionary hits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.source = None
+        self.docs = {}        # pid -> (normalized name, tokens, product)
+        self.postings = {}    # token -> set(pid)
+        self.grams = {}       # trigram -> set(token)
+        self._vocab = None    # sorted tokens, rebuilt lazily after changes
+        self._results = {}    # (normalized query, limit) -> ranked products
+
+    # --- MAINTENANCE ---
+    def add(self, product):
+        with self._lock:
+            self._add(product)
+
+    def _add(self, product):
+        pid = str(product['id'])
+        self._remove(pid)
+        name = normalize(product.get('name'))
+        tokens = tuple(dict.fromkeys(name.split()))
+        self.docs[pid] = (name, tokens, product)
+        self._results.clear()
+        for token in tokens:
+            if token not in self.postings:
+                self.postings[token] = set()
+                for gram in trigrams(token):
+                    self.grams.setdefault(gram, set()).add(token)
+                self._vocab = None
+            self.postings[token].add(pid)
+
+    def remove(self, pid):
+        with self._lock:
+            self._remove(str(pid))
+
+    def _remove(self, pid):
+        doc = self.docs.pop(pid, None)
+        if not doc:
+            return
+        self._results.clear()
+        for token in doc[1]:
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(pid)
+            if not ids:
+                del self.postings[token]
+                for gram in trigrams(token):
+                    tokens = self.grams.get(gram)
+                    if tokens:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self.grams[gram]
+                self._vocab = None
+
+    def sync(self, products):
+        with self._lock:
+            if self.source is products:
+                return
+            fresh = {str(p['id']): p for p in products}
+            for pid in [pid for pid in self.docs if pid not in fresh]:
+                self._remove(pid)
+            for pid, product in fresh.items():
+                doc = self.docs.get(pid)
+                if doc and doc[0] == normalize(product.get('name')):
+                    if doc[2] is not product:
+                        self.docs[pid] = (doc[0], doc[1], product)
+                        self._results.clear()
+                else:
+                    self._add(product)
+            self._vocabulary()
+            self.source = products
+
+    # --- QUERIES ---
+    def _vocabulary(self):
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        return self._vocab
+
+    def _term_matches(self, term):
+        # token -> score for a single query term
+        matches = {}
+        if term in self.postings:
+            matches[term] = EXACT
+        vocab = self._vocabulary()
+        i = bisect.bisect_left(vocab, term)
+        while i < len(vocab) and vocab[i].startswith(term):
+            matches.setdefault(vocab[i], PREFIX)
+            i += 1
+        if len(term) < 3:
+            # Too short for trigrams; the vocabulary is small next to the catalog
+            for token in vocab:
+                if term in token:
+                    matches.setdefault(token, SUBSTRING)
+            return matches
+        shared = {}
+        for gram in trigrams(term):
+            for token in self.grams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        limit = 1 if len(term) <= 5 else 2
+        for token, _ in heapq.nlargest(FUZZY_CANDIDATES, shared.items(), key=lambda kv: kv[1]):
+            if token in matches:
+                continue
+            if term in token:
+                matches[token] = SUBSTRING
+                continue
+            dist = edit_distance(term, token, limit)
+            if dist <= limit:
+                matches[token] = FUZZY - 0.1 * dist
+        # Substrings sharing few trigrams with the padded term can fall outside the candidates
+        for token in shared:
+            if token not in matches and term in token:
+                matches[token] = SUBSTRING
+        return matches
+
+    def search(self, query, limit=None):
+        terms = normalize(query).split()
+        if not terms:
+            return []
+        phrase = ' '.join(terms)
+        with self._lock:
+            cached = self._results.get((phrase, limit))
+            if cached is not None:
+                return cached
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token, score in self._term_matches(term).items():
+                    for pid in self.postings[token]:
+                        if score > term_scores.get(pid, 0):
+                            term_scores[pid] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    # Every query term has to match some token of the name
+                    scores = {pid: s + term_scores[pid] for pid, s in scores.items() if pid in term_scores}
+            rank = lambda kv: (-(kv[1] + (0.5 if self.docs[kv[0]][0].startswith(phrase) else 0)),
+                               self.docs[kv[0]][0])
+            if limit is None:
+                ranked = sorted(scores.items(), key=rank)
+            else:
+                ranked = heapq.nsmallest(limit, scores.items(), key=rank)
+            results = [self.docs[pid][2] for pid, _ in ranked]
+            if len(self._results) >= RESULT_CACHE_SIZE:
+                self._results.clear()
+            self._results[(phrase, limit)] = results
+            return results
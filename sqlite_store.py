@@ -0,0 +1,340 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from storage import decode_cursor, encode_cursor
+
+
+# --- SCHEMA ---
+# Same layout as the shipped freshbasket.db, plus the columns app.py needs
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT UNIQUE,
+            email TEXT UNIQUE,
+            password TEXT,
+            profile TEXT
+        )""",
+    """CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            description TEXT,
+            price REAL,
+            image TEXT,
+            stock INTEGER
+        )""",
+    """CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            total REAL,
+            status TEXT,
+            created_at TEXT,
+            name TEXT,
+            address TEXT,
+            taluk TEXT,
+            near TEXT,
+            district TEXT,
+            pincode TEXT,
+            phone TEXT
+        )""",
+    """CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY,
+            order_id INTEGER,
+            product_id INTEGER,
+            quantity INTEGER,
+            price REAL
+        )""",
+    """CREATE TABLE IF NOT EXISTS ratings (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER,
+            user_email TEXT,
+            rating INTEGER,
+            comment TEXT,
+            created_at TEXT
+        )""",
+    """CREATE TABLE IF NOT EXISTS seasonal_offers (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER,
+            discount_percent REAL,
+            season TEXT,
+            start_date TEXT,
+            end_date TEXT
+        )""",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)",
+]
+
+EXTRA_COLUMNS = [
+    ("products", "mrp", "REAL"),
+    ("products", "thumb", "TEXT"),
+    ("orders", "order_ref", "TEXT"),
+    ("orders", "payment", "TEXT"),
+    ("order_items", "name", "TEXT"),
+    ("order_items", "subtotal", "REAL"),
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_order_ref ON orders(order_ref)",
+]
+
+ADDRESS_FIELDS = ('name', 'address', 'taluk', 'near', 'district', 'pincode', 'phone')
+
+# --- STATEMENTS ---
+# Kept as constants so sqlite3's per-connection statement cache reuses the prepared plans
+SQL_PRODUCTS = "SELECT id, name, price, mrp, image, thumb FROM products ORDER BY id"
+SQL_UPSERT_PRODUCT = """INSERT INTO products (id, name, price, mrp, image, thumb) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET name = excluded.name, price = excluded.price,
+    mrp = excluded.mrp, image = excluded.image, thumb = excluded.thumb"""
+SQL_INSERT_PRODUCT = """INSERT INTO products (id, name, price, mrp, image, thumb) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO NOTHING"""
+SQL_CATALOG_VERSION = "SELECT value FROM meta WHERE key = 'catalog_version'"
+SQL_BUMP_CATALOG = """INSERT INTO meta (key, value) VALUES ('catalog_version', 1)
+    ON CONFLICT(key) DO UPDATE SET value = value + 1"""
+SQL_USER = "SELECT id, password, profile FROM users WHERE email = ?"
+SQL_INSERT_USER = "INSERT INTO users (email, password, profile) VALUES (?, ?, ?) ON CONFLICT(email) DO NOTHING"
+SQL_UPSERT_USER = """INSERT INTO users (email, password, profile) VALUES (?, ?, ?)
+    ON CONFLICT(email) DO UPDATE SET password = excluded.password, profile = excluded.profile"""
+SQL_INSERT_ORDER = """INSERT OR REPLACE INTO orders (id, order_ref, user_id, total, status, created_at, payment,
+    name, address, taluk, near, district, pincode, phone)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+SQL_INSERT_ITEM = """INSERT INTO order_items (order_id, product_id, quantity, price, name, subtotal)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+SQL_ORDER_COLUMNS = """SELECT o.id, o.order_ref, u.email AS user_email, o.total, o.created_at, o.payment,
+    o.name, o.address, o.taluk, o.near, o.district, o.pincode, o.phone
+    FROM orders o LEFT JOIN users u ON u.id = o.user_id"""
+SQL_USER_ORDERS = SQL_ORDER_COLUMNS + " WHERE o.user_id = ? ORDER BY o.created_at DESC, o.id DESC LIMIT ?"
+SQL_USER_ORDERS_AFTER = SQL_ORDER_COLUMNS + """ WHERE o.user_id = ? AND (o.created_at, o.id) < (?, ?)
+    ORDER BY o.created_at DESC, o.id DESC LIMIT ?"""
+SQL_ALL_ORDERS = SQL_ORDER_COLUMNS + " ORDER BY o.created_at, o.id"
+
+
+class SQLiteStore:
+    """Users, products and orders in freshbasket.db.
+
+    Runs in WAL mode so readers never block the single writer. Each thread
+    (and each forked worker) gets its own connection, reused across requests.
+    """
+
+    def __init__(self, db_file, default_products):
+        self.db_file = db_file
+        self.default_products = default_products
+        self._local = threading.local()
+        self._ensure_schema()
+
+    # --- CONNECTIONS ---
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _ensure_schema(self):
+        with self._tx() as conn:
+            for stmt in SCHEMA:
+                conn.execute(stmt)
+            for table, column, col_type in EXTRA_COLUMNS:
+                existing = {r['name'] for r in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+            for stmt in INDEXES:
+                conn.execute(stmt)
+
+    # --- PRODUCTS ---
+    def load_products(self):
+        rows = self._conn().execute(SQL_PRODUCTS).fetchall()
+        if not rows:
+            return list(self.default_products)
+        return [{k: r[k] for k in r.keys() if r[k] is not None or k not in ('mrp', 'thumb')} for r in rows]
+
+    def save_products(self, products):
+        with self._tx() as conn:
+            self._write_products(conn, products)
+
+    def update_products(self, fn):
+        # Read, edit in place and write back inside one write transaction
+        with self._tx() as conn:
+            products = self.load_products()
+            result = fn(products)
+            self._write_products(conn, products)
+        return result
+
+    def _write_products(self, conn, products):
+        ids = [p['id'] for p in products]
+        conn.execute(f"DELETE FROM products WHERE id NOT IN ({','.join('?' * len(ids))})", ids)
+        conn.executemany(SQL_UPSERT_PRODUCT, [
+            (p['id'], p['name'], p['price'], p.get('mrp'), p.get('image'), p.get('thumb')) for p in products
+        ])
+        conn.execute(SQL_BUMP_CATALOG)
+
+    def products_stamp(self):
+        row = self._conn().execute(SQL_CATALOG_VERSION).fetchone()
+        return row['value'] if row else 0
+
+    # --- USERS ---
+    def get_user(self, email):
+        row = self._conn().execute(SQL_USER, (email,)).fetchone()
+        if not row:
+            return None
+        profile = json.loads(row['profile'] or '{}')
+        return {'password': row['password'] or '', 'address': profile.get('address', {})}
+
+    def create_user(self, email, user):
+        with self._tx() as conn:
+            cur = conn.execute(SQL_INSERT_USER, (email, user.get('password', ''),
+                                                 json.dumps({'address': user.get('address', {})})))
+            return cur.rowcount == 1
+
+    def update_user(self, email, changes):
+        with self._tx() as conn:
+            self._upsert_user(conn, email, changes)
+
+    def _upsert_user(self, conn, email, changes):
+        row = conn.execute(SQL_USER, (email,)).fetchone()
+        password = row['password'] if row else ''
+        profile = json.loads(row['profile'] or '{}') if row else {}
+        if 'password' in changes:
+            password = changes['password']
+        if 'address' in changes:
+            profile['address'] = changes['address']
+        conn.execute(SQL_UPSERT_USER, (email, password, json.dumps(profile)))
+        return conn.execute(SQL_USER, (email,)).fetchone()['id']
+
+    # --- ORDERS ---
+    def add_order(self, order):
+        with self._tx() as conn:
+            self._write_order(conn, order)
+
+    def _write_order(self, conn, order, order_pk=None):
+        if order_pk is None:
+            row = conn.execute("SELECT id FROM orders WHERE order_ref = ?", (order['order_id'],)).fetchone()
+            order_pk = row['id'] if row else None
+        user_id = None
+        if order.get('user_email'):
+            row = conn.execute(SQL_USER, (order['user_email'],)).fetchone()
+            user_id = row['id'] if row else self._upsert_user(conn, order['user_email'], {})
+        addr = order.get('address') or {}
+        cur = conn.execute(SQL_INSERT_ORDER, (
+            order_pk, order['order_id'], user_id, order.get('total', 0), order.get('status', 'placed'),
+            order.get('date', ''), order.get('payment'),
+            *(addr.get(f) for f in ADDRESS_FIELDS)
+        ))
+        order_pk = cur.lastrowid
+        conn.execute("DELETE FROM order_items WHERE order_id = ?", (order_pk,))
+        conn.executemany(SQL_INSERT_ITEM, [
+            (order_pk, i.get('id'), i.get('qty', 0), i.get('price'), i.get('name'), i.get('subtotal', 0))
+            for i in order.get('items', [])
+        ])
+
+    def _rows_to_orders(self, rows):
+        if not rows:
+            return []
+        pks = [r['id'] for r in rows]
+        items = {}
+        for i in self._conn().execute(
+                f"SELECT order_id, name, quantity, subtotal FROM order_items WHERE order_id IN ({','.join('?' * len(pks))}) ORDER BY id",
+                pks):
+            items.setdefault(i['order_id'], []).append(
+                {'name': i['name'], 'qty': i['quantity'], 'subtotal': i['subtotal']})
+        return [{
+            'order_id': r['order_ref'] or str(r['id']),
+            'user_email': r['user_email'],
+            'date': r['created_at'],
+            'items': items.get(r['id'], []),
+            'total': r['total'],
+            'address': {f: r[f] for f in ADDRESS_FIELDS if r[f] is not None},
+            'payment': r['payment'],
+        } for r in rows]
+
+    def user_orders(self, email, limit=None, cursor=None):
+        # Walks idx_orders_user_id backwards; the cursor is the last (created_at, id) returned
+        conn = self._conn()
+        user = conn.execute(SQL_USER, (email,)).fetchone()
+        if not user:
+            return [], None
+        fetch = -1 if limit is None else limit + 1
+        after = decode_cursor(cursor)
+        if after:
+            rows = conn.execute(SQL_USER_ORDERS_AFTER, (user['id'], after[0], after[1], fetch)).fetchall()
+        else:
+            rows = conn.execute(SQL_USER_ORDERS, (user['id'], fetch)).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1]['created_at'], rows[-1]['id']])
+        return self._rows_to_orders(rows), next_cursor
+
+    def load_orders(self):
+        return self._rows_to_orders(self._conn().execute(SQL_ALL_ORDERS).fetchall())
+
+    # --- MIGRATION ---
+    def migrate_from_json(self, json_store, force=False):
+        # One-shot import of products/users/orders from the JSON files; tracked with PRAGMA user_version.
+        # Insert-only for products: ones already in the db (or only in the db) are left alone.
+        from order_archive import read_legacy
+        if not force and self._conn().execute("PRAGMA user_version").fetchone()[0] >= 1:
+            return False
+        products = json_store.load_products()
+        users = json_store.load(json_store.users_file, {})
+        # Straight from orders.json/.jsonl, so the json backend's archive is not built as a side effect
+        orders = read_legacy(json_store.orders.legacy_files)
+        with self._tx() as conn:
+            # Another worker may have finished the import while we waited for the write lock
+            if not force and conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+                return False
+            conn.executemany(SQL_INSERT_PRODUCT, [
+                (p['id'], p['name'], p['price'], p.get('mrp'), p.get('image'), p.get('thumb')) for p in products
+            ])
+            conn.execute(SQL_BUMP_CATALOG)
+            for email, user in users.items():
+                self._upsert_user(conn, email, user)
+            for order in orders:
+                order, legacy_id = normalize_legacy_order(order)
+                self._write_order(conn, order, legacy_id)
+            conn.execute("PRAGMA user_version = 1")
+        return True
+
+
+# Early orders were saved flat (address fields on the order, ISO created_at, integer id)
+def normalize_legacy_order(order):
+    if order.get('order_id'):
+        return order, None
+    created = (order.get('created_at') or '')[:16].replace('T', ' ')
+    return {
+        'order_id': f"legacy-{order.get('id')}",
+        'user_email': order.get('user_email'),
+        'date': order.get('date') or created,
+        'items': order.get('items', []),
+        'total': order.get('total', 0),
+        'address': {f: order.get(f) for f in ADDRESS_FIELDS if order.get(f) is not None},
+        'payment': order.get('payment'),
+    }, order.get('id')
+
+
+if __name__ == '__main__':
+    # python sqlite_store.py [freshbasket.db] -- re-run the JSON -> SQLite import
+    from app import DATA_FILE, PRODUCTS_FILE, ORDERS_FILE, DEFAULT_PRODUCTS
+    from storage import JsonStore
+    store = SQLiteStore(sys.argv[1] if len(sys.argv) > 1 else "freshbasket.db", DEFAULT_PRODUCTS)
+    store.migrate_from_json(JsonStore(DATA_FILE, PRODUCTS_FILE, ORDERS_FILE, DEFAULT_PRODUCTS), force=True)
+    print("Migrated JSON data into", store.db_file)
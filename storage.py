@@ -0,0 +1,173 @@
+import base64
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-place atomic renames only
+    fcntl = None
+
+from catalog_cache import file_stamp
+
+
+# --- LOW LEVEL FILE HELPERS ---
+@contextmanager
+def file_lock(path, exclusive=True):
+    # Advisory lock on a sidecar file so it survives the atomic rename of `path`
+    with open(path + ".lock", "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def atomic_write_json(path, data):
+    # Write to a temp file in the same directory, fsync, then rename over the target
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the original permissions across the rename
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def append_line(path, line):
+    # O_APPEND makes each single write land whole at the end of the file
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def read_json(path, default_data):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        with file_lock(path):
+            if not os.path.exists(path):
+                atomic_write_json(path, default_data)
+        return default_data
+    except ValueError:
+        return default_data
+
+
+# Opaque pagination cursors: any JSON value, base64url encoded for use in query strings
+def encode_cursor(value):
+    if value is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except ValueError:
+        return None
+
+
+# --- JSON FILE BACKEND ---
+class JsonStore:
+    """Users, products and orders kept in local JSON files.
+
+    Whole-file documents (users, products) are replaced atomically under an
+    exclusive lock. Orders live in a month-partitioned archive next to
+    `orders_file` (see order_archive.py); the old `orders_file` and its
+    `.jsonl` log are split into it on first use and then left untouched.
+    """
+
+    def __init__(self, users_file, products_file, orders_file, default_products):
+        self.users_file = users_file
+        self.products_file = products_file
+        self.orders_file = orders_file
+        self.default_products = default_products
+        from order_archive import archive_for
+        self.orders = archive_for(orders_file)
+
+    # Generic document helpers
+    def load(self, filename, default_data):
+        return read_json(filename, default_data)
+
+    def save(self, filename, data):
+        with file_lock(filename):
+            atomic_write_json(filename, data)
+
+    def update(self, filename, default_data, fn):
+        # Read-modify-write under one exclusive lock so concurrent workers can't lose updates
+        with file_lock(filename):
+            # read_json would take the lock again to create a missing file; we already hold it
+            data = read_json(filename, default_data) if os.path.exists(filename) else default_data
+            result = fn(data)
+            atomic_write_json(filename, data)
+            return result
+
+    # Products
+    def load_products(self):
+        return self.load(self.products_file, self.default_products)
+
+    def save_products(self, products):
+        self.save(self.products_file, products)
+
+    def update_products(self, fn):
+        # fn edits the list in place under the products lock; returns what fn returns
+        return self.update(self.products_file, [dict(p) for p in self.default_products], fn)
+
+    def products_stamp(self):
+        return file_stamp(self.products_file)
+
+    # Users
+    def get_user(self, email):
+        return self.load(self.users_file, {}).get(email)
+
+    def create_user(self, email, user):
+        def _create(users):
+            if email in users:
+                return False
+            users[email] = user
+            return True
+        return self.update(self.users_file, {}, _create)
+
+    def update_user(self, email, changes):
+        def _update(users):
+            users.setdefault(email, {'password': '', 'address': {}}).update(changes)
+        self.update(self.users_file, {}, _update)
+
+    # Orders
+    def add_order(self, order):
+        self.orders.add(order)
+
+    def get_order(self, order_id):
+        return self.orders.get(order_id)
+
+    def user_orders(self, email, limit=None, cursor=None):
+        return self.orders.user_orders(email, limit=limit, cursor=cursor)
+
+    def load_orders(self):
+        return self.orders.load_orders()
+
+def make_store(backend, users_file, products_file, orders_file, default_products, db_file=None):
+    if backend == 'json':
+        return JsonStore(users_file, products_file, orders_file, default_products)
+    if backend == 'sqlite':
+        from sqlite_store import SQLiteStore
+        store = SQLiteStore(db_file, default_products)
+        store.migrate_from_json(JsonStore(users_file, products_file, orders_file, default_products))
+        return store
+    raise ValueError(f"Unknown storage backend: {backend}")
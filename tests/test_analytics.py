@@ -0,0 +1,72 @@
+import pytest
+
+import analytics
+from analytics import DAY, PRODUCT, REGION, SQLiteAnalytics, aggregate, order_deltas
+
+
+ORDERS = [
+    {'order_id': 'a', 'date': '2026-02-05 10:00', 'total': 150.0,
+     'address': {'pincode': '631208', 'taluk': 'Pallipattu'},
+     'items': [{'name': 'Banana', 'qty': 2, 'subtotal': 80.0}, {'name': 'Guava', 'qty': 1, 'subtotal': 60.0},
+               {'name': 'Banana', 'qty': 0.5, 'subtotal': 10.0}]},
+    {'order_id': 'b', 'date': '2026-02-05 18:30', 'total': 60.0,
+     'address': {'pincode': '631208', 'taluk': 'Pallipattu'},
+     'items': [{'name': 'Guava', 'qty': 1, 'subtotal': 60.0}]},
+    {'order_id': 'c', 'date': '2026-02-06 09:00', 'total': 40.0, 'address': {},
+     'items': [{'name': 'Banana', 'qty': 1, 'subtotal': 40.0}]},
+]
+
+
+def summed(orders):
+    buckets = {}
+    for order in orders:
+        for key, (o, u, r) in order_deltas(order).items():
+            bo, bu, br = buckets.get(key, (0, 0.0, 0.0))
+            buckets[key] = (bo + o, bu + u, br + r)
+    return buckets
+
+
+def test_order_deltas_count_an_order_once_per_product():
+    deltas = order_deltas(ORDERS[0])
+    assert deltas[(DAY, '2026-02-05')] == (1, 3.5, 150.0)
+    assert deltas[(REGION, '631208|Pallipattu')] == (1, 0.0, 150.0)
+    assert deltas[(PRODUCT, 'Banana')] == (1, 2.5, 90.0)
+    assert deltas[(PRODUCT, 'Guava')] == (1, 1.0, 60.0)
+
+
+def test_aggregate_matches_running_deltas():
+    buckets = aggregate(ORDERS)
+    assert buckets == pytest.approx(summed(ORDERS))
+    assert buckets[(PRODUCT, 'Banana')] == (2, 3.5, 130.0)
+    assert buckets[(REGION, '|')] == (1, 0.0, 40.0)
+
+
+def test_aggregate_without_numpy(monkeypatch):
+    expected = aggregate(ORDERS)
+    monkeypatch.setattr(analytics, 'np', None)
+    assert aggregate(ORDERS) == pytest.approx(expected)
+    assert aggregate([]) == {}
+
+
+def test_sqlite_running_totals_and_rebuild(tmp_path):
+    store = SQLiteAnalytics(str(tmp_path / "analytics.db"))
+    for order in ORDERS:
+        store.record_order(order)
+    stats = store.summary(top_n=1)
+    assert stats['total_orders'] == 3
+    assert stats['total_revenue'] == 250.0
+    assert [p['key'] for p in stats['top_products']] == ['Banana']
+    assert analytics.rebuild(store, ORDERS[:1]) == 4
+    assert store.summary()['total_orders'] == 1
+
+
+def test_renamed_product_keeps_one_bucket(tmp_path):
+    store = SQLiteAnalytics(str(tmp_path / "analytics.db"))
+    for name in ('Banana', 'Nendran Banana'):
+        store.record_order({'order_id': name, 'date': '2026-02-05 10:00', 'total': 40.0,
+                            'items': [{'id': 26, 'name': name, 'qty': 1, 'subtotal': 40.0}]})
+    assert aggregate([{'items': [{'id': 26, 'name': 'Banana', 'qty': 1}]}])[(PRODUCT, '26')] == (1, 1.0, 0.0)
+    (top,) = store.summary(products={'26': {'id': 26, 'name': 'Nendran Banana'}})['top_products']
+    assert (top['key'], top['name'], top['orders'], top['units']) == ('26', 'Nendran Banana', 2, 2.0)
+    # Deleted from the catalog: the bucket still shows, under its id
+    assert store.summary()['top_products'][0]['name'] == '26'
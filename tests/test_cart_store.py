@@ -0,0 +1,71 @@
+import time
+
+import boto3
+import pytest
+
+import cart_store
+from cart_store import DynamoCartStore, MemoryCartStore, SQLiteCartStore
+
+
+def test_memory_carts_expire_after_idle_ttl():
+    now = [0.0]
+    store = MemoryCartStore(ttl=60, clock=lambda: now[0])
+    store.add('c1', '3', 2)
+    now[0] = 50
+    assert store.get('c1') == {'3': 2}
+    now[0] = 100  # touched at 50, so still alive
+    assert store.count('c1') == 1
+    now[0] = 161
+    assert store.get('c1') == {}
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryCartStore(max_carts=2, clock=lambda: 0.0)
+    store.add('c1', '1', 1)
+    store.add('c2', '1', 1)
+    store.get('c1')
+    store.add('c3', '1', 1)
+    assert store.get('c2') == {}
+    assert store.get('c1') == {'1': 1}
+
+
+def test_sqlite_cart_add_set_and_remove(tmp_path):
+    store = SQLiteCartStore(str(tmp_path / "carts.db"), sweep_probability=0)
+    store.add('c1', '3', 1)
+    store.add('c1', '3', 1.5)
+    store.set('c1', '4', 1)
+    assert store.get('c1') == {'3': 2.5, '4': 1}
+    store.remove('c1', '3')
+    assert store.count('c1') == 1
+    store.clear('c1')
+    assert store.get('c1') == {}
+
+
+def test_sqlite_cart_ttl(tmp_path):
+    store = SQLiteCartStore(str(tmp_path / "carts.db"), ttl=-1, sweep_probability=0)
+    store.add('c1', '3', 1)
+    assert store.get('c1') == {}
+
+
+def test_dynamo_expired_lines_are_not_counted(monkeypatch):
+    moto = pytest.importorskip("moto")
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        monkeypatch.setenv(name, 'testing')
+    with moto.mock_aws():
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        table = dynamodb.create_table(
+            TableName='Carts', BillingMode='PAY_PER_REQUEST',
+            KeySchema=[{'AttributeName': 'cart_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'product_id', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'cart_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'product_id', 'AttributeType': 'S'}])
+        store = DynamoCartStore(table, ttl=60)
+        assert store.add('c1', '3', 1) == 1
+        store.add('c1', '3', 1)
+        store.set('c1', '4', 2)
+        assert store.get('c1') == {'3': 2.0, '4': 2.0}
+        # Not yet deleted by DynamoDB's TTL sweep, but past expires_at
+        now = time.time()
+        monkeypatch.setattr(cart_store.time, 'time', lambda: now + 61)
+        assert store.get('c1') == {}
+        assert store.count('c1') == 0
@@ -0,0 +1,56 @@
+import io
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeSerializer
+
+from catalog_io import apply_to_catalog, export_lines, parse, write_to_dynamo
+from dynamo_utils import decimal_to_float
+
+
+class StubBatchTable:
+    """batch_writer that serializes items the way boto3 does before sending them."""
+
+    def __init__(self):
+        self.items = {}
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item):
+        self.items[Item['id']] = {k: TypeSerializer().serialize(v) for k, v in Item.items()}
+
+
+def rows(text):
+    return parse(io.BytesIO(text.encode('utf-8')), 'csv')
+
+
+def test_reimporting_a_reviewed_product():
+    # What the repository reads back after reviews.py has rated the product
+    existing = decimal_to_float([{'id': 'p1', 'name': 'Banana', 'price': Decimal('40'), 'mrp': Decimal('45'),
+                                  'rating_count': Decimal('3'), 'rating_total': Decimal('13.5')}])
+    table = StubBatchTable()
+    changed, added, updated = write_to_dynamo(table, existing, rows("name,price\nbanana,42.5\nKiwi,90\n"))
+    assert (added, updated) == (1, 1)
+    assert table.items['p1']['price'] == {'N': '42.5'}
+    assert table.items['p1']['rating_total'] == {'N': '13.5'}
+    assert table.items['p1']['rating_count'] == {'N': '3.0'}
+
+
+def test_local_import_continues_integer_ids():
+    products, added, updated = apply_to_catalog([{'id': 4, 'name': 'Guava', 'price': 60}],
+                                                rows("name,price\nGuava,65\nPapaya,80\n"))
+    assert (added, updated) == (1, 1)
+    assert sorted(p['id'] for p in products) == [4, 5]
+
+
+def test_export_round_trips():
+    products = [{'id': 1, 'name': 'Banana', 'price': Decimal('40.5'), 'mrp': 45.0}]
+    text = ''.join(export_lines(products, 'csv'))
+    assert text.splitlines()[1] == '1,Banana,40.5,45.0,,'
+    assert ''.join(export_lines(products, 'ndjson')) == '{"id": 1, "name": "Banana", "price": 40.5, "mrp": 45.0}\n'
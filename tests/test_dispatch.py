@@ -0,0 +1,70 @@
+import pytest
+
+import dispatch
+from dispatch import OrderTable, SQLitePendingOrders, pack, plan
+
+
+def order(order_id, taluk, kg, date='2026-02-05 10:00', pincode='631208', **extra):
+    return {'order_id': order_id, 'date': date, 'address': {'taluk': taluk, 'pincode': pincode, 'name': 'N'},
+            'items': [{'name': 'Banana', 'qty': kg / 2}, {'name': 'Guava', 'qty': kg / 2}], **extra}
+
+
+ORDERS = [order(f'p{n}', 'pallipattu', 40) for n in range(5)] + [
+    order('t1', 'Tiruttani', 30, pincode='631209'),
+    order('t2', 'Tiruttani ', 200),
+    order('old', 'Tiruttani', 10, date='2026-02-04 23:00'),
+    order('done', 'Tiruttani', 10, status='delivered'),
+]
+
+
+@pytest.fixture(params=['numpy', 'plain'])
+def packing(request, monkeypatch):
+    if request.param == 'numpy':
+        if dispatch.np is None:
+            pytest.skip("numpy not installed")
+    else:
+        monkeypatch.setattr(dispatch, 'np', None)
+    return request.param
+
+
+def test_plan_packs_vans_per_taluk(packing):
+    result = plan(ORDERS, max_kg=100, max_stops=0, since='2026-02-05')
+    assert result['orders'] == 7
+    assert result['weight'] == 430
+    vans = [(b['taluk'], [s['order_id'] for s in b['stops']], b['overweight']) for b in result['batches']]
+    assert vans == [('Pallipattu', ['p0', 'p1'], False), ('Pallipattu', ['p2', 'p3'], False),
+                    ('Pallipattu', ['p4'], False), ('Tiruttani', ['t2'], True), ('Tiruttani', ['t1'], False)]
+    assert [(a['taluk'], a['batches']) for a in result['areas']] == [('Pallipattu', 3), ('Tiruttani', 2)]
+
+
+def test_plan_pick_lists_add_up(packing):
+    result = plan(ORDERS, max_kg=100, max_stops=0, since='2026-02-05')
+    assert result['picks'] == [{'product': 'Banana', 'qty': 215.0, 'orders': 7},
+                               {'product': 'Guava', 'qty': 215.0, 'orders': 7}]
+    assert result['batches'][0]['picks'] == [{'product': 'Banana', 'qty': 40.0, 'orders': 2},
+                                             {'product': 'Guava', 'qty': 40.0, 'orders': 2}]
+
+
+def test_pack_respects_stop_limit(packing):
+    table = OrderTable(ORDERS[:5])
+    assert pack(table.weights, table.areas, max_kg=1000, max_stops=2) == [(0, 2), (2, 4), (4, 5)]
+    assert pack([], [], max_kg=10) == []
+
+
+def test_plan_window_excludes_earlier_and_later_orders():
+    assert plan(ORDERS, 100, since='2026-02-04', until='2026-02-05')['orders'] == 1
+    assert plan([], 100)['batches'] == []
+
+
+def test_pending_index_round_trip(tmp_path):
+    pending = SQLitePendingOrders(str(tmp_path / "dispatch.db"))
+    for o in ORDERS:
+        pending.add(o)
+    assert [o['order_id'] for o in pending.orders('2026-02-05 00:00', '2026-02-06')][:1] == ['p0']
+    assert len(pending.orders()) == 9
+    assert pending.mark_dispatched(['p0', 'p1', 'missing']) == 2
+    remaining = pending.orders('2026-02-05')
+    assert {'p0', 'p1'}.isdisjoint(o['order_id'] for o in remaining)
+    assert plan(remaining, 100)['orders'] == 6
+    assert dispatch.backfill(pending, ORDERS, since='2026-02-05') == 7
+    assert len(pending.orders()) == 9
@@ -0,0 +1,137 @@
+import threading
+from decimal import Decimal
+
+import pytest
+
+import dynamo_utils
+from catalog_cache import CatalogCache
+from dynamo_utils import ProductLookup, TTLStamp, batch_get, iter_scan, load_catalog, scan_all
+
+
+class StubTable:
+    """Pages of `page_size` items like a 1 MB scan page; segments split items by index."""
+
+    def __init__(self, items, page_size=3):
+        self.items = items
+        self.page_size = page_size
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def scan(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+        items = self.items
+        if 'TotalSegments' in kwargs:
+            items = [i for n, i in enumerate(items) if n % kwargs['TotalSegments'] == kwargs['Segment']]
+        start = kwargs.get('ExclusiveStartKey', {}).get('pos', 0)
+        page = items[start:start + self.page_size]
+        response = {'Items': page}
+        if start + self.page_size < len(items):
+            response['LastEvaluatedKey'] = {'pos': start + self.page_size}
+        return response
+
+
+class StubResource:
+    """batch_get_item that leaves the last `unprocessed` keys of a request for a retry."""
+
+    def __init__(self, items, unprocessed=0, table='Products'):
+        self.items = {i['id']: i for i in items}
+        self.unprocessed = unprocessed
+        self.table = table
+        self.requests = []
+
+    def batch_get_item(self, RequestItems):
+        keys = RequestItems[self.table]['Keys']
+        self.requests.append([k['id'] for k in keys])
+        served, left = (keys[:-self.unprocessed], keys[-self.unprocessed:]) if self.unprocessed else (keys, [])
+        self.unprocessed = 0
+        response = {'Responses': {self.table: [self.items[k['id']] for k in served if k['id'] in self.items]}}
+        if left:
+            response['UnprocessedKeys'] = {self.table: {'Keys': left}}
+        return response
+
+
+def products(n):
+    return [{'id': str(i), 'name': f'P{i}', 'price': Decimal('10.5'), 'rating_count': Decimal(i)} for i in range(n)]
+
+
+def test_iter_scan_follows_last_evaluated_key():
+    table = StubTable(products(10))
+    assert [i['id'] for i in iter_scan(table)] == [str(i) for i in range(10)]
+    assert len(table.calls) == 4
+    assert table.calls[-1]['ExclusiveStartKey'] == {'pos': 9}
+
+
+def test_scan_all_runs_every_segment():
+    table = StubTable(products(20))
+    items = scan_all(table, segments=4)
+    assert sorted(i['id'] for i in items) == sorted(str(i) for i in range(20))
+    assert {(c['Segment'], c['TotalSegments']) for c in table.calls} == {(s, 4) for s in range(4)}
+    # 5 items per segment is two pages each
+    assert len(table.calls) == 8
+
+
+def test_scan_all_passes_filters_through():
+    table = StubTable(products(2))
+    scan_all(table, FilterExpression='x')
+    assert table.calls == [{'FilterExpression': 'x'}]
+
+
+def test_load_catalog_converts_decimals_once():
+    catalog = load_catalog(StubTable(products(5)), segments=2)
+    assert all(type(p['price']) is float and type(p['rating_count']) is float for p in catalog)
+
+
+def test_batch_get_chunks_by_100_and_retries_unprocessed(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(dynamo_utils.time, 'sleep', sleeps.append)
+    resource = StubResource(products(150), unprocessed=7)
+    items = batch_get(resource, 'Products', [{'id': str(i)} for i in range(150)])
+    assert sorted(int(i['id']) for i in items) == list(range(150))
+    assert [len(r) for r in resource.requests] == [100, 7, 50]
+    assert sleeps == [0.05]
+
+
+def test_batch_get_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(dynamo_utils.time, 'sleep', lambda s: None)
+
+    class Stuck(StubResource):
+        def batch_get_item(self, RequestItems):
+            return {'Responses': {}, 'UnprocessedKeys': RequestItems}
+
+    with pytest.raises(RuntimeError):
+        batch_get(Stuck([]), 'Products', [{'id': '1'}], max_retries=2)
+
+
+def test_product_lookup_caches_hits_and_misses_until_ttl():
+    now = [0.0]
+    resource = StubResource(products(3))
+    lookup = ProductLookup(resource, 'Products', ttl=10, clock=lambda: now[0])
+    assert set(lookup.get_many(['1', 2, '99'])) == {'1', '2'}
+    assert lookup.get('1')['price'] == 10.5
+    assert lookup.get('99') is None
+    assert len(resource.requests) == 1
+    now[0] = 11
+    lookup.get('99')
+    assert resource.requests[-1] == ['99']
+
+
+def test_product_lookup_is_bounded():
+    lookup = ProductLookup(StubResource(products(10)), 'Products', clock=lambda: 0.0, max_entries=3, max_misses=2)
+    lookup.get_many([str(i) for i in range(10)] + ['x', 'y', 'z'])
+    assert list(lookup._cache) == ['7', '8', '9']
+    assert list(lookup._misses) == ['y', 'z']
+
+
+def test_catalog_snapshot_rescans_only_when_the_ttl_stamp_moves():
+    now = [0.0]
+    table = StubTable(products(4))
+    cache = CatalogCache(lambda: load_catalog(table), TTLStamp(30, clock=lambda: now[0]))
+    assert cache.get(3)['name'] == 'P3'
+    now[0] = 29
+    assert len(cache.products()) == 4
+    assert len(table.calls) == 2
+    now[0] = 31
+    table.items = products(5)
+    assert cache.get('4')['name'] == 'P4'
+    assert len(table.calls) == 4
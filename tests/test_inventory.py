@@ -0,0 +1,51 @@
+import pytest
+
+from inventory import OutOfStock, SQLiteInventory
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    inventory = SQLiteInventory(str(tmp_path / "inventory.db"), sweep_probability=0)
+    inventory.set_stock('1', 10)
+    return inventory
+
+
+def test_holds_take_from_available(inventory):
+    inventory.reserve('c1', '1', 4)
+    inventory.reserve('c2', '1', 6)
+    assert inventory.stock('1') == (10, 10)
+    with pytest.raises(OutOfStock) as e:
+        inventory.reserve('c3', '1', 1)
+    assert e.value.shortages == {'1': 0}
+    inventory.reserve('c1', '1', 1)
+    assert inventory.available('1') == 3
+
+
+def test_commit_sells_held_and_free_stock_all_or_nothing(inventory):
+    inventory.set_stock('2', 1)
+    inventory.reserve('c1', '1', 3)
+    with pytest.raises(OutOfStock) as e:
+        inventory.commit('c1', {'1': 3, '2': 2})
+    assert e.value.shortages == {'2': 1}
+    assert inventory.stock('1') == (10, 3)
+    inventory.commit('c1', {'1': 3, '2': 1})
+    assert inventory.stock('1') == (7, 0)
+    assert inventory.stock('2') == (0, 0)
+    inventory.restock({'1': 3})
+    assert inventory.stock('1') == (10, 0)
+
+
+def test_expired_holds_go_back_when_stock_runs_short(tmp_path):
+    inventory = SQLiteInventory(str(tmp_path / "inventory.db"), hold_ttl=-1, sweep_probability=0)
+    inventory.set_stock('1', 5)
+    inventory.reserve('c1', '1', 5)
+    inventory.reserve('c2', '1', 5)
+    assert inventory.stock('1') == (5, 5)
+    assert inventory.expire() == 1
+    assert inventory.available('1') == 5
+
+
+def test_untracked_products_never_run_out(inventory):
+    inventory.reserve('c1', 'other', 1000)
+    inventory.commit('c1', {'other': 1000})
+    assert inventory.stock('other') is None
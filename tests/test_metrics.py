@@ -0,0 +1,27 @@
+from flask import Flask
+
+from metrics import Metrics
+
+
+def make_client(token=None):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    Metrics().init_app(app, token=token)
+    return app.test_client()
+
+
+def test_metrics_need_an_admin_session():
+    client = make_client()
+    assert client.get('/metrics').status_code == 403
+    with client.session_transaction() as session:
+        session['is_admin'] = True
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert b'# TYPE' in response.data
+
+
+def test_metrics_token_lets_a_scraper_in():
+    client = make_client(token='s3cret')
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert make_client().get('/metrics', headers={'Authorization': 'Bearer '}).status_code == 403
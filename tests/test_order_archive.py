@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+from order_archive import OrderArchive
+
+
+def make_orders():
+    orders = []
+    for month in ('2026-01', '2026-02', '2026-03'):
+        for day in range(1, 6):
+            for email in ('a@x.io', 'b@x.io'):
+                orders.append({'order_id': f"{email[0]}{month[-1]}{day}", 'user_email': email,
+                               'date': f"{month}-{day:02d} 10:00", 'total': 10.0,
+                               'items': [{'id': 1, 'name': 'Banana', 'qty': 1, 'subtotal': 10.0, 'image': 'x.jpg'}]})
+    return orders
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = OrderArchive(str(tmp_path / "order_archive"))
+    for order in make_orders():
+        archive.add(order)
+    return archive
+
+
+def all_pages(archive, email, limit):
+    pages, cursor = [], None
+    while True:
+        page, cursor = archive.user_orders(email, limit=limit, cursor=cursor)
+        pages.append([o['order_id'] for o in page])
+        if not cursor:
+            return pages
+
+
+def test_history_pages_newest_first_across_months(archive):
+    pages = all_pages(archive, 'a@x.io', 4)
+    flat = [oid for page in pages for oid in page]
+    assert [len(page) for page in pages] == [4, 4, 4, 3]
+    assert flat[:2] == ['a35', 'a34'] and flat[-1] == 'a11'
+    assert len(set(flat)) == 15
+
+
+def test_lookup_and_slimmed_items(archive):
+    order = archive.get('b23')
+    assert order['user_email'] == 'b@x.io'
+    assert 'image' not in order['items'][0]
+    assert archive.get('nope') is None
+
+
+def test_compaction_keeps_reads_the_same(archive):
+    before = all_pages(archive, 'b@x.io', 6)
+    assert archive.compact('2026-03') == 2
+    assert sorted(os.listdir(archive.sealed_dir)) == ['2026-01.seg', '2026-02.seg']
+    assert all_pages(archive, 'b@x.io', 6) == before
+    assert archive.get('a12')['order_id'] == 'a12'
+    assert len(archive.load_orders()) == 30
+
+
+def test_late_write_to_a_sealed_month_is_merged(archive):
+    archive.compact('2026-03')
+    archive.add({'order_id': 'late', 'user_email': 'a@x.io', 'date': '2026-01-31 23:59', 'items': []})
+    assert archive.get('late')['order_id'] == 'late'
+    page, _ = archive.user_orders('a@x.io', limit=20)
+    assert [o['order_id'] for o in page][9:12] == ['a21', 'late', 'a15']
+    archive.compact('2026-03')
+    assert [o['order_id'] for o in archive.user_orders('a@x.io', limit=20)[0]][10] == 'late'
+
+
+def test_legacy_files_are_migrated_once(tmp_path):
+    legacy = tmp_path / "orders.json"
+    legacy.write_text(json.dumps(make_orders()[:4]))
+    archive = OrderArchive(str(tmp_path / "order_archive"), legacy_files=(str(legacy),))
+    assert len(archive.load_orders()) == 4
+    legacy.write_text("[]")
+    assert len(OrderArchive(str(tmp_path / "order_archive"), legacy_files=(str(legacy),)).load_orders()) == 4
@@ -0,0 +1,108 @@
+import time
+import types
+
+import pytest
+
+import outbox as outbox_module
+from outbox import Outbox
+
+
+class FakeSNS:
+    """publish_batch that records each call; `fail` ids come back in Failed, `down` raises."""
+
+    def __init__(self):
+        self.calls = []
+        self.fail = set()
+        self.down = False
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        self.calls.append([e['Message'] for e in PublishBatchRequestEntries])
+        if self.down:
+            raise ConnectionError("sns unreachable")
+        ok = [e for e in PublishBatchRequestEntries if e['Message'] not in self.fail]
+        bad = [e for e in PublishBatchRequestEntries if e['Message'] in self.fail]
+        return {'Successful': [{'Id': e['Id']} for e in ok],
+                'Failed': [{'Id': e['Id'], 'Code': 'InternalError', 'Message': 'boom'} for e in bad]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(outbox_module, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    # Backoff jitter at its top end, so delays are exact
+    monkeypatch.setattr(outbox_module, 'random', types.SimpleNamespace(uniform=lambda a, b: b))
+    return now
+
+
+@pytest.fixture
+def sns():
+    return FakeSNS()
+
+
+def make_outbox(tmp_path, sns, **kwargs):
+    # workers=0: nothing runs in the background, the test drives process_batch itself
+    return Outbox(str(tmp_path / "outbox.db"), sns, 'arn:topic', workers=0, **kwargs)
+
+
+def test_publish_batch_is_split_into_tens(tmp_path, sns, clock):
+    box = make_outbox(tmp_path, sns)
+    for n in range(25):
+        box.enqueue("Order", f"m{n}")
+    box.drain()
+    assert [len(c) for c in sns.calls] == [10, 10, 5]
+    assert [m for c in sns.calls for m in c] == [f"m{n}" for n in range(25)]
+    assert box.pending_count() == 0
+
+
+def test_failed_entries_back_off_exponentially(tmp_path, sns, clock):
+    box = make_outbox(tmp_path, sns, base_delay=2.0)
+    box.enqueue("Order", "ok")
+    box.enqueue("Order", "flaky")
+    sns.fail = {"flaky"}
+    assert box.process_batch() == 2
+    assert box.pending_count() == 1
+    clock[0] += 1.9
+    assert box.process_batch() == 0
+    clock[0] += 0.1
+    assert box.process_batch() == 1
+    clock[0] += 3.9  # second failure waits twice as long
+    assert box.process_batch() == 0
+    clock[0] += 0.1
+    sns.fail = set()
+    assert box.process_batch() == 1
+    assert box.pending_count() == 0
+    assert sns.calls == [["ok", "flaky"], ["flaky"], ["flaky"]]
+
+
+def test_dead_lettered_after_max_attempts(tmp_path, sns, clock, capsys):
+    box = make_outbox(tmp_path, sns, max_attempts=3, base_delay=1.0)
+    box.enqueue("Order", "never")
+    sns.down = True
+    for _ in range(5):
+        box.process_batch()
+        clock[0] += 100
+    assert len(sns.calls) == 3
+    assert box.pending_count() == 0
+    (row,) = box.dead_letters()
+    assert row[2:5] == ("never", 3, "sns unreachable")
+    assert "SNS Error" in capsys.readouterr().out
+
+
+def test_claim_lease_expires_for_a_dead_worker(tmp_path, sns, clock):
+    box = make_outbox(tmp_path, sns, lease=60.0)
+    box.enqueue("Order", "orphan")
+    assert len(box._claim()) == 1  # claimed by a worker that then died
+    assert box.process_batch() == 0
+    clock[0] += 60
+    assert box.process_batch() == 1
+    assert sns.calls == [["orphan"]]
+
+
+def test_started_workers_send_rows_left_from_before(tmp_path, sns):
+    make_outbox(tmp_path, sns).enqueue("Order", "left over")
+    box = Outbox(str(tmp_path / "outbox.db"), sns, 'arn:topic', workers=1, poll_interval=0.05)
+    box.start()
+    deadline = time.time() + 5
+    while box.pending_count() and time.time() < deadline:
+        time.sleep(0.02)
+    assert sns.calls == [["left over"]]
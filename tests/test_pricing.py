@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import pytest
+
+from pricing import OfferIndex, PriceBook, discounted, parse_when, validate_offer
+
+
+def offer(pid, percent, start=None, end=None, **extra):
+    return {'product_id': pid, 'discount_percent': percent, 'start_date': start, 'end_date': end, **extra}
+
+
+def test_biggest_overlapping_discount_wins():
+    index = OfferIndex([offer(1, 10, '2026-02-01', '2026-02-28'),
+                        offer(1, 25, '2026-02-10', '2026-02-12'),
+                        offer(2, 5)])
+    assert index.at(datetime(2026, 2, 5))[0] == {'1': 10.0, '2': 5.0}
+    assert index.at(datetime(2026, 2, 11))[0] == {'1': 25.0, '2': 5.0}
+    assert index.at(datetime(2026, 3, 1))[0] == {'2': 5.0}
+
+
+def test_date_only_end_runs_through_that_day():
+    index = OfferIndex([offer(1, 10, '2026-02-01', '2026-02-03')])
+    assert index.at(datetime(2026, 2, 3, 23, 59))[0] == {'1': 10.0}
+    assert index.at(datetime(2026, 2, 4))[0] == {}
+
+
+def test_next_boundary_is_the_next_change_anywhere():
+    index = OfferIndex([offer(1, 10, '2026-02-01', '2026-02-03'), offer(2, 20, '2026-02-02', '2026-02-04')])
+    discounts, until = index.at(datetime(2026, 2, 1, 12))
+    assert discounts == {'1': 10.0}
+    assert until == datetime(2026, 2, 2)
+    assert index.at(datetime(2026, 2, 5))[1] is None
+
+
+def test_malformed_rows_are_skipped(capsys):
+    index = OfferIndex([offer(1, 10, '2026-13-01'), offer(2, 'lots'), {'discount_percent': 5},
+                        offer(3, 15, '2026-02-01')])
+    assert index.at(datetime(2026, 2, 2))[0] == {'3': 15.0}
+    assert capsys.readouterr().out.count("Offer Error") == 3
+
+
+def test_out_of_range_and_empty_windows_are_ignored():
+    index = OfferIndex([offer(1, 0), offer(2, 150), offer(3, 10, '2026-02-05', '2026-02-01')])
+    assert index.steps == {}
+
+
+def test_validate_offer_rejects_bad_rows():
+    with pytest.raises(ValueError):
+        validate_offer(offer(1, 10, 'soon'))
+    with pytest.raises(ValueError):
+        validate_offer(offer(1, 10, '2026-02-05', '2026-02-01'))
+    with pytest.raises(ValueError):
+        validate_offer(offer(1, 0))
+    assert validate_offer(offer(1, '10'))['discount_percent'] == 10.0
+
+
+def test_parse_when_open_ends():
+    assert parse_when(None) == datetime.min
+    assert parse_when('', end=True) == datetime.max
+
+
+def test_price_book_reloads_on_stamp_and_boundary():
+    now = [datetime(2026, 2, 1, 12)]
+    stamp = [1]
+    offers = [offer(1, 10, '2026-02-01', '2026-02-01')]
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return offers
+
+    book = PriceBook(loader, lambda: stamp[0], clock=lambda: now[0])
+    product = {'id': 1, 'price': 100.0}
+    assert book.apply(product) == {'id': 1, 'price': 90.0, 'mrp': 100.0}
+    assert book.apply({'id': 2, 'price': 50.0}) == {'id': 2, 'price': 50.0}
+    token = book.token()
+    now[0] = datetime(2026, 2, 2)
+    assert book.apply(product) is product
+    assert book.token() != token
+    assert len(loads) == 1
+    offers.append(offer(1, 50))
+    stamp[0] = 2
+    assert book.discount(1) == 50.0
+    assert len(loads) == 2
+
+
+def test_discounted_rounds_to_paise():
+    assert discounted(99.99, 15) == 84.99
@@ -0,0 +1,46 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from catalog_io import parse
+from repository import LocalRepository
+from storage import make_store
+
+
+DEFAULTS = [{'id': 1, 'name': 'Banana', 'price': 40}]
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def repo(request, tmp_path):
+    store = make_store(request.param, str(tmp_path / "users.json"), str(tmp_path / "products.json"),
+                       str(tmp_path / "orders.json"), DEFAULTS, db_file=str(tmp_path / "freshbasket.db"))
+    return LocalRepository(store)
+
+
+def test_concurrent_adds_get_distinct_ids(repo):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = list(pool.map(lambda n: repo.add_product({'name': f'P{n}', 'price': n}), range(40)))
+    assert sorted(ids) == list(range(2, 42))
+    assert len(repo.load_products()) == 41
+    assert DEFAULTS == [{'id': 1, 'name': 'Banana', 'price': 40}]
+
+
+def test_concurrent_edits_and_imports_all_land(repo):
+    ids = [repo.add_product({'name': f'P{n}', 'price': 1}) for n in range(10)]
+    csv = io.BytesIO(b"name,price\nKiwi,90\nMango,70\n")
+
+    def work(n):
+        if n == 10:
+            return repo.import_products(parse(csv, 'csv'))
+        return repo.update_product(ids[n], {'name': f'P{n}', 'price': 100 + n})
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(work, range(11)))
+    assert results[-1] == (2, 0)
+    prices = {p['name']: p['price'] for p in repo.load_products()}
+    assert [prices[f'P{n}'] for n in range(10)] == [100 + n for n in range(10)]
+    assert prices['Kiwi'] == 90
+    repo.delete_product(ids[0])
+    assert repo.get_product(ids[0]) is None
+    assert repo.update_product(999, {'name': 'X', 'price': 1}) is False
@@ -0,0 +1,33 @@
+import pytest
+
+import reviews
+from reviews import summarize, validate_review
+
+
+RATINGS = [(1, 5), ('1', 4), (2, 3), (1, 3), (3, 1)]
+
+
+def by_id(summaries):
+    return {s['id']: s for s in summaries}
+
+
+def test_summarize_groups_by_product():
+    result = by_id(summarize(RATINGS))
+    assert result['1'] == {'id': '1', 'count': 3, 'total': 12.0, 'avg': 4.0}
+    assert result['2']['avg'] == 3.0
+    assert result['3']['count'] == 1
+    assert summarize([]) == []
+
+
+def test_summarize_without_numpy(monkeypatch):
+    expected = by_id(summarize(RATINGS))
+    monkeypatch.setattr(reviews, 'np', None)
+    assert by_id(summarize(RATINGS)) == expected
+
+
+def test_validate_review():
+    assert validate_review('4', '  tasty  ') == (4, 'tasty')
+    assert len(validate_review(5, 'x' * 5000)[1]) == reviews.MAX_COMMENT_LENGTH
+    for rating in (0, 6, 'five', None):
+        with pytest.raises(ValueError):
+            validate_review(rating, '')
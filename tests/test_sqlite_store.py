@@ -0,0 +1,39 @@
+import json
+import os
+
+from sqlite_store import SQLiteStore
+from storage import JsonStore
+
+
+DEFAULT_PRODUCTS = [{'id': 1, 'name': 'Banana', 'price': 40.0}]
+
+
+def json_store(tmp_path):
+    return JsonStore(str(tmp_path / "users.json"), str(tmp_path / "products.json"),
+                     str(tmp_path / "orders.json"), DEFAULT_PRODUCTS)
+
+
+def test_migration_only_inserts_products(tmp_path):
+    (tmp_path / "products.json").write_text(json.dumps([{'id': 1, 'name': 'Old Banana', 'price': 30.0},
+                                                        {'id': 2, 'name': 'Guava', 'price': 60.0}]))
+    store = SQLiteStore(str(tmp_path / "freshbasket.db"), DEFAULT_PRODUCTS)
+    store.save_products([{'id': 1, 'name': 'Banana', 'price': 45.0}, {'id': 3, 'name': 'Mango', 'price': 90.0}])
+    assert store.migrate_from_json(json_store(tmp_path), force=True)
+    assert {p['id']: (p['name'], p['price']) for p in store.load_products()} == {
+        1: ('Banana', 45.0), 2: ('Guava', 60.0), 3: ('Mango', 90.0)}
+
+
+def test_migration_reads_legacy_orders_without_building_the_archive(tmp_path):
+    (tmp_path / "orders.json").write_text(json.dumps([
+        {'id': 7, 'user_email': 'a@example.com', 'created_at': '2025-11-02T09:15:00', 'total': 80.0,
+         'items': [{'id': 1, 'name': 'Banana', 'qty': 2, 'subtotal': 80.0}], 'pincode': '631208'}]))
+    (tmp_path / "orders.jsonl").write_text(json.dumps(
+        {'order_id': 'o-2', 'user_email': 'a@example.com', 'date': '2026-01-10 18:00', 'total': 40.0,
+         'items': [{'id': 1, 'name': 'Banana', 'qty': 1, 'subtotal': 40.0}]}) + "\n")
+    store = SQLiteStore(str(tmp_path / "freshbasket.db"), DEFAULT_PRODUCTS)
+    assert store.migrate_from_json(json_store(tmp_path))
+    orders = {o['order_id']: o for o in store.load_orders()}
+    assert set(orders) == {'legacy-7', 'o-2'}
+    assert orders['legacy-7']['address']['pincode'] == '631208'
+    assert not os.path.exists(tmp_path / "order_archive")
+    assert not store.migrate_from_json(json_store(tmp_path))